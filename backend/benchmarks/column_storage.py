@@ -0,0 +1,48 @@
+"""Compare document size and load time of the list and packed ReportColumn storage formats.
+
+Run from the backend directory: python -m benchmarks.column_storage
+"""
+import timeit
+
+import bson
+import numpy as np
+
+from models.report_column import ReportColumn
+
+ROWS = 200_000
+REPEAT = 5
+
+
+def make_column_values() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    column_values = rng.normal(size=ROWS)
+    column_values[rng.random(size=ROWS) < 0.05] = np.nan
+    return column_values
+
+
+def make_documents(column_values: np.ndarray):
+    legacy = ReportColumn(id=1, name="column", column_data=np.where(np.isnan(column_values), None,
+                                                                    column_values).tolist())
+    documents = {"list": legacy.to_mongo().to_dict()}
+    for data_type in ("float64", "float32"):
+        packed = ReportColumn(id=1, name="column")
+        packed.set_column_values(column_values, data_type)
+        documents[f"packed {data_type}"] = packed.to_mongo().to_dict()
+    return documents
+
+
+def load(encoded: bytes) -> np.ndarray:
+    return ReportColumn._from_son(bson.decode(encoded)).get_column_values()
+
+
+def run():
+    documents = make_documents(make_column_values())
+    print(f"{ROWS} rows, 5% nulls")
+    for label, document in documents.items():
+        encoded = bson.encode(document)
+        seconds = min(timeit.repeat(lambda: load(encoded), number=1, repeat=REPEAT))
+        print(f"{label}: {len(encoded) / 1024:.0f} KiB, decode and load {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+"""Compare the per-pair DataFrame loop with the matrix correlation analysis.
+
+Run from the backend directory: python -m benchmarks.correlation_analysis
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from services.report import calculate_strengthened_weakened_relationships
+
+ROWS = 1_000
+REPEAT = 3
+
+
+def legacy_strengthened_weakened_relationships(df: pd.DataFrame) -> (int, int):
+    strengthened, weakened = 0, 0
+    for i in range(len(df.columns)):
+        for j in range(i + 1, len(df.columns)):
+            data = df[[df.columns[i], df.columns[j]]]
+            if np.abs(data.corr().iloc[0, 1]) > np.abs(data.corr(method='spearman').iloc[0, 1]):
+                strengthened += 1
+            else:
+                weakened += 1
+    return strengthened, weakened
+
+
+def make_dataset(columns: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(ROWS, columns))
+    data[rng.random(size=data.shape) < 0.05] = np.nan
+    return pd.DataFrame(data, columns=[f"column {index}" for index in range(columns)])
+
+
+def run():
+    for columns in (20, 50):
+        df = make_dataset(columns)
+        assert legacy_strengthened_weakened_relationships(df) == calculate_strengthened_weakened_relationships(df)
+        legacy = min(timeit.repeat(lambda: legacy_strengthened_weakened_relationships(df), number=1, repeat=REPEAT))
+        matrix = min(timeit.repeat(lambda: calculate_strengthened_weakened_relationships(df), number=1,
+                                   repeat=REPEAT))
+        print(f"{ROWS} rows x {columns} columns: pairwise loop {legacy:.3f}s, matrix {matrix:.3f}s "
+              f"({legacy / matrix:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
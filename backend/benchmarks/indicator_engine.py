@@ -0,0 +1,56 @@
+"""Compare per-column indicator calculations with the batched and fused calculations of the engine.
+
+Run from the backend directory: python -m benchmarks.indicator_engine
+"""
+import timeit
+
+import numpy as np
+
+from models.report_column import ReportColumn
+from models.report_indicator import ReportIndicator
+from services.indicator_value import calculate_indicator_table, calculation_methods, prepare_column_data
+
+SHAPES = [(10_000, 200), (200, 5_000)]
+REPEAT = 3
+INDICATOR_NAMES = ["Median", "Mean", "Quartile q1", "Quartile q2", "Quartile q3", "Outliers number",
+                   "Variation range"]
+MOMENT_INDICATOR_NAMES = ["Sum", "Count", "Null count", "Variance", "Standard deviation",
+                          "Coefficient of variation", "Skewness", "Kurtosis"]
+
+
+def make_columns(rows: int, column_count: int):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(rows, column_count))
+    data[rng.random(size=data.shape) < 0.05] = np.nan
+    columns = []
+    for index in range(column_count):
+        report_column = ReportColumn(name=f"column {index}")
+        report_column.set_column_values(data[:, index])
+        columns.append(report_column)
+    return columns
+
+
+def per_column(columns, report_indicators):
+    for column in columns:
+        column_data = prepare_column_data(column.get_column_values())
+        for report_indicator in report_indicators:
+            calculation_methods[report_indicator.name.lower()](column_data)
+
+
+def run():
+    for label, indicator_names in [("indicators", INDICATOR_NAMES), ("moment indicators", MOMENT_INDICATOR_NAMES)]:
+        compare(label, [ReportIndicator(name=name) for name in indicator_names])
+
+
+def compare(label, report_indicators):
+    for rows, column_count in SHAPES:
+        columns = make_columns(rows, column_count)
+        legacy = min(timeit.repeat(lambda: per_column(columns, report_indicators), number=1, repeat=REPEAT))
+        batched = min(timeit.repeat(lambda: calculate_indicator_table(columns, report_indicators), number=1,
+                                    repeat=REPEAT))
+        print(f"{rows} rows x {column_count} columns, {len(report_indicators)} {label}: "
+              f"per column {legacy:.3f}s, engine {batched:.3f}s ({legacy / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
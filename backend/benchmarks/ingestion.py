@@ -0,0 +1,46 @@
+"""Compare ingestion throughput of every supported upload format on the same synthetic dataset.
+
+Run from the backend directory: python -m benchmarks.ingestion
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from services.report_file import read_report_columns
+
+ROWS = 50_000
+COLUMNS = 20
+REPEAT = 3
+
+
+def make_dataset() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(ROWS, COLUMNS))
+    data[rng.random(size=data.shape) < 0.05] = np.nan
+    return pd.DataFrame(data, columns=[f"column {index}" for index in range(COLUMNS)])
+
+
+def write_dataset(df: pd.DataFrame, directory: str) -> dict:
+    file_paths = {extension: os.path.join(directory, f"dataset.{extension}") for extension in
+                  ["xlsx", "csv", "parquet"]}
+    df.to_excel(file_paths["xlsx"], index=False)
+    df.to_csv(file_paths["csv"], index=False)
+    df.to_parquet(file_paths["parquet"], index=False)
+    return file_paths
+
+
+def run():
+    with tempfile.TemporaryDirectory() as directory:
+        file_paths = write_dataset(make_dataset(), directory)
+        print(f"{ROWS} rows x {COLUMNS} columns")
+        for extension, file_path in file_paths.items():
+            seconds = min(timeit.repeat(lambda: read_report_columns(file_path), number=1, repeat=REPEAT))
+            megabytes = os.path.getsize(file_path) / 1024 / 1024
+            print(f"{extension:>8}: {seconds:.3f}s, {ROWS / seconds:,.0f} rows/s, {megabytes:.1f} MB on disk")
+
+
+if __name__ == "__main__":
+    run()
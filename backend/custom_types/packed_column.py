@@ -0,0 +1,75 @@
+import os
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+PACKED_DATA_TYPES = ('float64', 'float32')
+
+
+def pack_column(column_values: np.ndarray, data_type: str = 'float64') -> Tuple[bytes, bytes]:
+    """Pack a column into raw little-endian floats plus a bitmap with one bit per null value."""
+    if data_type not in PACKED_DATA_TYPES:
+        raise ValueError(f"Column data type must be one of {PACKED_DATA_TYPES}")
+    column_values = np.asarray(column_values, dtype=np.float64)
+    null_mask = np.isnan(column_values)
+    return column_values.astype(np.dtype(data_type).newbyteorder('<')).tobytes(), np.packbits(null_mask).tobytes()
+
+
+def unpack_column(packed_data: bytes, null_bitmap: bytes, data_type: str = 'float64') -> np.ndarray:
+    """Rebuild a float64 column with NaN for nulls, without creating a Python object per value."""
+    column_values = np.frombuffer(packed_data, dtype=np.dtype(data_type).newbyteorder('<')).astype(np.float64)
+    null_mask = np.unpackbits(np.frombuffer(null_bitmap, dtype=np.uint8), count=column_values.size).view(bool)
+    column_values[null_mask] = np.nan
+    return column_values
+
+
+def cast_to_storage(column_values: np.ndarray, data_type: str = 'float64') -> np.ndarray:
+    """The float64 values a column reads back as once stored with `data_type`."""
+    column_values = np.asarray(column_values, dtype=np.float64)
+    if data_type == 'float64':
+        return column_values
+    return column_values.astype(data_type).astype(np.float64)
+
+
+def summarize_column(column_values: np.ndarray) -> Dict[str, Any]:
+    """Summary statistics kept in Mongo, so a spilled column can be described without opening its file."""
+    present_values = column_values[~np.isnan(column_values)]
+    return {
+        'count': int(column_values.size),
+        'null_count': int(column_values.size - present_values.size),
+        'sum': float(present_values.sum()),
+        'min': float(present_values.min()) if present_values.size else None,
+        'max': float(present_values.max()) if present_values.size else None,
+    }
+
+
+def save_spilled_column(file_path: str, column_values: np.ndarray, data_type: str = 'float64'):
+    """Write the column to a .npy file through a temporary name, so readers never map a partial file."""
+    if data_type not in PACKED_DATA_TYPES:
+        raise ValueError(f"Column data type must be one of {PACKED_DATA_TYPES}")
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temp_path = f"{file_path}.part"
+    with open(temp_path, "wb") as spill_file:
+        np.save(spill_file, np.asarray(column_values, dtype=np.float64).astype(data_type))
+    os.replace(temp_path, file_path)
+
+
+def load_spilled_column(file_path: str) -> np.ndarray:
+    """Memory-map a spilled column read-only, float32 columns are widened to float64 on load."""
+    column_values = np.load(file_path, mmap_mode='r')
+    if column_values.dtype != np.float64:
+        return column_values.astype(np.float64)
+    return column_values
+
+
+def pack_upper_triangle(matrix: np.ndarray) -> bytes:
+    """Keep the upper triangle of a symmetric matrix, diagonal included, as little-endian float32."""
+    return matrix[np.triu_indices(matrix.shape[0])].astype(np.dtype('float32').newbyteorder('<')).tobytes()
+
+
+def unpack_upper_triangle(packed_matrix: bytes, size: int) -> np.ndarray:
+    upper_triangle = np.triu_indices(size)
+    matrix = np.empty((size, size))
+    matrix[upper_triangle] = np.frombuffer(packed_matrix, dtype=np.dtype('float32').newbyteorder('<'))
+    matrix.T[upper_triangle] = matrix[upper_triangle]
+    return matrix
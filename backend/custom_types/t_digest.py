@@ -0,0 +1,82 @@
+from typing import Optional
+
+import numpy as np
+
+TDIGEST_COMPRESSION = 200.0
+SERIALIZED_TYPE = np.dtype('<f8')
+
+
+class TDigest:
+    """Merging t-digest: sorted centroids (mean, weight) whose size shrinks towards the tails.
+
+    Digests of at most `compression` values keep every value as its own centroid, so quantiles of small
+    columns are exact. Centroids are grouped by the integer part of the k1 scale function, which bounds the
+    rank error near the tails much more tightly than around the median.
+    """
+
+    def __init__(self, means: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None,
+                 minimum: float = np.nan, maximum: float = np.nan, compression: float = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_values(cls, column_values: np.ndarray, compression: float = TDIGEST_COMPRESSION) -> "TDigest":
+        column_values = np.asarray(column_values, dtype=np.float64)
+        column_values = np.sort(column_values[~np.isnan(column_values)])
+        if not column_values.size:
+            return cls(compression=compression)
+        return cls(compression=compression, minimum=float(column_values[0]),
+                   maximum=float(column_values[-1])).compress(column_values, np.ones(column_values.size))
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    def compress(self, means: np.ndarray, weights: np.ndarray) -> "TDigest":
+        """Group centroids that are already sorted by mean, in one vectorized pass."""
+        total = weights.sum()
+        if total <= self.compression:
+            self.means, self.weights = means, weights
+            return self
+        middle_quantiles = (np.cumsum(weights) - weights / 2) / total
+        scale = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * middle_quantiles - 1))
+        groups = np.concatenate(([0], np.cumsum(scale[1:] != scale[:-1])))
+        self.weights = np.bincount(groups, weights=weights)
+        self.means = np.bincount(groups, weights=weights * means) / self.weights
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        means = np.concatenate((self.means, other.means))
+        order = np.argsort(means, kind='stable')
+        return TDigest(compression=self.compression, minimum=np.fmin(self.minimum, other.minimum),
+                       maximum=np.fmax(self.maximum, other.maximum)).compress(
+            means[order], np.concatenate((self.weights, other.weights))[order])
+
+    def quantile(self, quantile: float) -> Optional[float]:
+        """Linear interpolation between centroid centres, matching np.quantile while centroids are single values."""
+        if not self.weights.size:
+            return None
+        centres = np.cumsum(self.weights) - (self.weights + 1) / 2
+        positions = np.concatenate(([0], centres, [self.count - 1]))
+        values = np.concatenate(([self.minimum], self.means, [self.maximum]))
+        return float(np.interp(quantile * (self.count - 1), positions, values))
+
+    def count_below(self, value: float, inclusive: bool = False) -> int:
+        """Number of values below `value` (or equal to it when inclusive), exact for single-value centroids."""
+        side = 'right' if inclusive else 'left'
+        return int(np.concatenate(([0], np.cumsum(self.weights)))[np.searchsorted(self.means, value, side=side)])
+
+    def to_bytes(self) -> bytes:
+        header = np.array([self.compression, self.minimum, self.maximum], dtype=SERIALIZED_TYPE)
+        return header.tobytes() + self.means.astype(SERIALIZED_TYPE).tobytes() + \
+            self.weights.astype(SERIALIZED_TYPE).tobytes()
+
+    @classmethod
+    def from_bytes(cls, serialized: bytes) -> "TDigest":
+        values = np.frombuffer(serialized, dtype=SERIALIZED_TYPE).astype(np.float64)
+        compression, minimum, maximum = values[:3]
+        means, weights = np.split(values[3:], 2)
+        return cls(means, weights, float(minimum), float(maximum), float(compression))
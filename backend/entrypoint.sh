@@ -3,4 +3,7 @@
 echo "Running migrations..."
 python run_migrations.py
 
+echo "Backfilling indicator values..."
+python run_backfill.py
+
 exec "$@"
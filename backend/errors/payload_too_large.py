@@ -0,0 +1,2 @@
+class PayloadTooLargeError(Exception):
+    pass
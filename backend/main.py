@@ -8,12 +8,14 @@ from fastapi.security import OAuth2PasswordRequestForm
 from mongoengine import connect
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
 
 from routers.admin import router as admin_router
 from routers.customer import router as customer_router
 from routers.report import router as report_router
+from services.report_file import MAX_UPLOAD_BYTES
 from services.user import create_token
+from services.utils import NEXT_CURSOR_HEADER
 
 logging.basicConfig(level=logging.INFO,
                     format="%(levelname)s:  %(asctime)s  %(message)s",
@@ -31,6 +33,15 @@ FRONTEND_URL = os.getenv("FRONTEND_URL")
 ALLOWED_METHODS = "GET, POST, PUT, DELETE, OPTIONS"
 
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        return JSONResponse(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            content={"detail": f"Request body exceeds the limit of {MAX_UPLOAD_BYTES} bytes"})
+    return await call_next(request)
+
+
 @app.middleware("http")
 async def add_cors_headers(request: Request, call_next):
     response = await call_next(request)
@@ -39,6 +50,7 @@ async def add_cors_headers(request: Request, call_next):
     response.headers["Access-Control-Allow-Methods"] = ALLOWED_METHODS
     response.headers["Access-Control-Request-Method"] = ALLOWED_METHODS
     response.headers["Access-Control-Allow-Headers"] = "content-type, set-cookie"
+    response.headers["Access-Control-Expose-Headers"] = NEXT_CURSOR_HEADER
     response.headers["Access-Control-Allow-Private-Network"] = "true"
     return response
 
@@ -0,0 +1,42 @@
+import logging
+import os
+
+import numpy as np
+from mongoengine import connect
+
+from models.report_column import ReportColumn
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+COLUMN_DATA_TYPE = os.getenv("COLUMN_DATA_TYPE", "float64")
+BATCH_SIZE = 500
+
+logging.basicConfig(level=logging.INFO,
+                    format="%(levelname)s:  %(asctime)s  %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+
+class Migration:
+    def run(self):
+        connect(host=MONGODB_URL)
+
+        collection = ReportColumn._get_collection()
+        legacy_columns = collection.find({'packed_data': None, 'column_data.0': {'$exists': True}},
+                                         {'column_data': 1}, batch_size=BATCH_SIZE)
+        converted = 0
+        for document in legacy_columns:
+            report_column = ReportColumn(id=document['_id'])
+            report_column.set_column_values(np.array(document['column_data'], dtype=np.float64), COLUMN_DATA_TYPE)
+            collection.update_one({'_id': document['_id'], 'packed_data': None},
+                                  {'$set': {'packed_data': report_column.packed_data,
+                                            'null_bitmap': report_column.null_bitmap,
+                                            'data_type': report_column.data_type,
+                                            'column_data': [],
+                                            'summary': report_column.summary,
+                                            'quantile_sketch': report_column.quantile_sketch}})
+            converted += 1
+        logging.info(f"{converted} report columns converted to the packed format.")
+
+
+if __name__ == "__main__":
+    migration = Migration()
+    migration.run()
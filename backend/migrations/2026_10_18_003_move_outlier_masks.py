@@ -0,0 +1,41 @@
+import logging
+import os
+
+from mongoengine import connect
+
+from models.outlier_mask import OutlierMask
+from models.report_column import ReportColumn
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+BATCH_SIZE = 500
+
+logging.basicConfig(level=logging.INFO,
+                    format="%(levelname)s:  %(asctime)s  %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+
+class Migration:
+    def run(self):
+        connect(host=MONGODB_URL)
+
+        collection = ReportColumn._get_collection()
+        columns_with_masks = collection.find({'outlier_masks': {'$exists': True}}, {'outlier_masks': 1},
+                                             batch_size=BATCH_SIZE)
+        moved = 0
+        for document in columns_with_masks:
+            outlier_masks = document['outlier_masks']
+            OutlierMask.objects(column=document['_id']).delete()
+            for method, outlier_mask in outlier_masks.items():
+                OutlierMask(column=document['_id'], method=method, rows=outlier_mask['rows'],
+                            mask=bytes(outlier_mask['mask'])).save()
+            collection.update_one({'_id': document['_id']},
+                                  {'$set': {'outlier_counts': {method: outlier_mask['count'] for method, outlier_mask
+                                                               in outlier_masks.items()}},
+                                   '$unset': {'outlier_masks': ''}})
+            moved += 1
+        logging.info(f"Outlier masks of {moved} report columns moved out of the column documents.")
+
+
+if __name__ == "__main__":
+    migration = Migration()
+    migration.run()
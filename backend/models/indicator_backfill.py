@@ -0,0 +1,12 @@
+from mongoengine import DateTimeField, Document, IntField, ListField, SequenceField, StringField
+
+
+class IndicatorBackfill(Document):
+    id = SequenceField(primary_key=True)
+    stage = StringField(required=True)
+    last_column_id = IntField(default=0)
+    columns_processed = IntField(default=0)
+    values_created = IntField(default=0)
+    indicator_ids = ListField(IntField(), default=list)
+    date_started = DateTimeField(required=True)
+    date_updated = DateTimeField(required=False, default=None)
@@ -0,0 +1,14 @@
+from mongoengine import BinaryField, Document, IntField, StringField
+
+
+class OutlierMask(Document):
+    """Outlier rows of one method for one report column, packed with one bit per row.
+
+    Kept out of ReportColumn so loading a column never carries O(rows) bytes of masks.
+    """
+    column = IntField(required=True)
+    method = StringField(required=True)
+    rows = IntField(required=True)
+    mask = BinaryField(required=True)
+
+    meta = {'indexes': [('column', 'method')]}
@@ -1,7 +1,7 @@
 from models.report_column import ReportColumn
 from models.user import User
-from mongoengine import BooleanField, CASCADE, DateTimeField, Document, ListField, PULL, ReferenceField, SequenceField, \
-    StringField
+from mongoengine import BinaryField, BooleanField, CASCADE, DateTimeField, Document, IntField, ListField, PULL, \
+    ReferenceField, SequenceField, StringField
 
 from errors.not_found import NotFoundError
 
@@ -15,6 +15,15 @@ class Report(Document):
     fits_correlation_analysis = BooleanField(required=True)
     fits_discriminant_analysis = BooleanField(required=True)
     is_active = BooleanField(default=True)
+    content_hash = StringField(required=False, default=None)
+    analysis_version = IntField(required=False, default=None)
+    correlation_columns = ListField(StringField())
+    pearson_correlations = BinaryField(required=False, default=None)
+    spearman_correlations = BinaryField(required=False, default=None)
+    revision = IntField(default=0)
+    date_modified = DateTimeField(required=False, default=None)
+
+    meta = {'indexes': [('content_hash', 'analysis_version'), ('user', 'is_active', '-date_uploaded', '-id')]}
 
     def to_dict(self):
         if self.is_active:
@@ -1,24 +1,70 @@
+import numpy as np
 from errors.not_found import NotFoundError
 from models.indicator_value import IndicatorValue
-from mongoengine import BooleanField, Document, ListField, PULL, ReferenceField, \
-    SequenceField, StringField
+from mongoengine import BinaryField, BooleanField, DictField, Document, FloatField, IntField, ListField, PULL, \
+    ReferenceField, SequenceField, StringField
 
 from custom_types.nullable_floatField import NullableFloatField
+from custom_types.packed_column import cast_to_storage, load_spilled_column, pack_column, save_spilled_column, \
+    summarize_column, unpack_column
+from custom_types.t_digest import TDigest
 
 
 class ReportColumn(Document):
     id = SequenceField(primary_key=True)
     name = StringField(required=True)
-    column_data = ListField(NullableFloatField(), required=True)
+    column_data = ListField(NullableFloatField())
+    packed_data = BinaryField(required=False, default=None)
+    null_bitmap = BinaryField(required=False, default=None)
+    data_type = StringField(required=False, default=None)
+    spill_path = StringField(required=False, default=None)
+    summary = DictField()
+    quantile_sketch = BinaryField(required=False, default=None)
+    outlier_counts = DictField()
+    normality_statistic = FloatField(required=False, default=None)
+    normality_p_value = FloatField(required=False, default=None)
+    normality_sample_size = IntField(required=False, default=None)
+    normality_error_bound = FloatField(required=False, default=None)
     indicator_values = ListField(ReferenceField(IndicatorValue, reverse_delete_rule=PULL))
     is_active = BooleanField(default=True)
 
+    def set_column_values(self, column_values: np.ndarray, data_type: str = 'float64'):
+        column_values = cast_to_storage(column_values, data_type)
+        self.packed_data, self.null_bitmap = pack_column(column_values, data_type)
+        self.data_type = data_type
+        self.column_data = []
+        self.summary = summarize_column(column_values)
+        self.quantile_sketch = TDigest.from_values(column_values).to_bytes()
+
+    def spill_column_values(self, column_values: np.ndarray, file_path: str, data_type: str = 'float64'):
+        column_values = cast_to_storage(column_values, data_type)
+        save_spilled_column(file_path, column_values, data_type)
+        self.spill_path = file_path
+        self.packed_data, self.null_bitmap = None, None
+        self.data_type = data_type
+        self.column_data = []
+        self.summary = summarize_column(column_values)
+        self.quantile_sketch = TDigest.from_values(column_values).to_bytes()
+
+    def get_column_values(self) -> np.ndarray:
+        if self.spill_path is not None:
+            return load_spilled_column(self.spill_path)
+        if self.packed_data is not None:
+            return unpack_column(self.packed_data, self.null_bitmap, self.data_type)
+        return np.array(self.column_data, dtype=np.float64)
+
+    def get_quantile_sketch(self) -> TDigest:
+        if self.quantile_sketch is not None:
+            return TDigest.from_bytes(self.quantile_sketch)
+        return TDigest.from_values(self.get_column_values())
+
     def to_dict(self):
         if self.is_active:
             return {
                 'id': self.id,
                 'name': self.name,
-                'column_data': ['None' if not column_value else column_value for column_value in self.column_data],
+                'column_data': ['None' if not column_value or np.isnan(column_value) else column_value
+                                for column_value in self.get_column_values().tolist()],
                 'indicator_values': ['' if not indicator_value else indicator_value.to_dict() for indicator_value in
                                      self.indicator_values],
             }
@@ -0,0 +1,24 @@
+from mongoengine import CASCADE, DateTimeField, Document, IntField, ReferenceField, SequenceField, StringField
+
+from models.user import User
+
+
+class ReportJob(Document):
+    id = SequenceField(primary_key=True)
+    user = ReferenceField(User, reverse_delete_rule=CASCADE, required=True)
+    file_path = StringField(required=True)
+    content_hash = StringField(required=False, default=None)
+    stage = StringField(required=True)
+    progress = IntField(default=0)
+    report = IntField(required=False, default=None)
+    error = StringField(required=False, default=None)
+    date_created = DateTimeField(required=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'stage': self.stage,
+            'progress': self.progress,
+            'report': self.report,
+            'error': self.error
+        }
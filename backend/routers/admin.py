@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
@@ -7,6 +8,7 @@ from fastapi.security import OAuth2PasswordBearer
 from models.user import User
 from passlib.context import CryptContext
 from services.user import get_current_user
+from services.utils import PAGE_SIZE
 from starlette import status
 from starlette.responses import JSONResponse, Response
 
@@ -48,11 +50,15 @@ def delete_child_admin_route(admin_to_delete_id: int, current_user: User = Depen
 
 
 @router.get("/children", status_code=status.HTTP_200_OK)
-def get_current_admin_children_route(current_user: User = Depends(get_current_user)):
+def get_current_admin_children_route(fields: Optional[str] = None, cursor: Optional[str] = None,
+                                     limit: int = PAGE_SIZE, current_user: User = Depends(get_current_user)):
     try:
-        return JSONResponse(content=get_admin_children_by_current_user(current_user).to_json())  # type: ignore
+        page = get_admin_children_by_current_user(current_user, fields, cursor, limit)
+        return JSONResponse(content=page.to_json(), headers=page.headers)  # type: ignore
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except BadRequestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/me", status_code=status.HTTP_200_OK)
@@ -64,11 +70,15 @@ def get_current_admin_route(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def get_admins_route(current_user: User = Depends(get_current_user)):
+def get_admins_route(fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+                     current_user: User = Depends(get_current_user)):
     try:
-        return Response(content=get_admins(current_user).to_json())
+        page = get_admins(current_user, fields, cursor, limit)
+        return Response(content=page.to_json(), headers=page.headers)
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except BadRequestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.put("/me", status_code=status.HTTP_200_OK)
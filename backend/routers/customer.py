@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from pydantic import EmailStr
 from starlette import status
@@ -8,13 +9,15 @@ from fastapi.security import OAuth2PasswordBearer
 
 from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
+from errors.payload_too_large import PayloadTooLargeError
 from models.user import User
 from passlib.context import CryptContext
 from schemas.customer import CustomerCreate, CustomerUpdate
 from services.customer import create_customer, delete_customer, get_current_customer, update_customer, \
     delete_customer_by_admin, get_customers
-from services.report import create_report
+from services.report_job import create_report_job
 from services.user import get_current_user
+from services.utils import PAGE_SIZE
 
 logging.basicConfig(level=logging.INFO,
                     format="%(levelname)s:%(asctime)s%(message)s",
@@ -64,11 +67,15 @@ def delete_customer_by_admin_route(customer_id: int, current_user: User = Depend
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def get_customers_route(current_user: User = Depends(get_current_user)):
+def get_customers_route(fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+                        current_user: User = Depends(get_current_user)):
     try:
-        return Response(content=get_customers(current_user).to_json())
+        page = get_customers(current_user, fields, cursor, limit)
+        return Response(content=page.to_json(), headers=page.headers)
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except BadRequestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.put("/me", status_code=status.HTTP_200_OK)
@@ -84,8 +91,10 @@ def update_customer_route(customer_body: CustomerUpdate, current_user: User = De
 @router.post("/upload_report", status_code=status.HTTP_200_OK)
 async def upload_report_route(report: UploadFile, current_user: User = Depends(get_current_user)):
     try:
-        return await create_report(report, current_user)
+        return await create_report_job(report, current_user)
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except BadRequestError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PayloadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
@@ -1,15 +1,21 @@
 import logging
 import os
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from starlette import status
 from starlette.responses import FileResponse, JSONResponse, Response
 
+from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
 from models.user import User
 from services.report import get_current_customer_report, get_current_customer_reports, delete_report, get_report_file, \
-    get_report_indicator_values
+    get_report_indicator_values, get_current_customer_aggregates, get_report_correlations, \
+    get_report_column_outliers, get_report_validators, REPORT_FILE_RESOURCE, REPORT_INDICATOR_VALUES_RESOURCE, \
+    REPORT_RESOURCE
+from services.report_job import get_report_job
 from services.user import get_current_user
+from services.utils import PAGE_SIZE
 
 logging.basicConfig(level=logging.INFO,
                     format="%(levelname)s:%(asctime)s%(message)s",
@@ -21,17 +27,41 @@ router = APIRouter(prefix="/report",
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def get_reports_route(current_user: User = Depends(get_current_user)):
+def get_reports_route(fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+                      current_user: User = Depends(get_current_user)):
     try:
-        return Response(content=get_current_customer_reports(current_user).to_json())
+        page = get_current_customer_reports(current_user, fields, cursor, limit)
+        return Response(content=page.to_json(), headers=page.headers)
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except BadRequestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/aggregates", status_code=status.HTTP_200_OK)
+def get_report_aggregates_route(current_user: User = Depends(get_current_user)):
+    try:
+        return JSONResponse(status_code=status.HTTP_200_OK, content=get_current_customer_aggregates(current_user))
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+def get_report_job_route(job_id: int, current_user: User = Depends(get_current_user)):
+    try:
+        return JSONResponse(status_code=status.HTTP_200_OK, content=get_report_job(job_id, current_user).to_dict())
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @router.get("/{report_id}", status_code=status.HTTP_200_OK)
-def get_report_route(report_id: int, current_user: User = Depends(get_current_user)):
+def get_report_route(report_id: int, if_none_match: Optional[str] = Header(None),
+                     if_modified_since: Optional[str] = Header(None), current_user: User = Depends(get_current_user)):
     try:
-        return Response(status_code=status.HTTP_200_OK,
+        validators = get_report_validators(report_id, REPORT_RESOURCE, current_user)
+        if validators.not_modified(if_none_match, if_modified_since):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+        return Response(status_code=status.HTTP_200_OK, headers=validators.headers,
                         content=get_current_customer_report(report_id, current_user).to_json())
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -47,15 +77,49 @@ def delete_report_route(report_id: int, current_user: User = Depends(get_current
 
 
 @router.get("/{report_id}/indicator_values", status_code=status.HTTP_200_OK)
-def indicator_values_route(report_id: int, current_user: User = Depends(get_current_user)):
+def indicator_values_route(report_id: int, if_none_match: Optional[str] = Header(None),
+                           if_modified_since: Optional[str] = Header(None),
+                           current_user: User = Depends(get_current_user)):
+    try:
+        validators = get_report_validators(report_id, REPORT_INDICATOR_VALUES_RESOURCE, current_user)
+        if validators.not_modified(if_none_match, if_modified_since):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+        return JSONResponse(status_code=status.HTTP_200_OK, headers=validators.headers,
+                            content=get_report_indicator_values(report_id, current_user))
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/{report_id}/correlations", status_code=status.HTTP_200_OK)
+def report_correlations_route(report_id: int, current_user: User = Depends(get_current_user)):
+    try:
+        return JSONResponse(status_code=status.HTTP_200_OK, content=get_report_correlations(report_id, current_user))
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/{report_id}/columns/{column_id}/outliers", status_code=status.HTTP_200_OK)
+def report_column_outliers_route(report_id: int, column_id: int, method: str = "iqr",
+                                 current_user: User = Depends(get_current_user)):
     try:
         return JSONResponse(status_code=status.HTTP_200_OK,
-                        content=get_report_indicator_values(report_id, current_user))
+                            content=get_report_column_outliers(report_id, column_id, method, current_user))
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except BadRequestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/{report_id}/file")
-async def get_report_file_route(report_id: int, current_user: User = Depends(get_current_user)):
-    file_path = get_report_file(report_id, current_user)
-    return FileResponse(path=file_path, filename=os.path.basename(file_path), media_type='application/octet-stream')
+async def get_report_file_route(report_id: int, if_none_match: Optional[str] = Header(None),
+                                if_modified_since: Optional[str] = Header(None),
+                                current_user: User = Depends(get_current_user)):
+    try:
+        validators = get_report_validators(report_id, REPORT_FILE_RESOURCE, current_user)
+        if validators.not_modified(if_none_match, if_modified_since):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+        file_path = get_report_file(report_id, current_user)
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return FileResponse(path=file_path, filename=os.path.basename(file_path), media_type='application/octet-stream',
+                        headers=validators.headers)
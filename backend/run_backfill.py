@@ -0,0 +1,12 @@
+import os
+
+from mongoengine import connect
+
+from services.indicator_backfill import run_indicator_backfill
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+
+
+if __name__ == "__main__":
+    connect(host=MONGODB_URL)
+    run_indicator_backfill()
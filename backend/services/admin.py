@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import List, Optional
 
 from errors.bad_request import BadRequestError
 from errors.forbidden import ForbiddenError
@@ -9,10 +9,12 @@ from models.admin import Admin
 from models.role import Role
 from models.user import User
 from schemas.admin import AdminCreate, AdminUpdate
-from services.user import create_token, get_current_user, get_password_hash, get_user_by_email
-from services.utils import check_admin_access, generate_password
+from services.user import USER_LIST_FIELDS, create_token, get_current_user, get_password_hash, get_user_by_email
+from services.utils import PAGE_SIZE, Page, check_admin_access, generate_password, paginate, select_fields
 from starlette.responses import JSONResponse
 
+ADMIN_LIST_FIELDS = USER_LIST_FIELDS + ('parent_admin',)
+
 
 def validate_parent(current_user: User, parent_admin_id: int, error_message: str):
     if not (parent_admin := Admin.objects(id=parent_admin_id, is_active=True).first()):
@@ -65,19 +67,24 @@ def get_current_admin(current_user: User = Depends(get_current_user)) -> Admin:
     return admin
 
 
-def get_admin_children_by_current_user(current_user: User = Depends(get_current_user)) -> List[Admin]:
+def get_admin_children_by_current_user(current_user: User = Depends(get_current_user), fields: Optional[str] = None,
+                                       cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
     validate_parent(current_user, current_user.id, "get")
-    return Admin.objects(parent_admin=current_user.id, is_active=True)
+    children = Admin.objects(parent_admin=current_user.id, is_active=True).only(
+        *select_fields(fields, ADMIN_LIST_FIELDS, ADMIN_LIST_FIELDS))
+    return paginate(children, cursor, limit)
 
 
 def get_admin_children(admin: Admin) -> List[Admin]:
     return Admin.objects(is_active=True, parent_admin=admin)
 
 
-def get_admins(current_user: User = Depends(get_current_user)) -> List[Admin]:
+def get_admins(current_user: User = Depends(get_current_user), fields: Optional[str] = None,
+               cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
     if not current_user or not Admin.objects(id=current_user.id, is_active=True).first():
         raise NotFoundError("Could not get admins. Current user is not a valid admin")
-    return Admin.objects(is_active=True)
+    admins = Admin.objects(is_active=True).only(*select_fields(fields, ADMIN_LIST_FIELDS, ADMIN_LIST_FIELDS))
+    return paginate(admins, cursor, limit)
 
 
 def update_admin(admin_update: AdminUpdate, current_user: User = Depends(get_current_user)) -> None:
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Optional
 
 from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
@@ -7,7 +7,8 @@ from models.customer import Customer
 from models.role import Role
 from models.user import User
 from schemas.customer import CustomerCreate, CustomerUpdate
-from services.user import create_token, get_current_user, get_password_hash, get_user_by_email
+from services.user import USER_LIST_FIELDS, create_token, get_current_user, get_password_hash, get_user_by_email
+from services.utils import PAGE_SIZE, Page, paginate, select_fields
 from starlette.responses import JSONResponse
 
 from models.admin import Admin
@@ -58,10 +59,12 @@ def get_current_customer(current_user: User = Depends(get_current_user)) -> Opti
     return customer
 
 
-def get_customers(current_user: User = Depends(get_current_user)) -> List[Customer]:
+def get_customers(current_user: User = Depends(get_current_user), fields: Optional[str] = None,
+                  cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
     if not current_user or not Admin.objects(id=current_user.id, is_active=True).first():
         raise NotFoundError("Could not get customers. Current user is not a valid admin")
-    return Customer.objects(is_active=True)
+    customers = Customer.objects(is_active=True).only(*select_fields(fields, USER_LIST_FIELDS, USER_LIST_FIELDS))
+    return paginate(customers, cursor, limit)
 
 
 def update_customer(customer_update: CustomerUpdate, current_user: User = Depends(get_current_user)) -> None:
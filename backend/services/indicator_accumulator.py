@@ -0,0 +1,310 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from custom_types.t_digest import TDigest
+from errors.bad_request import BadRequestError
+from services.indicator_value import calculation_methods
+
+# Values sampled per column for approximate calculations that have no dedicated accumulator.
+ACCUMULATOR_SAMPLE_SIZE = int(os.getenv("ACCUMULATOR_SAMPLE_SIZE", "10000"))
+# Distinct values tracked per column by the approximate mode counter.
+MODE_COUNTER_CAPACITY = int(os.getenv("MODE_COUNTER_CAPACITY", "1000"))
+ACCUMULATOR_SEED = 0
+
+
+def present_values(chunk: np.ndarray) -> np.ndarray:
+    chunk = np.asarray(chunk, dtype=np.float64)
+    return chunk[~np.isnan(chunk)]
+
+
+class IndicatorAccumulator(ABC):
+    """Consumes a column chunk by chunk, nulls included, and can be merged with an accumulator of the same kind."""
+
+    @abstractmethod
+    def update(self, chunk: np.ndarray) -> None:
+        ...
+
+    @abstractmethod
+    def merge(self, other: "IndicatorAccumulator") -> "IndicatorAccumulator":
+        ...
+
+    @abstractmethod
+    def result(self) -> Optional[float]:
+        ...
+
+
+class MomentAccumulator(IndicatorAccumulator):
+    """Welford mean and variance, chunks and accumulators are combined with Chan's parallel formula."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def combine(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, chunk: np.ndarray) -> None:
+        values = present_values(chunk)
+        if values.size:
+            chunk_mean = float(values.mean())
+            self.combine(values.size, chunk_mean, float(np.square(values - chunk_mean).sum()))
+
+    def merge(self, other: "MomentAccumulator") -> "MomentAccumulator":
+        if other.count:
+            self.combine(other.count, other.mean, other.m2)
+        return self
+
+    @property
+    def variance(self) -> Optional[float]:
+        return self.m2 / self.count if self.count else None
+
+    def result(self) -> Optional[float]:
+        return self.mean if self.count else None
+
+
+class RangeAccumulator(IndicatorAccumulator):
+    def __init__(self):
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, chunk: np.ndarray) -> None:
+        values = present_values(chunk)
+        if values.size:
+            self.minimum = min(self.minimum, float(values.min()))
+            self.maximum = max(self.maximum, float(values.max()))
+
+    def merge(self, other: "RangeAccumulator") -> "RangeAccumulator":
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def result(self) -> Optional[float]:
+        return self.maximum - self.minimum if self.maximum >= self.minimum else None
+
+
+class ModeAccumulator(IndicatorAccumulator):
+    """Value counts, bounded to `capacity` distinct values with the mergeable Misra-Gries summary when set.
+
+    A bounded counter keeps every value that occurs in more than count / (capacity + 1) rows, so a clear mode
+    is always found. Ties are broken towards the smallest value, like calculate_mode.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity
+        self.counts: Dict[float, int] = {}
+
+    def add_counts(self, values: Iterable[float], counts: Iterable[int]):
+        for value, count in zip(values, counts):
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if self.capacity and len(self.counts) > self.capacity:
+            threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {value: count - threshold for value, count in self.counts.items() if count > threshold}
+
+    def update(self, chunk: np.ndarray) -> None:
+        values, counts = np.unique(present_values(chunk), return_counts=True)
+        self.add_counts(values.tolist(), counts.tolist())
+
+    def merge(self, other: "ModeAccumulator") -> "ModeAccumulator":
+        self.add_counts(other.counts.keys(), other.counts.values())
+        return self
+
+    def result(self) -> Optional[float]:
+        if not self.counts:
+            return None
+        return float(min(self.counts.items(), key=lambda item: (-item[1], item[0]))[0])
+
+
+class ValuesAccumulator(IndicatorAccumulator):
+    """Exact fallback that keeps the present values and runs the registered calculation on them at the end."""
+
+    def __init__(self, calculation: Callable[[np.ndarray], float]):
+        self.calculation = calculation
+        self.chunks: List[np.ndarray] = []
+
+    def update(self, chunk: np.ndarray) -> None:
+        self.chunks.append(present_values(chunk))
+
+    def merge(self, other: "ValuesAccumulator") -> "ValuesAccumulator":
+        self.chunks.extend(other.chunks)
+        return self
+
+    def result(self) -> Optional[float]:
+        column_data = np.sort(np.concatenate(self.chunks)) if self.chunks else np.empty(0)
+        return self.calculation(column_data) if column_data.size else None
+
+
+class SampleAccumulator(IndicatorAccumulator):
+    """Uniform bottom-k sample: every value gets a random key and the `sample_size` smallest keys are kept.
+
+    Merging keeps the smallest keys of both samples, which is again a uniform sample of the union. Counting
+    indicators set `scale_to_count`, so their sample result is scaled to the full number of values.
+    """
+
+    def __init__(self, calculation: Callable[[np.ndarray], float], sample_size: int = ACCUMULATOR_SAMPLE_SIZE,
+                 scale_to_count: bool = False, seed: int = ACCUMULATOR_SEED):
+        self.calculation = calculation
+        self.sample_size = sample_size
+        self.scale_to_count = scale_to_count
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.keys = np.empty(0)
+        self.values = np.empty(0)
+
+    def keep_smallest_keys(self, keys: np.ndarray, values: np.ndarray):
+        if keys.size > self.sample_size:
+            kept = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, values = keys[kept], values[kept]
+        self.keys, self.values = keys, values
+
+    def update(self, chunk: np.ndarray) -> None:
+        values = present_values(chunk)
+        self.count += values.size
+        self.keep_smallest_keys(np.concatenate((self.keys, self.rng.random(values.size))),
+                                np.concatenate((self.values, values)))
+
+    def merge(self, other: "SampleAccumulator") -> "SampleAccumulator":
+        self.count += other.count
+        self.keep_smallest_keys(np.concatenate((self.keys, other.keys)), np.concatenate((self.values, other.values)))
+        return self
+
+    def result(self) -> Optional[float]:
+        if not self.values.size:
+            return None
+        sample_result = self.calculation(np.sort(self.values))
+        return sample_result * self.count / self.values.size if self.scale_to_count else sample_result
+
+
+class SketchAccumulator(IndicatorAccumulator):
+    """Folds every chunk into a t-digest, memory stays bounded by the digest compression."""
+
+    def __init__(self, calculation: Callable[[TDigest], Optional[float]]):
+        self.calculation = calculation
+        self.quantile_sketch = TDigest()
+
+    def update(self, chunk: np.ndarray) -> None:
+        self.quantile_sketch = self.quantile_sketch.merge(TDigest.from_values(chunk))
+
+    def merge(self, other: "SketchAccumulator") -> "SketchAccumulator":
+        self.quantile_sketch = self.quantile_sketch.merge(other.quantile_sketch)
+        return self
+
+    def result(self) -> Optional[float]:
+        return self.calculation(self.quantile_sketch) if self.quantile_sketch.count else None
+
+
+def calculate_sketch_outliers_number(quantile_sketch: TDigest) -> float:
+    q1 = quantile_sketch.quantile(.25)
+    q3 = quantile_sketch.quantile(.75)
+    iqr = q3 - q1
+    below_range = quantile_sketch.count_below(q1 - iqr)
+    above_range = quantile_sketch.count - quantile_sketch.count_below(q3 + iqr, inclusive=True)
+    return float(below_range + above_range)
+
+
+sketch_quantiles = {'median': .5, 'quartile q1': .25, 'quartile q2': .5, 'quartile q3': .75}
+
+accumulator_factories: Dict[str, Callable[[bool], IndicatorAccumulator]] = {}
+
+
+def register_accumulator(name: str):
+    """Factories receive `approximate` and return a fresh accumulator for one column."""
+    def decorator(func: Callable[[bool], IndicatorAccumulator]):
+        accumulator_factories[name] = func
+        return func
+
+    return decorator
+
+
+@register_accumulator('mean')
+def create_mean_accumulator(approximate: bool) -> IndicatorAccumulator:
+    return MomentAccumulator()
+
+
+@register_accumulator('variation range')
+def create_variation_range_accumulator(approximate: bool) -> IndicatorAccumulator:
+    return RangeAccumulator()
+
+
+@register_accumulator('mode')
+def create_mode_accumulator(approximate: bool) -> IndicatorAccumulator:
+    return ModeAccumulator(MODE_COUNTER_CAPACITY if approximate else None)
+
+
+@register_accumulator('outliers number')
+def create_outliers_number_accumulator(approximate: bool) -> IndicatorAccumulator:
+    if approximate:
+        return SketchAccumulator(calculate_sketch_outliers_number)
+    return ValuesAccumulator(calculation_methods['outliers number'])
+
+
+def create_quantile_accumulator_factory(indicator_name: str):
+    def create_quantile_accumulator(approximate: bool) -> IndicatorAccumulator:
+        if approximate:
+            return SketchAccumulator(lambda quantile_sketch: quantile_sketch.quantile(sketch_quantiles[indicator_name]))
+        return ValuesAccumulator(calculation_methods[indicator_name])
+
+    return create_quantile_accumulator
+
+
+for quantile_indicator_name in sketch_quantiles:
+    register_accumulator(quantile_indicator_name)(create_quantile_accumulator_factory(quantile_indicator_name))
+
+
+def create_accumulator(indicator_name: str, approximate: bool = False) -> IndicatorAccumulator:
+    """Registered accumulators first, any other registered calculation runs on the kept values or a sample."""
+    indicator_name = indicator_name.lower()
+    if factory := accumulator_factories.get(indicator_name):
+        return factory(approximate)
+    if not (calculation_method := calculation_methods.get(indicator_name)):
+        raise BadRequestError(f"No calculation method registered for {indicator_name}")
+    return SampleAccumulator(calculation_method) if approximate else ValuesAccumulator(calculation_method)
+
+
+def is_streamed_indicator(indicator_name: str, approximate: bool = False) -> bool:
+    """Indicators with a dedicated accumulator that does not keep the values of the column it consumes."""
+    return indicator_name.lower() in accumulator_factories and \
+        not isinstance(create_accumulator(indicator_name, approximate), ValuesAccumulator)
+
+
+class ReportAccumulator:
+    """Accumulators of every column of a report, fed the {column name: values} chunks of its reader."""
+
+    def __init__(self, indicator_names: List[str], approximate: bool = False):
+        self.indicator_names = indicator_names
+        self.approximate = approximate
+        self.column_accumulators: Dict[str, Dict[str, IndicatorAccumulator]] = {}
+
+    def update(self, chunk: Dict[str, np.ndarray]) -> None:
+        for column_name, column_values in chunk.items():
+            if column_name not in self.column_accumulators:
+                self.column_accumulators[column_name] = {
+                    indicator_name: create_accumulator(indicator_name, self.approximate)
+                    for indicator_name in self.indicator_names}
+            for accumulator in self.column_accumulators[column_name].values():
+                accumulator.update(column_values)
+
+    def results(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {column_name: {indicator_name: accumulator.result()
+                              for indicator_name, accumulator in accumulators.items()}
+                for column_name, accumulators in self.column_accumulators.items()}
+
+
+def accumulate_indicator_values(chunks: Iterable[Dict[str, np.ndarray]], indicator_names: List[str],
+                                approximate: bool = False) -> Dict[str, Dict[str, Optional[float]]]:
+    """Calculate indicators over a stream of {column name: values} chunks without keeping whole columns.
+
+    In exact mode the results match the registered calculations, in approximate mode memory per column is
+    bounded by ACCUMULATOR_SAMPLE_SIZE and MODE_COUNTER_CAPACITY.
+    """
+    report_accumulator = ReportAccumulator(indicator_names, approximate)
+    for chunk in chunks:
+        report_accumulator.update(chunk)
+    return report_accumulator.results()
@@ -0,0 +1,143 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models.indicator_backfill import IndicatorBackfill
+from models.indicator_value import IndicatorValue
+from models.report_column import ReportColumn
+from models.report_indicator import ReportIndicator
+from services.indicator_value import calculation_methods, create_indicator_values
+from services.report_job import connect_worker
+from services.utils import touch_reports
+
+INDICATOR_BACKFILL_WORKERS = int(os.getenv("INDICATOR_BACKFILL_WORKERS", "2"))
+INDICATOR_BACKFILL_BATCH_SIZE = int(os.getenv("INDICATOR_BACKFILL_BATCH_SIZE", "200"))
+
+BACKFILL_STAGE_RUNNING = "running"
+BACKFILL_STAGE_DONE = "done"
+
+logging.basicConfig(level=logging.INFO,
+                    format="%(levelname)s:  %(asctime)s  %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+
+def get_backfill_indicator_ids() -> List[int]:
+    indicator_ids = []
+    for report_indicator in ReportIndicator.objects():
+        if report_indicator.name.lower() in calculation_methods:
+            indicator_ids.append(report_indicator.id)
+        else:
+            logging.warning(f"Report indicator '{report_indicator.name}' has no calculation method, skipping it.")
+    return indicator_ids
+
+
+def iterate_column_batches(after_column_id: int, batch_size: int) -> Iterator[List[dict]]:
+    """Active columns in id order, so a checkpointed column id is enough to resume."""
+    batch = []
+    for report_column in ReportColumn._get_collection().find({'is_active': True, '_id': {'$gt': after_column_id}},
+                                                             {'indicator_values': 1}).sort('_id', 1):
+        batch.append(report_column)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_missing_indicators(column_batch: List[dict], indicator_ids: List[int]) -> List[Tuple[int, List[int]]]:
+    value_ids = [value_id for report_column in column_batch for value_id in report_column.get('indicator_values', [])]
+    value_indicators = {indicator_value['_id']: indicator_value.get('report_indicator') for indicator_value in
+                        IndicatorValue._get_collection().find({'_id': {'$in': value_ids}, 'is_active': True},
+                                                              {'report_indicator': 1})}
+    missing_pairs = []
+    for report_column in column_batch:
+        present = {value_indicators[value_id] for value_id in report_column.get('indicator_values', [])
+                   if value_id in value_indicators}
+        if missing := [indicator_id for indicator_id in indicator_ids if indicator_id not in present]:
+            missing_pairs.append((report_column['_id'], missing))
+    return missing_pairs
+
+
+def calculate_backfill_batch(missing_pairs: List[Tuple[int, List[int]]]) -> int:
+    """Runs in a worker. Columns missing the same indicators are calculated and written together."""
+    report_indicators = {report_indicator.id: report_indicator for report_indicator in ReportIndicator.objects(
+        id__in=list({indicator_id for _, indicator_ids in missing_pairs for indicator_id in indicator_ids}))}
+    report_columns = {report_column.id: report_column for report_column in
+                      ReportColumn.objects(id__in=[column_id for column_id, _ in missing_pairs])}
+    column_groups: Dict[Tuple[int, ...], List[ReportColumn]] = {}
+    for column_id, indicator_ids in missing_pairs:
+        column_groups.setdefault(tuple(indicator_ids), []).append(report_columns[column_id])
+    for indicator_ids, group_columns in column_groups.items():
+        create_indicator_values(group_columns, [report_indicators[indicator_id] for indicator_id in indicator_ids])
+    touch_reports(columns__in=list(report_columns))
+    return sum(len(indicator_ids) for _, indicator_ids in missing_pairs)
+
+
+def get_backfill_executor() -> Executor:
+    return ProcessPoolExecutor(max_workers=INDICATOR_BACKFILL_WORKERS,
+                               mp_context=multiprocessing.get_context("spawn"), initializer=connect_worker)
+
+
+def run_indicator_backfill(executor: Optional[Executor] = None,
+                           batch_size: int = INDICATOR_BACKFILL_BATCH_SIZE) -> IndicatorBackfill:
+    """Create the indicator values that active columns are missing, resuming an interrupted run if there is one.
+
+    Uploads calculate every indicator that exists at the time, so once a run is done it only has to run again
+    for indicators it did not cover. Otherwise the last finished run is returned without scanning any column.
+    A resumed run keeps the indicators it was started with.
+    Batches run on the worker pool with at most two per worker in flight. The checkpoint only moves past a
+    batch once it and every batch before it are written, so an interrupted run never skips a column.
+    """
+    if not (backfill := IndicatorBackfill.objects(stage=BACKFILL_STAGE_RUNNING).order_by('-id').first()):
+        indicator_ids = get_backfill_indicator_ids()
+        last_backfill = IndicatorBackfill.objects(stage=BACKFILL_STAGE_DONE).order_by('-id').first()
+        if last_backfill and set(indicator_ids) <= set(last_backfill.indicator_ids):
+            logging.info(f"Indicator backfill {last_backfill.id} already covers every report indicator, skipping.")
+            return last_backfill
+        backfill = IndicatorBackfill(stage=BACKFILL_STAGE_RUNNING, date_started=datetime.now(),
+                                     indicator_ids=indicator_ids).save()
+    else:
+        logging.info(f"Resuming indicator backfill with id = {backfill.id} after column {backfill.last_column_id}.")
+        if not backfill.indicator_ids:
+            backfill.update(set__indicator_ids=get_backfill_indicator_ids())
+            backfill.reload()
+        indicator_ids = list(backfill.indicator_ids)
+    own_executor = executor is None
+    executor = executor or get_backfill_executor()
+    max_pending = 2 * getattr(executor, '_max_workers', INDICATOR_BACKFILL_WORKERS)
+    started = time.monotonic()
+    values_created = 0
+    pending = deque()
+
+    def complete_oldest_batch():
+        nonlocal values_created
+        last_column_id, columns_processed, future = pending.popleft()
+        batch_values = future.result() if future else 0
+        values_created += batch_values
+        backfill.update(set__last_column_id=last_column_id, inc__columns_processed=columns_processed,
+                        inc__values_created=batch_values, set__date_updated=datetime.now())
+        backfill.reload()
+        elapsed = time.monotonic() - started
+        logging.info(f"Indicator backfill {backfill.id}: {backfill.columns_processed} columns processed, "
+                     f"{backfill.values_created} values created, {values_created / elapsed:.1f} values/s.")
+
+    try:
+        for column_batch in iterate_column_batches(backfill.last_column_id, batch_size):
+            missing_pairs = find_missing_indicators(column_batch, indicator_ids)
+            future = executor.submit(calculate_backfill_batch, missing_pairs) if missing_pairs else None
+            pending.append((column_batch[-1]['_id'], len(column_batch), future))
+            if len(pending) > max_pending:
+                complete_oldest_batch()
+        while pending:
+            complete_oldest_batch()
+    finally:
+        if own_executor:
+            executor.shutdown()
+    backfill.update(set__stage=BACKFILL_STAGE_DONE, set__date_updated=datetime.now())
+    backfill.reload()
+    return backfill
@@ -1,7 +1,7 @@
 import logging
 
 import numpy as np
-from scipy import stats
+from pymongo import UpdateOne
 from typing import Callable, Dict, List, Optional
 
 from errors.not_found import NotFoundError
@@ -18,70 +18,229 @@ from schemas.indicator_value import IndicatorValueCreate, IndicatorValueGet, Ind
     IndicatorValueGetByName, \
     IndicatorValuesGet
 
-from services.utils import filter_column_data
+from services.utils import allocate_sequence_ids, touch_reports
 
-calculation_methods: Dict[str, Callable[[List[float]], float]] = {}
+calculation_methods: Dict[str, Callable[[np.ndarray], float]] = {}
+batched_calculation_methods: Dict[str, Callable[[np.ndarray], np.ndarray]] = {}
+fused_calculation_methods: Dict[str, Callable[[np.ndarray], Dict[str, Optional[float]]]] = {}
+
+# Taller columns, and columns spilled to disk, are not stacked into batches and are calculated one at a time.
+BATCHED_COLUMN_MAX_ROWS = 1_000_000
 
 logging.basicConfig(level=logging.INFO,
                     format="%(levelname)s:  %(asctime)s  %(message)s",
                     datefmt="%Y-%m-%d %H:%M:%S")
 
 
-def register_calculation(name: str):
-    def decorator(func: Callable[[List[float]], float]):
+def register_calculation(name: str, batched: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+    """Calculations receive the non-null column values as a float64 array sorted in ascending order.
+
+    A batched implementation receives every column of a report at once, as a 2-D array with one column per
+    report column, each sorted in ascending order and NaN-padded at the end. It returns one value per column
+    and is preferred over the per-column calculation.
+    """
+    def decorator(func: Callable[[np.ndarray], float]):
         calculation_methods[name] = func
+        if batched is not None:
+            batched_calculation_methods[name] = batched
         return func
 
     return decorator
 
 
-@register_calculation('median')
-def calculate_median(column_data: List[float]) -> float:
-    data = np.array(column_data, dtype=float)
-    return float(np.median(data))
+def register_fused_calculation(*names: str):
+    """A fused calculation receives the raw column, nulls included as NaN, and returns all of `names` at once.
 
+    The engine runs it once per column however many of its indicators are requested. Each name is also
+    registered as a regular calculation on the non-null values, where the null count is always 0.
+    """
+    def decorator(func: Callable[[np.ndarray], Dict[str, Optional[float]]]):
+        for name in names:
+            fused_calculation_methods[name] = func
+            register_calculation(name)(lambda column_data, name=name: func(column_data)[name])
+        return func
 
-@register_calculation('mean')
-def calculate_mean(column_data: List[float]) -> float:
-    data = np.array(column_data, dtype=float)
-    return float(np.mean(data))
+    return decorator
 
 
-@register_calculation('mode')
-def calculate_mode(column_data: List[float]) -> float:
-    data = np.array(column_data, dtype=float)
-    logging.info(data)
-    return float(stats.mode(data).mode)  # type: ignore
+def prepare_column_data(column_values: np.ndarray) -> Optional[np.ndarray]:
+    column_data = np.sort(column_values[~np.isnan(column_values)])
+    return column_data if column_data.size > 0 else None
+
+
+def sorted_quantile(column_data: np.ndarray, quantile: float) -> float:
+    """Linear interpolation matching np.quantile, read directly from already sorted data."""
+    position = (column_data.size - 1) * quantile
+    lower = int(np.floor(position))
+    upper = min(lower + 1, column_data.size - 1)
+    fraction = position - lower
+    difference = column_data[upper] - column_data[lower]
+    if fraction >= 0.5:
+        return float(column_data[upper] - difference * (1 - fraction))
+    return float(column_data[lower] + difference * fraction)
+
+
+def stack_sorted_columns(columns_values: List[np.ndarray]) -> np.ndarray:
+    # Column-major, so every report column is contiguous while it is sorted and reduced.
+    sorted_columns = np.full((max(column_values.size for column_values in columns_values), len(columns_values)),
+                             np.nan, order='F')
+    for index, column_values in enumerate(columns_values):
+        sorted_columns[:column_values.size, index] = column_values
+    sorted_columns.sort(axis=0)
+    return sorted_columns
+
+
+def group_batched_columns(columns: List[ReportColumn], columns_values: List[np.ndarray]) -> List[List[int]]:
+    """Indexes of the columns to stack together, grouped by the power of two of their height.
+
+    Padding therefore at most doubles a group, whatever the other columns of the batch look like. Empty, spilled
+    and oversized columns are left out.
+    """
+    groups: Dict[int, List[int]] = {}
+    for index, (column, column_values) in enumerate(zip(columns, columns_values)):
+        if 0 < column_values.size <= BATCHED_COLUMN_MAX_ROWS and column.spill_path is None:
+            groups.setdefault(column_values.size.bit_length(), []).append(index)
+    return list(groups.values())
+
+
+def batched_searchsorted(sorted_columns: np.ndarray, values: np.ndarray, side: str = 'left') -> np.ndarray:
+    """np.searchsorted of one value per column, by bisecting all columns together; NaN padding sorts last."""
+    column_indexes = np.arange(sorted_columns.shape[1])
+    low = np.zeros(sorted_columns.shape[1], dtype=np.intp)
+    high = np.full(sorted_columns.shape[1], sorted_columns.shape[0], dtype=np.intp)
+    while np.any(low < high):
+        middle = (low + high) // 2
+        middle_values = sorted_columns[np.minimum(middle, sorted_columns.shape[0] - 1), column_indexes]
+        with np.errstate(invalid='ignore'):
+            go_right = middle_values < values if side == 'left' else middle_values <= values
+        go_right &= low < high
+        low = np.where(go_right, middle + 1, low)
+        high = np.where(go_right | (low >= high), high, middle)
+    return low
+
+
+def count_present_values(sorted_columns: np.ndarray) -> np.ndarray:
+    return batched_searchsorted(sorted_columns, np.full(sorted_columns.shape[1], np.inf), side='right')
+
+
+def batched_sorted_quantile(sorted_columns: np.ndarray, quantile: float) -> np.ndarray:
+    """sorted_quantile for every column at once, NaN for columns without values."""
+    counts = count_present_values(sorted_columns)
+    column_indexes = np.arange(sorted_columns.shape[1])
+    position = np.maximum(counts - 1, 0) * quantile
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    fraction = position - lower
+    lower_values = sorted_columns[lower, column_indexes]
+    upper_values = sorted_columns[upper, column_indexes]
+    difference = upper_values - lower_values
+    return np.where(fraction >= 0.5, upper_values - difference * (1 - fraction), lower_values + difference * fraction)
+
+
+def batched_mean(sorted_columns: np.ndarray) -> np.ndarray:
+    counts = count_present_values(sorted_columns)
+    shortest = counts.min(initial=0)
+    sums = sorted_columns[:shortest].sum(axis=0) + np.nansum(sorted_columns[shortest:], axis=0)
+    return sums / np.where(counts > 0, counts, np.nan)
+
+
+def batched_outliers_number(sorted_columns: np.ndarray) -> np.ndarray:
+    q1 = batched_sorted_quantile(sorted_columns, .25)
+    q3 = batched_sorted_quantile(sorted_columns, .75)
+    iqr = q3 - q1
+    below_range = batched_searchsorted(sorted_columns, q1 - iqr, side='left')
+    above_range = count_present_values(sorted_columns) - batched_searchsorted(sorted_columns, q3 + iqr, side='right')
+    return (below_range + above_range).astype(np.float64)
 
 
-@register_calculation('quartile q1')
-def calculate_quartile_q1(column_data: List[float]) -> float:
-    return np.quantile(column_data, .25)
+def batched_variation_range(sorted_columns: np.ndarray) -> np.ndarray:
+    counts = count_present_values(sorted_columns)
+    return sorted_columns[np.maximum(counts - 1, 0), np.arange(sorted_columns.shape[1])] - sorted_columns[0]
 
 
-@register_calculation('quartile q2')
-def calculate_quartile_q2(column_data: List[float]) -> float:
-    return np.quantile(column_data, .5)
+@register_calculation('median', batched=lambda sorted_columns: batched_sorted_quantile(sorted_columns, .5))
+def calculate_median(column_data: np.ndarray) -> float:
+    return sorted_quantile(column_data, .5)
 
 
-@register_calculation('quartile q3')
-def calculate_quartile_q3(column_data: List[float]) -> float:
-    return np.quantile(column_data, .75)
+@register_calculation('mean', batched=batched_mean)
+def calculate_mean(column_data: np.ndarray) -> float:
+    return float(np.mean(column_data))
 
 
-@register_calculation('outliers number')
-def calculate_outliers_number(column_data: List[float]) -> float:
-    q1 = np.quantile(column_data, .25)
-    q3 = np.quantile(column_data, .75)
-    iqr = q3 - q1
-    min_range = q1 - iqr
-    max_range = q3 + iqr
-    return len([x for x in column_data if x < min_range or x > max_range])
+@register_calculation('mode')
+def calculate_mode(column_data: np.ndarray) -> float:
+    run_starts = np.flatnonzero(np.concatenate(([True], column_data[1:] != column_data[:-1])))
+    run_lengths = np.diff(np.append(run_starts, column_data.size))
+    return float(column_data[run_starts[np.argmax(run_lengths)]])
+
+
+@register_calculation('quartile q1',
+                      batched=lambda sorted_columns: batched_sorted_quantile(sorted_columns, .25))
+def calculate_quartile_q1(column_data: np.ndarray) -> float:
+    return sorted_quantile(column_data, .25)
+
 
+@register_calculation('quartile q2',
+                      batched=lambda sorted_columns: batched_sorted_quantile(sorted_columns, .5))
+def calculate_quartile_q2(column_data: np.ndarray) -> float:
+    return sorted_quantile(column_data, .5)
 
-@register_calculation('variation range')
-def calculate_variation_range(column_data: List[float]) -> float:
-    return max(column_data) - min(column_data)
+
+@register_calculation('quartile q3',
+                      batched=lambda sorted_columns: batched_sorted_quantile(sorted_columns, .75))
+def calculate_quartile_q3(column_data: np.ndarray) -> float:
+    return sorted_quantile(column_data, .75)
+
+
+@register_calculation('outliers number', batched=batched_outliers_number)
+def calculate_outliers_number(column_data: np.ndarray) -> float:
+    q1 = sorted_quantile(column_data, .25)
+    q3 = sorted_quantile(column_data, .75)
+    iqr = q3 - q1
+    below_range = np.searchsorted(column_data, q1 - iqr, side='left')
+    above_range = column_data.size - np.searchsorted(column_data, q3 + iqr, side='right')
+    return float(below_range + above_range)
+
+
+@register_calculation('variation range', batched=batched_variation_range)
+def calculate_variation_range(column_data: np.ndarray) -> float:
+    return float(column_data[-1] - column_data[0])
+
+
+@register_fused_calculation('sum', 'count', 'null count', 'variance', 'standard deviation',
+                            'coefficient of variation', 'skewness', 'kurtosis')
+def calculate_moments(column_values: np.ndarray) -> Dict[str, Optional[float]]:
+    """Sample variance and standard deviation (ddof=1), biased skewness and excess kurtosis like scipy.stats.
+
+    Undefined values, such as the variance of a single value, are returned as None.
+    """
+    present_values = column_values[~np.isnan(column_values)]
+    count = present_values.size
+    moments = {'sum': float(present_values.sum()), 'count': float(count),
+               'null count': float(column_values.size - count), 'variance': None, 'standard deviation': None,
+               'coefficient of variation': None, 'skewness': None, 'kurtosis': None}
+    if count == 0:
+        return moments
+    mean = moments['sum'] / count
+    deviations = present_values - mean
+    squared_deviations = deviations * deviations
+    m2 = float(squared_deviations.sum())
+    if count > 1:
+        moments['variance'] = m2 / (count - 1)
+        moments['standard deviation'] = float(np.sqrt(moments['variance']))
+        if mean != 0:
+            moments['coefficient of variation'] = moments['standard deviation'] / mean
+    if m2 > 0:
+        moments['skewness'] = float(np.dot(squared_deviations, deviations)) / count / (m2 / count) ** 1.5
+        moments['kurtosis'] = float(np.dot(squared_deviations, squared_deviations)) / count / (m2 / count) ** 2 - 3
+    return moments
+
+
+def get_calculation_method(report_indicator: ReportIndicator) -> Callable[[np.ndarray], float]:
+    if not (calculation_method := calculation_methods.get(report_indicator.name.lower())):
+        raise BadRequestError(f"No calculation method registered for {report_indicator.name}")
+    return calculation_method
 
 
 def create_indicator_value(indicator_value_create: IndicatorValueCreate) -> int:
@@ -94,24 +253,99 @@ def create_indicator_value(indicator_value_create: IndicatorValueCreate) -> int:
             f"Could not create indicator value. There is no report indicator with "
             f"id = {indicator_value_create.report_indicator}")
 
-    if not (calculation_method := calculation_methods.get(report_indicator.name.lower())):
-        raise BadRequestError(f"No calculation method registered for {report_indicator.name}")
-    if filtered_column_data := filter_column_data(column):
-        calculated_value = calculation_method(filtered_column_data)
-        indicator_value = IndicatorValue(report_indicator=report_indicator, value=calculated_value, is_active=True)
-    else:
-        indicator_value = IndicatorValue(report_indicator=report_indicator, value=None, is_active=True)
+    calculated_value = calculate_indicator_table([column], [report_indicator])[0][0]
+    indicator_value = IndicatorValue(report_indicator=report_indicator, value=calculated_value, is_active=True)
     indicator_value.save()
     column.indicator_values.append(indicator_value)
     column.save()
+    touch_reports(columns=column.id)
     return indicator_value.id
 
 
+def calculate_indicator_table(columns: List[ReportColumn], report_indicators: List[ReportIndicator],
+                              streamed_values: Optional[List[Dict[str, Optional[float]]]] = None) \
+        -> List[List[Optional[float]]]:
+    """Values of every indicator for every column, indexed [column][indicator].
+
+    Indicators found in `streamed_values`, one {indicator name: value} per column accumulated while the report was
+    read, are taken from there. Fused calculations run once per column on its raw values, batched calculations
+    run once per group of similarly tall columns, and the rest, or every calculation of a column left out of the
+    groups, run per column on its sorted non-null values.
+    """
+    calculation_methods_used = [get_calculation_method(report_indicator) for report_indicator in report_indicators]
+    names = [report_indicator.name.lower() for report_indicator in report_indicators]
+    streamed = [bool(streamed_values) and report_indicator.name in streamed_values[0]
+                for report_indicator in report_indicators]
+    fused_methods = [None if is_streamed else fused_calculation_methods.get(name)
+                     for name, is_streamed in zip(names, streamed)]
+    batched_methods = [None if fused_method or is_streamed else batched_calculation_methods.get(name)
+                       for name, fused_method, is_streamed in zip(names, fused_methods, streamed)]
+    columns_values = [column.get_column_values() for column in columns]
+    indicator_table: List[List[Optional[float]]] = [[None] * len(report_indicators) for _ in columns]
+    for column_index, column_streamed_values in enumerate(streamed_values or []):
+        for indicator_index, report_indicator in enumerate(report_indicators):
+            if streamed[indicator_index]:
+                indicator_table[column_index][indicator_index] = column_streamed_values[report_indicator.name]
+    if any(fused_methods):
+        for column_index, column_values in enumerate(columns_values):
+            fused_results = {}
+            for indicator_index, fused_method in enumerate(fused_methods):
+                if fused_method is not None:
+                    if fused_method not in fused_results:
+                        fused_results[fused_method] = fused_method(column_values)
+                    indicator_table[column_index][indicator_index] = fused_results[fused_method][names[indicator_index]]
+    batched_column_indexes = set()
+    if any(batched_methods):
+        for group in group_batched_columns(columns, columns_values):
+            batched_column_indexes.update(group)
+            sorted_columns = stack_sorted_columns([columns_values[column_index] for column_index in group])
+            has_values = count_present_values(sorted_columns) > 0
+            for indicator_index, batched_method in enumerate(batched_methods):
+                if batched_method is not None:
+                    for column_index, column_has_values, value in zip(group, has_values,
+                                                                      batched_method(sorted_columns).tolist()):
+                        indicator_table[column_index][indicator_index] = value if column_has_values else None
+    per_column_indexes = [indicator_index for indicator_index in range(len(report_indicators))
+                          if fused_methods[indicator_index] is None and batched_methods[indicator_index] is None
+                          and not streamed[indicator_index]]
+    unbatched_indexes = per_column_indexes + [indicator_index for indicator_index in range(len(report_indicators))
+                                              if batched_methods[indicator_index] is not None]
+    for column_index, column_values in enumerate(columns_values):
+        indicator_indexes = per_column_indexes if column_index in batched_column_indexes else unbatched_indexes
+        if not indicator_indexes or (column_data := prepare_column_data(column_values)) is None:
+            continue
+        for indicator_index in indicator_indexes:
+            indicator_table[column_index][indicator_index] = calculation_methods_used[indicator_index](column_data)
+    return indicator_table
+
+
+def create_indicator_values(columns: List[ReportColumn], report_indicators: List[ReportIndicator],
+                            streamed_values: Optional[List[Dict[str, Optional[float]]]] = None) -> None:
+    """Calculate every indicator for every column and persist them with one insert and one column update."""
+    indicator_table = calculate_indicator_table(columns, report_indicators, streamed_values)
+    indicator_value_ids = iter(allocate_sequence_ids(IndicatorValue, len(columns) * len(report_indicators)))
+    indicator_values: List[IndicatorValue] = []
+    column_updates: List[UpdateOne] = []
+    for column, column_indicator_table in zip(columns, indicator_table):
+        column_indicator_values = [
+            IndicatorValue(id=next(indicator_value_ids), report_indicator=report_indicator, is_active=True,
+                           value=value)
+            for report_indicator, value in zip(report_indicators, column_indicator_table)]
+        indicator_values.extend(column_indicator_values)
+        column.indicator_values.extend(column_indicator_values)
+        column_updates.append(UpdateOne({'_id': column.id}, {'$push': {'indicator_values': {
+            '$each': [indicator_value.id for indicator_value in column_indicator_values]}}}))
+    if indicator_values:
+        IndicatorValue.objects.insert(indicator_values, load_bulk=False)
+        ReportColumn._get_collection().bulk_write(column_updates, ordered=False)
+
+
 def delete_indicator_value(indicator_value_id: int):
     if not (indicator_value := IndicatorValue.objects(id=indicator_value_id, is_active=True).first()):
         raise NotFoundError(f"Could not delete indicator value. There is no such entity with id = {indicator_value_id}")
     indicator_value.is_active = False
     indicator_value.save()
+    touch_reports(columns__in=ReportColumn.objects(indicator_values=indicator_value_id).scalar('id'))
 
 
 def validate_indicator_value_column(get_base: IndicatorValueGetBase) -> Optional[ReportColumn]:
@@ -1,7 +1,8 @@
 import os
-import shutil
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
 
 import numpy as np
 import pandas as pd
@@ -9,16 +10,55 @@ from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
 from fastapi import Depends, UploadFile
 from models.customer import Customer
+from models.indicator_value import IndicatorValue
 from models.report import Report
 from models.report_column import ReportColumn
+from models.report_indicator import ReportIndicator
 from models.user import User
-from schemas.indicator_value import IndicatorValueCreate
-from schemas.indicator_value import IndicatorValuesGet
-from services.indicator_value import create_indicator_value
-from services.indicator_value import get_indicator_values
-from services.report_column import delete_report_column
+from custom_types.packed_column import pack_upper_triangle, summarize_column, unpack_upper_triangle
+from custom_types.t_digest import TDigest
+from services.indicator_accumulator import ReportAccumulator, calculate_sketch_outliers_number, \
+    is_streamed_indicator
+from services.indicator_value import create_indicator_values
+from services.report_column import copy_report_columns, create_report_columns, delete_report_column, \
+    detect_report_outliers, discard_report_columns, get_column_outlier_rows, screen_column_normality, \
+    screen_report_columns
+from services.report_file import ChunkCallback, check_column_name_list, coerce_column, read_report_columns, \
+    save_upload_file
 from services.report_indicator import get_report_indicators
 from services.user import get_current_user
+from services.utils import PAGE_SIZE, Page, paginate, prefetch_references, select_fields
+
+
+# Bump whenever parsing or indicator calculation changes, so stored results stop being reused.
+REPORT_ANALYSIS_VERSION = 4
+
+# Packed storage type of uploaded columns, float32 halves the size at the cost of precision.
+COLUMN_DATA_TYPE = os.getenv("COLUMN_DATA_TYPE", "float64")
+
+# Columns whose packed values exceed this many bytes are kept in memory-mapped .npy files instead of Mongo.
+# "exact" streams only the indicators that are exact in bounded memory while an upload is read, "approximate"
+# also streams quantiles and outliers from a t-digest. Every other indicator is calculated on the saved columns.
+UPLOAD_INDICATOR_MODE = os.getenv("UPLOAD_INDICATOR_MODE", "exact")
+
+COLUMN_SPILL_THRESHOLD = int(os.getenv("COLUMN_SPILL_THRESHOLD", str(4 * 1024 * 1024)))
+
+# Packed matrices served by their own endpoint instead of with every report.
+REPORT_MATRIX_FIELDS = ('pearson_correlations', 'spearman_correlations')
+
+# Fields report listings return by default and may select with `fields`, column references only on request.
+REPORT_LIST_FIELDS = ('id', 'user', 'report_link', 'date_uploaded', 'fits_correlation_analysis',
+                      'fits_discriminant_analysis')
+REPORT_SELECTABLE_FIELDS = REPORT_LIST_FIELDS + ('columns', 'correlation_columns', 'content_hash', 'analysis_version')
+
+# Representations of a report served with their own validators.
+REPORT_RESOURCE = "report"
+REPORT_INDICATOR_VALUES_RESOURCE = "indicator-values"
+REPORT_FILE_RESOURCE = "file"
+
+REPORT_STAGE_PARSING = "parsing"
+REPORT_STAGE_INDICATORS = "indicators"
+REPORT_STAGE_ANALYSIS = "analysis"
 
 
 def delete_file(file_path: str):
@@ -27,160 +67,233 @@ def delete_file(file_path: str):
 
 
 def check_report_extension(input_file: UploadFile):
-    allowed_extensions = ["xls", "xlsx"]
+    allowed_extensions = ["xls", "xlsx", "csv", "parquet"]
     if input_file.filename.split(".")[-1] not in allowed_extensions:
         raise BadRequestError("File extension not allowed")
 
 
 def check_column_names(df) -> bool:
-    if df.columns.duplicated().any() or df.columns.isnull().any() or any(column.strip() == "" for column in df.columns):
-        raise BadRequestError("All columns must have unique, non-empty names")
-    return True
+    return check_column_name_list(list(df.columns))
+
 
+def get_spill_directory(file_path: str) -> str:
+    return os.path.join(os.path.dirname(file_path), "columns")
 
-def save_column(column_data_name: str, column_data_floats: List[Optional[float]], saved_columns: List[ReportColumn]):
-    report_column = ReportColumn(name=column_data_name, column_data=column_data_floats)
-    report_column.save()
+
+def save_column(column_data_name: str, column_values: np.ndarray, saved_columns: List[ReportColumn],
+                spill_directory: Optional[str] = None):
+    report_column = ReportColumn(name=column_data_name)
+    if spill_directory and column_values.size * np.dtype(COLUMN_DATA_TYPE).itemsize > COLUMN_SPILL_THRESHOLD:
+        report_column.spill_column_values(column_values, os.path.join(spill_directory, f"{uuid4().hex}.npy"),
+                                          COLUMN_DATA_TYPE)
+    else:
+        report_column.set_column_values(column_values, COLUMN_DATA_TYPE)
     saved_columns.append(report_column)
 
 
 def validate_column_content(df, column, saved_columns: List[ReportColumn]):
-    column_data_content = df[column].tolist()[1:]
-    column_data = [None if pd.isnull(x) else x for x in column_data_content]
-
-    column_data_floats: List[Optional[float]] = []
-    valid_column = True
-    for item in column_data:
-        if item is None or item == '':
-            column_data_floats.append(None)
-            continue
-        try:
-            column_data_floats.append(float(item))
-        except ValueError:
-            valid_column = False
-            break
-    if not valid_column:
-        raise BadRequestError("Could not save file. Dataset contains non numeric data")
-    present_floats = [value for value in column_data_floats if value]
-    if valid_column and any(isinstance(x, float) for x in column_data_floats) and len(present_floats) >= 3:
-        save_column(column, column_data_floats, saved_columns)
-
-
-def validate_report_file(file_path: str) -> List[ReportColumn]:
+    column_values, _ = coerce_column(df[column].iloc[1:])
+    save_valid_column(column, column_values, saved_columns)
+
+
+def save_valid_column(column_name: str, column_values: np.ndarray, saved_columns: List[ReportColumn],
+                      spill_directory: Optional[str] = None):
+    present_values = np.count_nonzero(~np.isnan(column_values) & (column_values != 0))
+    if present_values >= 3:
+        save_column(column_name, column_values, saved_columns, spill_directory)
+
+
+def validate_report_file(file_path: str, on_chunk: Optional[ChunkCallback] = None) -> List[ReportColumn]:
     saved_columns: List[ReportColumn] = []
-    df = pd.read_excel(file_path, engine='openpyxl', dtype=str)
     try:
-        check_column_names(df)
+        report_columns = read_report_columns(file_path, on_chunk)
     except BadRequestError as e:
         delete_file(file_path)
         raise BadRequestError(e)
-    for column in df.columns:
-        validate_column_content(df, column, saved_columns)
+    spill_directory = get_spill_directory(file_path)
+    for column_name, column_values in report_columns.items():
+        save_valid_column(column_name, column_values, saved_columns, spill_directory)
     if len(saved_columns) == 0:
         delete_file(file_path)
         raise BadRequestError("Could not save file. There is no valid columns in the dataset")
-    return saved_columns
+    return create_report_columns(saved_columns)
 
 
-def calculate_indicator_values(saved_columns: List[ReportColumn]):
-    report_indicators = get_report_indicators()
-    for report_indicator in report_indicators:
-        for column in saved_columns:
-            indicator_value_create = IndicatorValueCreate(report_indicator=report_indicator.id,
-                                                          column=column.id)
-            create_indicator_value(indicator_value_create)
+def create_report_accumulator(report_indicators: List[ReportIndicator]) -> ReportAccumulator:
+    approximate = UPLOAD_INDICATOR_MODE == "approximate"
+    return ReportAccumulator([report_indicator.name for report_indicator in report_indicators
+                              if is_streamed_indicator(report_indicator.name, approximate)], approximate)
+
+
+def calculate_indicator_values(saved_columns: List[ReportColumn], report_indicators: List[ReportIndicator],
+                               report_accumulator: Optional[ReportAccumulator] = None):
+    """Indicators accumulated while the file was read are stored as they are, the rest are calculated."""
+    streamed_values = None
+    if report_accumulator is not None:
+        accumulated_values = report_accumulator.results()
+        streamed_values = [accumulated_values.get(column.name, {}) for column in saved_columns]
+    create_indicator_values(saved_columns, report_indicators, streamed_values)
 
 
 def check_fits_discriminant_analysis(report_columns: List[ReportColumn]) -> bool:
-    from scipy.stats import kstest
-    df = columns_to_df(report_columns)
-    for column in df.columns:
-        values = df[column].values
-        _, p = kstest(values, 'norm')
-        if p <= 0.05:
-            return False
-    return True
+    """Derive the report flag from the stored per-column screening, screening only columns that lack it."""
+    active_columns = [column for column in report_columns if column.is_active]
+    for column in active_columns:
+        if column.normality_p_value is None:
+            screen_column_normality(column)
+    return not any(column.normality_p_value <= 0.05 for column in active_columns)
 
 
 def columns_to_df(columns: List[ReportColumn]) -> pd.DataFrame:
     active_columns = [col for col in columns if col.is_active]
-    data_dict = {col.name: col.column_data for col in active_columns}
+    data_dict = {col.name: col.get_column_values() for col in active_columns}
 
     return pd.DataFrame(data_dict)
 
 
-def calculate_strengthened_weakened_relationships(df: pd.DataFrame) -> (int, int):
-    strengthened, weakened = 0, 0
-
-    for i in range(len(df.columns)):
-        for j in range(i + 1, len(df.columns)):
-            data = df[[df.columns[i], df.columns[j]]]
-            corr_pair = np.abs(data.corr().iloc[0, 1])
-            corr_partial = np.abs(data.corr(method='spearman').iloc[0, 1])
-            if corr_pair > corr_partial:
-                strengthened += 1
-            else:
-                weakened += 1
+def calculate_correlation_matrices(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson and Spearman matrices over pairwise-complete observations, each computed in a single pass.
+
+    Spearman ranks every column once and only re-ranks the pairs whose null masks differ.
+    """
+    return df.corr().to_numpy(), df.corr(method='spearman').to_numpy()
+
+
+def count_strengthened_weakened(pearson: np.ndarray, spearman: np.ndarray) -> (int, int):
+    upper_triangle = np.triu_indices(pearson.shape[0], k=1)
+    strengthened = int(np.count_nonzero(np.abs(pearson[upper_triangle]) > np.abs(spearman[upper_triangle])))
+    weakened = len(upper_triangle[0]) - strengthened
 
     return strengthened, weakened
 
 
-def check_fits_correlation_analysis(report_columns: List[ReportColumn]) -> bool:
+def calculate_strengthened_weakened_relationships(df: pd.DataFrame) -> (int, int):
+    return count_strengthened_weakened(*calculate_correlation_matrices(df))
+
+
+def calculate_report_correlations(report_columns: List[ReportColumn]) -> Tuple[List[str], np.ndarray, np.ndarray]:
     df = columns_to_df(report_columns)
-    strengthened, weakened = calculate_strengthened_weakened_relationships(df)
+    pearson, spearman = calculate_correlation_matrices(df)
+    return list(df.columns), pearson, spearman
+
+
+def check_fits_correlation_analysis(report_columns: List[ReportColumn]) -> bool:
+    _, pearson, spearman = calculate_report_correlations(report_columns)
+    strengthened, weakened = count_strengthened_weakened(pearson, spearman)
 
     return strengthened > weakened
 
 
-async def create_report(report_file: UploadFile, current_user: User = Depends(get_current_user)) -> int:
-    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
-        raise NotFoundError(f"Could not upload report. There is no customer {current_user}")
-    file_path = await upload_report(customer, report_file)
-    saved_columns = validate_report_file(file_path)
-    calculate_indicator_values(saved_columns)
-    fits_discriminant_analysis = check_fits_discriminant_analysis(saved_columns)
-    fits_correlation_analysis = check_fits_correlation_analysis(saved_columns)
-    report = Report(user=current_user, report_link=file_path, date_uploaded=datetime.now(), columns=saved_columns,
-                    fits_discriminant_analysis=fits_discriminant_analysis,
-                    fits_correlation_analysis=fits_correlation_analysis).save()
+def find_analysed_report(customer: Customer, content_hash: Optional[str]) -> Optional[Report]:
+    """An active report of the same customer analysed from identical bytes by the current analysis version."""
+    if not content_hash:
+        return None
+    return Report.objects(user=customer, is_active=True, content_hash=content_hash,
+                          analysis_version=REPORT_ANALYSIS_VERSION).first()
+
+
+def reuse_analysed_report(customer: Customer, file_path: str, analysed_report: Report) -> Optional[int]:
+    if (copied_columns := copy_report_columns(list(analysed_report.to_mongo()['columns']),
+                                              get_spill_directory(file_path))) is None:
+        return None
+    report = Report(user=customer, report_link=file_path, date_uploaded=datetime.now(timezone.utc),
+                    columns=copied_columns,
+                    fits_discriminant_analysis=analysed_report.fits_discriminant_analysis,
+                    fits_correlation_analysis=analysed_report.fits_correlation_analysis,
+                    content_hash=analysed_report.content_hash, analysis_version=REPORT_ANALYSIS_VERSION,
+                    correlation_columns=analysed_report.correlation_columns,
+                    pearson_correlations=analysed_report.pearson_correlations,
+                    spearman_correlations=analysed_report.spearman_correlations).save()
     return report.id
 
 
-def save_upload_file(upload_file: UploadFile, destination: str) -> str:
-    file_path = os.path.join(destination, upload_file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-    upload_file.file.close()
-    return file_path
+def build_report(customer: Customer, file_path: str, content_hash: Optional[str] = None,
+                 report_progress: Optional[Callable[[str, int], None]] = None) -> int:
+    report_progress = report_progress or (lambda stage, progress: None)
+    if (analysed_report := find_analysed_report(customer, content_hash)) and \
+            (report_id := reuse_analysed_report(customer, file_path, analysed_report)) is not None:
+        return report_id
+    report_progress(REPORT_STAGE_PARSING, 10)
+    report_indicators = list(get_report_indicators())
+    report_accumulator = create_report_accumulator(report_indicators)
+    saved_columns = validate_report_file(file_path, report_accumulator.update)
+    try:
+        report_progress(REPORT_STAGE_INDICATORS, 40)
+        calculate_indicator_values(saved_columns, report_indicators, report_accumulator)
+        report_progress(REPORT_STAGE_ANALYSIS, 70)
+        screen_report_columns(saved_columns)
+        detect_report_outliers(saved_columns)
+        fits_discriminant_analysis = check_fits_discriminant_analysis(saved_columns)
+        correlation_columns, pearson, spearman = calculate_report_correlations(saved_columns)
+        strengthened, weakened = count_strengthened_weakened(pearson, spearman)
+        report = Report(user=customer, report_link=file_path, date_uploaded=datetime.now(timezone.utc),
+                        columns=saved_columns,
+                        fits_discriminant_analysis=fits_discriminant_analysis,
+                        fits_correlation_analysis=strengthened > weakened,
+                        content_hash=content_hash, analysis_version=REPORT_ANALYSIS_VERSION,
+                        correlation_columns=correlation_columns, pearson_correlations=pack_upper_triangle(pearson),
+                        spearman_correlations=pack_upper_triangle(spearman)).save()
+    except Exception:
+        discard_report_columns(saved_columns)
+        raise
+    return report.id
+
 
+async def create_report(report_file: UploadFile, current_user: User = Depends(get_current_user)) -> int:
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not upload report. There is no customer {current_user}")
+    file_path, content_hash = await upload_report(customer, report_file)
+    return build_report(customer, file_path, content_hash)
 
-async def upload_report(customer: Customer, report_file: UploadFile):
+
+async def upload_report(customer: Customer, report_file: UploadFile) -> Tuple[str, str]:
     check_report_extension(report_file)
     destination = f'{os.getcwd()}/user_data/{customer.id}/report_files/'
     does_exists = os.path.exists(destination)
     if not does_exists:
         os.makedirs(destination)
-    file_path = save_upload_file(report_file, destination)
-    return file_path
+    return await save_upload_file(report_file, destination)
 
 
-def get_current_customer_reports(current_user: User = Depends(get_current_user)) -> List[Report]:
+def get_current_customer_reports(current_user: User = Depends(get_current_user), fields: Optional[str] = None,
+                                 cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
+    """Newest reports first, paged by (date_uploaded, id) so the upload date is always returned."""
     if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
         raise NotFoundError(f"Could not get customer reports for {current_user}. Customer does not exist.")
-    return Report.objects(is_active=True, user=customer).order_by('-date_uploaded')
+    reports = Report.objects(is_active=True, user=customer).only(
+        *select_fields(fields, REPORT_SELECTABLE_FIELDS, REPORT_LIST_FIELDS), 'date_uploaded')
+    return paginate(reports, cursor, limit, order_field='date_uploaded', descending=True)
 
 
-def get_customer_reports(customer_id: int) -> List[Report]:
+def get_customer_reports(customer_id: int, fields: Optional[str] = None) -> List[Report]:
     if not (customer := Customer.objects(id=customer_id, is_active=True).first()):
         raise NotFoundError(f"Could not get customer reports with id = {customer_id}. Customer does not exist.")
-    return Report.objects(is_active=True, user=customer).order_by('-date_uploaded')
+    return Report.objects(is_active=True, user=customer).only(
+        *select_fields(fields, REPORT_SELECTABLE_FIELDS, REPORT_LIST_FIELDS)).order_by('-date_uploaded')
+
+
+def prefetch_report_trees(reports: List[Report]) -> List[Report]:
+    """Load the users, columns, indicator values and indicators of `reports` with one query per collection.
+
+    Report.to_dict then serializes the whole tree without fetching referenced documents one by one.
+    """
+    prefetch_references(reports, 'user', User)
+    report_columns = prefetch_references(reports, 'columns', ReportColumn)
+    indicator_values = prefetch_references(report_columns, 'indicator_values', IndicatorValue)
+    prefetch_references(indicator_values, 'report_indicator', ReportIndicator)
+    return reports
+
+
+def reports_to_dict(reports: List[Report]) -> List[Dict[str, Any]]:
+    return [report.to_dict() for report in prefetch_report_trees(reports)]
 
 
 def get_current_customer_report(report_id: int, current_user: User = Depends(get_current_user)) -> Optional[Report]:
     if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
         raise NotFoundError(
             f"Could not get customer report with id {report_id} for {current_user}. Customer does not exist.")
-    if not (report := Report.objects(id=report_id, is_active=True, user=customer).first()):
+    if not (report := Report.objects(id=report_id, is_active=True, user=customer).exclude(*REPORT_MATRIX_FIELDS)
+            .first()):
         raise NotFoundError(f"Could not get customer report with id {report_id}. Report does not exist.")
     return report
 
@@ -189,7 +302,8 @@ def get_customer_report(report_id: int, customer_id: int) -> Optional[Report]:
     if not (customer := Customer.objects(id=customer_id, is_active=True).first()):
         raise NotFoundError(
             f"Could not get customer report with id {report_id} for customer {customer_id}. Customer does not exist.")
-    if not (report := Report.objects(id=report_id, is_active=True, user=customer).first()):
+    if not (report := Report.objects(id=report_id, is_active=True, user=customer).exclude(*REPORT_MATRIX_FIELDS)
+            .first()):
         raise NotFoundError(f"Could not get report with id {report_id}. Report does not exist.")
     return report
 
@@ -205,6 +319,50 @@ def delete_report(report_id: int, current_user: User = Depends(get_current_user)
         delete_report_column(report_column.id)
 
 
+class ReportValidators(NamedTuple):
+    etag: str
+    last_modified: datetime
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {'ETag': self.etag,
+                'Last-Modified': format_datetime(self.last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+                'Cache-Control': 'private, no-cache'}
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """If-None-Match takes precedence, If-Modified-Since is only consulted without it."""
+        if if_none_match is not None:
+            etags = [etag.strip().removeprefix('W/') for etag in if_none_match.split(',')]
+            return '*' in etags or self.etag in etags
+        if if_modified_since is not None:
+            try:
+                modified_since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if modified_since.tzinfo is None:
+                modified_since = modified_since.replace(tzinfo=timezone.utc)
+            return self.last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= modified_since
+        return False
+
+
+def get_report_validators(report_id: int, resource: str = REPORT_RESOURCE,
+                          current_user: User = Depends(get_current_user)) -> ReportValidators:
+    """ETag and Last-Modified of a report representation, read with one indexed lookup of the report.
+
+    Reports only change after upload through touch_reports, which bumps their revision and modification date.
+    The uploaded file never changes, so it is validated by its content hash.
+    """
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not get report with id {report_id} for {current_user}. Customer does not exist.")
+    if not (report := Report.objects(id=report_id, is_active=True, user=customer)
+            .only('revision', 'date_uploaded', 'date_modified', 'content_hash').first()):
+        raise NotFoundError(f"Could not get report with id {report_id}. Report does not exist.")
+    if resource == REPORT_FILE_RESOURCE:
+        return ReportValidators(f'"{report.content_hash or f"{resource}-{report.id}"}"', report.date_uploaded)
+    return ReportValidators(f'"{resource}-{report.id}-{report.revision}"',
+                            report.date_modified or report.date_uploaded)
+
+
 def get_report_file(report_id: int, current_user: User = Depends(get_current_user)) -> str:
     if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
         raise NotFoundError(f"Could not get report file with id = {report_id}. Customer does not exist.")
@@ -216,15 +374,138 @@ def get_report_file(report_id: int, current_user: User = Depends(get_current_use
     return report.report_link
 
 
+def correlation_matrix_to_list(matrix: np.ndarray) -> List[List[Optional[float]]]:
+    return np.where(np.isnan(matrix), None, np.round(matrix, 6)).tolist()
+
+
+def get_report_correlations(report_id: int, current_user: User = Depends(get_current_user)) -> Dict[str, Any]:
+    """Stored Pearson and Spearman matrices, reports analysed before they were stored get them on first view."""
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not get report correlations for id = {report_id}. Customer does not exist.")
+    if not (report := Report.objects(id=report_id, is_active=True, user=customer).first()):
+        raise NotFoundError(f"Could not get report correlations for id {report_id}. Report does not exist.")
+    if report.pearson_correlations is None:
+        correlation_columns, pearson, spearman = calculate_report_correlations(report.columns)
+        report.update(set__correlation_columns=correlation_columns,
+                      set__pearson_correlations=pack_upper_triangle(pearson),
+                      set__spearman_correlations=pack_upper_triangle(spearman),
+                      inc__revision=1, set__date_modified=datetime.now(timezone.utc))
+        report.reload()
+    size = len(report.correlation_columns)
+    return {
+        'columns': report.correlation_columns,
+        'pearson': correlation_matrix_to_list(unpack_upper_triangle(report.pearson_correlations, size)),
+        'spearman': correlation_matrix_to_list(unpack_upper_triangle(report.spearman_correlations, size)),
+    }
+
+
+def get_report_column_outliers(report_id: int, column_id: int, method: str = "iqr",
+                               current_user: User = Depends(get_current_user)) -> Dict[str, Any]:
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not get column outliers for report id = {report_id}. Customer does not exist.")
+    if not (report := Report.objects(id=report_id, is_active=True, user=customer).only('columns').first()):
+        raise NotFoundError(f"Could not get column outliers for report id {report_id}. Report does not exist.")
+    if column_id not in report.to_mongo()['columns'] or \
+            not (report_column := ReportColumn.objects(id=column_id, is_active=True)
+                 .exclude('column_data', 'packed_data', 'null_bitmap').first()):
+        raise NotFoundError(f"Could not get column outliers. There is no column with id = {column_id} "
+                            f"in report with id = {report_id}")
+    return get_column_outlier_rows(report_column, method)
+
+
 def get_report_indicator_values(report_id: int, current_user: User = Depends(get_current_user)) -> {str: [float, str]}:
+    """One ownership check, then every active column joined to its indicator values and their names in one pipeline.
+
+    Values keep the order of the column's indicator_values, inactive values are left out.
+    """
     if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
         raise NotFoundError(f"Could not get report indicator values for id = {report_id}. Customer does not exist.")
-    if not (report := Report.objects(id=report_id, is_active=True, user=customer).first()):
+    if not (report := Report.objects(id=report_id, is_active=True, user=customer).only('columns').as_pymongo()
+            .first()):
         raise NotFoundError(f"Could not get report indicator values for id {report_id}. Report does not exist.")
-    report_columns = report.columns
-    column_values: {str: [float, str]} = {}
-    for report_column in report_columns:
-        indicator_values_get = IndicatorValuesGet(user=current_user.id, report=report_id, column=report_column.id)
-        indicator_values: [[float, str]] = get_indicator_values(indicator_values_get)
-        column_values[report_column.name] = indicator_values
-    return column_values
+    rows = ReportColumn._get_collection().aggregate([
+        {'$match': {'_id': {'$in': report['columns']}, 'is_active': True}},
+        {'$project': {'name': 1, 'indicator_values': 1}},
+        {'$lookup': {'from': IndicatorValue._get_collection_name(), 'localField': 'indicator_values',
+                     'foreignField': '_id', 'as': 'indicator_value'}},
+        {'$unwind': {'path': '$indicator_value', 'preserveNullAndEmptyArrays': True}},
+        {'$lookup': {'from': ReportIndicator._get_collection_name(), 'localField': 'indicator_value.report_indicator',
+                     'foreignField': '_id', 'as': 'report_indicator'}},
+    ])
+    columns: Dict[int, Tuple[str, List[int]]] = {}
+    indicator_values: Dict[int, List[Any]] = {}
+    for row in rows:
+        columns[row['_id']] = (row['name'], row.get('indicator_values', []))
+        indicator_value = row.get('indicator_value')
+        if indicator_value and indicator_value.get('is_active', True) and row['report_indicator']:
+            indicator_values[indicator_value['_id']] = [indicator_value.get('value'),
+                                                        row['report_indicator'][0]['name']]
+    column_positions = {column_id: position for position, column_id in enumerate(report['columns'])}
+    return {column_name: [indicator_values[value_id] for value_id in value_ids if value_id in indicator_values]
+            for _, (column_name, value_ids) in sorted(columns.items(), key=lambda item: column_positions[item[0]])}
+
+
+def load_column_statistics(column_ids: List[int]) -> List[Tuple[str, Dict[str, Any], TDigest]]:
+    """Read the name, summary and quantile sketch of active columns, leaving their values in storage.
+
+    Columns stored before summaries and sketches existed are computed from their values instead.
+    """
+    collection = ReportColumn._get_collection()
+    column_statistics, legacy_column_ids = [], []
+    for report_column in collection.find({'_id': {'$in': column_ids}, 'is_active': True},
+                                         {'name': 1, 'summary': 1, 'quantile_sketch': 1}):
+        if report_column.get('summary') and report_column.get('quantile_sketch') is not None:
+            column_statistics.append((report_column['name'], report_column['summary'],
+                                      TDigest.from_bytes(report_column['quantile_sketch'])))
+        else:
+            legacy_column_ids.append(report_column['_id'])
+    for report_column in ReportColumn.objects(id__in=legacy_column_ids):
+        column_values = report_column.get_column_values()
+        column_statistics.append((report_column.name, summarize_column(column_values),
+                                  TDigest.from_values(column_values)))
+    return column_statistics
+
+
+def aggregate_column_statistics(column_statistics: List[Tuple[str, Dict[str, Any], TDigest]]) \
+        -> Dict[str, Dict[str, Optional[float]]]:
+    grouped: Dict[str, Dict[str, Any]] = {}
+    for column_name, summary, quantile_sketch in column_statistics:
+        group = grouped.setdefault(column_name, {'columns': 0, 'count': 0, 'null_count': 0, 'sum': 0.0,
+                                                 'min': None, 'max': None, 'quantile_sketch': TDigest()})
+        group['columns'] += 1
+        group['count'] += summary['count'] - summary['null_count']
+        group['null_count'] += summary['null_count']
+        group['sum'] += summary['sum']
+        if summary['min'] is not None:
+            group['min'] = summary['min'] if group['min'] is None else min(group['min'], summary['min'])
+            group['max'] = summary['max'] if group['max'] is None else max(group['max'], summary['max'])
+        group['quantile_sketch'] = group['quantile_sketch'].merge(quantile_sketch)
+    aggregates = {}
+    for column_name, group in grouped.items():
+        quantile_sketch = group.pop('quantile_sketch')
+        has_values = quantile_sketch.count > 0
+        aggregates[column_name] = dict(group, **{
+            'mean': group['sum'] / group['count'] if group['count'] else None,
+            'median': quantile_sketch.quantile(.5),
+            'quartile q1': quantile_sketch.quantile(.25),
+            'quartile q2': quantile_sketch.quantile(.5),
+            'quartile q3': quantile_sketch.quantile(.75),
+            'outliers number': calculate_sketch_outliers_number(quantile_sketch) if has_values else None,
+            'variation range': group['max'] - group['min'] if group['min'] is not None else None,
+        })
+    return aggregates
+
+
+def get_current_customer_aggregates(current_user: User = Depends(get_current_user)) \
+        -> Dict[str, Dict[str, Optional[float]]]:
+    """Indicators of every active report of the customer, grouped by column name.
+
+    Only the per-column summaries and quantile sketches are read, so the cost does not depend on report sizes.
+    Mode is left out because it cannot be combined from per-column statistics.
+    """
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not get aggregate indicators for {current_user}. Customer does not exist.")
+    column_ids = [column_id for report in Report._get_collection().find({'user': customer.id, 'is_active': True},
+                                                                          {'columns': 1})
+                  for column_id in report.get('columns', [])]
+    return aggregate_column_statistics(load_column_statistics(column_ids))
@@ -1,20 +1,256 @@
-from typing import List, Optional
+import os
+import shutil
+from uuid import uuid4
+from typing import Callable, Dict, List, Optional
 
+import numpy as np
+from pymongo import UpdateOne
+
+from custom_types.t_digest import TDigest
+from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
+from models.indicator_value import IndicatorValue
+from models.outlier_mask import OutlierMask
 from models.report_column import ReportColumn
 from schemas.report_column import ReportColumnCreate
 
-from services.indicator_value import delete_indicator_value
+from services.indicator_value import delete_indicator_value, sorted_quantile
+from services.utils import allocate_sequence_ids
+
+# Columns taller than this are screened on a seeded subsample of this many values, 0 screens every value.
+NORMALITY_SAMPLE_SIZE = int(os.getenv("NORMALITY_SAMPLE_SIZE", "0"))
+NORMALITY_SAMPLE_SEED = 0
+# Confidence level of the subsample error bound stored next to the screening result.
+NORMALITY_ERROR_ALPHA = 0.05
 
 
 def create_report_column(report_column_create: ReportColumnCreate) -> int:
     report_column = ReportColumn(name=report_column_create.name,
-                                 column_data=report_column_create.column_data,
                                  indicator_values=report_column_create.indicator_values)
+    report_column.set_column_values(np.array(report_column_create.column_data, dtype=np.float64))
     report_column.save()
     return report_column.id
 
 
+def create_report_columns(report_columns: List[ReportColumn]) -> List[ReportColumn]:
+    """Insert the columns of one upload with a single id reservation and a single insert_many."""
+    for report_column, report_column_id in zip(report_columns, allocate_sequence_ids(ReportColumn,
+                                                                                     len(report_columns))):
+        report_column.id = report_column_id
+        report_column.validate()
+    try:
+        ReportColumn._get_collection().insert_many([report_column.to_mongo() for report_column in report_columns])
+    except Exception:
+        discard_report_columns(report_columns)
+        raise
+    return report_columns
+
+
+def copy_report_columns(report_column_ids: List[int], spill_directory: str) -> Optional[List[ReportColumn]]:
+    """Duplicate stored columns with their indicator values, keeping the given column order.
+
+    Spilled values are copied into `spill_directory`, so the copies never share files with their source.
+    Returns None without writing anything when a source column or one of its indicator values is no longer
+    active, the upload then has to be analysed again.
+    """
+    source_columns = {report_column['_id']: report_column for report_column in
+                      ReportColumn._get_collection().find({'_id': {'$in': report_column_ids}, 'is_active': True})}
+    source_value_ids = [indicator_value_id for report_column in source_columns.values()
+                        for indicator_value_id in report_column.get('indicator_values', [])]
+    source_values = {indicator_value['_id']: indicator_value for indicator_value in
+                     IndicatorValue._get_collection().find({'_id': {'$in': source_value_ids}, 'is_active': True})}
+    if len(source_columns) != len(set(report_column_ids)) or len(source_values) != len(set(source_value_ids)):
+        return None
+    column_ids = iter(allocate_sequence_ids(ReportColumn, len(report_column_ids)))
+    indicator_value_ids = iter(allocate_sequence_ids(IndicatorValue, len(source_values)))
+    copied_columns, copied_values = [], []
+    for report_column_id in report_column_ids:
+        copied_column = dict(source_columns[report_column_id], _id=next(column_ids), is_active=True,
+                             indicator_values=[])
+        if copied_column.get('spill_path'):
+            os.makedirs(spill_directory, exist_ok=True)
+            copied_column['spill_path'] = shutil.copyfile(copied_column['spill_path'],
+                                                          os.path.join(spill_directory, f"{uuid4().hex}.npy"))
+        for indicator_value_id in source_columns[report_column_id].get('indicator_values', []):
+            if indicator_value_id in source_values:
+                copied_values.append(dict(source_values[indicator_value_id], _id=next(indicator_value_ids)))
+                copied_column['indicator_values'].append(copied_values[-1]['_id'])
+        copied_columns.append(copied_column)
+    copied_column_ids = {report_column_id: copied_column['_id']
+                         for report_column_id, copied_column in zip(report_column_ids, copied_columns)}
+    copied_masks = [dict(outlier_mask, column=copied_column_ids[outlier_mask['column']]) for outlier_mask in
+                    OutlierMask._get_collection().find({'column': {'$in': list(copied_column_ids)}}, {'_id': 0})]
+    report_columns = [ReportColumn._from_son(copied_column) for copied_column in copied_columns]
+    try:
+        if copied_values:
+            IndicatorValue._get_collection().insert_many(copied_values)
+        if copied_masks:
+            OutlierMask._get_collection().insert_many(copied_masks)
+        ReportColumn._get_collection().insert_many(copied_columns)
+    except Exception:
+        discard_report_columns(report_columns)
+        raise
+    return report_columns
+
+
+def discard_report_columns(report_columns: List[ReportColumn]) -> None:
+    """Remove the columns of a failed upload together with their indicator values and spilled files."""
+    column_ids = [report_column.id for report_column in report_columns]
+    for report_column in report_columns:
+        if report_column.spill_path and os.path.exists(report_column.spill_path):
+            os.remove(report_column.spill_path)
+    indicator_value_ids = [indicator_value.id for report_column in report_columns
+                           for indicator_value in report_column.indicator_values]
+    IndicatorValue.objects(id__in=indicator_value_ids).delete()
+    OutlierMask.objects(column__in=column_ids).delete()
+    ReportColumn.objects(id__in=column_ids).delete()
+
+
+def screen_column_normality(report_column: ReportColumn) -> ReportColumn:
+    """Run the Kolmogorov-Smirnov test against the standard normal on the standardised present values of a column.
+
+    Values are standardised with the mean and standard deviation of the tested values, as in the Lilliefors test,
+    so the screen does not depend on the column's location and scale. As the parameters are estimated, the stored
+    p-value is conservative.
+
+    When the column has more than NORMALITY_SAMPLE_SIZE values, a seeded subsample of m values is tested instead.
+    By the Dvoretzky-Kiefer-Wolfowitz inequality, the subsample statistic is then within
+    sqrt(ln(2 / alpha) / (2 m)) of the full-column statistic with probability 1 - alpha. That bound is stored
+    as normality_error_bound, and it is 0 when every value was tested.
+    """
+    from scipy.stats import kstest
+    column_values = report_column.get_column_values()
+    present_values = column_values[~np.isnan(column_values)]
+    error_bound = 0.0
+    if 0 < NORMALITY_SAMPLE_SIZE < present_values.size:
+        present_values = np.random.default_rng(NORMALITY_SAMPLE_SEED).choice(present_values, NORMALITY_SAMPLE_SIZE,
+                                                                             replace=False)
+        error_bound = float(np.sqrt(np.log(2 / NORMALITY_ERROR_ALPHA) / (2 * NORMALITY_SAMPLE_SIZE)))
+    standard_deviation = present_values.std(ddof=1) if present_values.size > 1 else 0.0
+    statistic, p_value = kstest((present_values - present_values.mean()) / (standard_deviation or 1.0), 'norm')
+    report_column.normality_statistic = float(statistic)
+    report_column.normality_p_value = float(p_value)
+    report_column.normality_sample_size = int(present_values.size)
+    report_column.normality_error_bound = error_bound
+    return report_column
+
+
+def screen_report_columns(report_columns: List[ReportColumn]) -> None:
+    """Screen every column of an upload once and store the results with a single bulk update."""
+    column_updates = []
+    for report_column in report_columns:
+        screen_column_normality(report_column)
+        column_updates.append(UpdateOne({'_id': report_column.id}, {'$set': {
+            'normality_statistic': report_column.normality_statistic,
+            'normality_p_value': report_column.normality_p_value,
+            'normality_sample_size': report_column.normality_sample_size,
+            'normality_error_bound': report_column.normality_error_bound}}))
+    if column_updates:
+        ReportColumn._get_collection().bulk_write(column_updates, ordered=False)
+
+
+outlier_methods: Dict[str, Callable[[np.ndarray], np.ndarray]] = {}
+
+
+def register_outlier_method(name: str):
+    """Outlier methods receive the raw column with NaN for nulls and return a boolean mask of the same length."""
+    def decorator(func: Callable[[np.ndarray], np.ndarray]):
+        outlier_methods[name] = func
+        return func
+
+    return decorator
+
+
+@register_outlier_method('iqr')
+def detect_iqr_outliers(column_values: np.ndarray) -> np.ndarray:
+    """The rule of the outliers number indicator: below q1 - IQR or above q3 + IQR."""
+    column_data = np.sort(column_values[~np.isnan(column_values)])
+    if not column_data.size:
+        return np.zeros(column_values.size, dtype=bool)
+    q1 = sorted_quantile(column_data, .25)
+    q3 = sorted_quantile(column_data, .75)
+    iqr = q3 - q1
+    return (column_values < q1 - iqr) | (column_values > q3 + iqr)
+
+
+@register_outlier_method('zscore')
+def detect_zscore_outliers(column_values: np.ndarray) -> np.ndarray:
+    """More than 3 standard deviations away from the mean."""
+    present_values = column_values[~np.isnan(column_values)]
+    if not present_values.size or (std := present_values.std()) == 0:
+        return np.zeros(column_values.size, dtype=bool)
+    return np.abs(column_values - present_values.mean()) > 3 * std
+
+
+@register_outlier_method('mad')
+def detect_mad_outliers(column_values: np.ndarray) -> np.ndarray:
+    """Modified z-score 0.6745 * |x - median| / MAD above 3.5 (Iglewicz and Hoaglin)."""
+    present_values = column_values[~np.isnan(column_values)]
+    if not present_values.size:
+        return np.zeros(column_values.size, dtype=bool)
+    median = np.median(present_values)
+    if (mad := np.median(np.abs(present_values - median))) == 0:
+        return np.zeros(column_values.size, dtype=bool)
+    return 0.6745 * np.abs(column_values - median) / mad > 3.5
+
+
+def get_outlier_method(method: str) -> Callable[[np.ndarray], np.ndarray]:
+    if not (outlier_method := outlier_methods.get(method.lower())):
+        raise BadRequestError(f"Outlier method must be one of {sorted(outlier_methods)}")
+    return outlier_method
+
+
+def detect_column_outliers(report_column: ReportColumn) -> Dict[str, np.ndarray]:
+    """Run every outlier method on a column, set its outlier counts and return the row masks by method."""
+    column_values = report_column.get_column_values()
+    outlier_masks = {method: outlier_method(column_values) for method, outlier_method in outlier_methods.items()}
+    report_column.outlier_counts = {method: int(np.count_nonzero(outlier_mask))
+                                    for method, outlier_mask in outlier_masks.items()}
+    return outlier_masks
+
+
+def detect_report_outliers(report_columns: List[ReportColumn]) -> None:
+    """Store the counts on the columns and the masks, one bit per row, in their own collection."""
+    column_updates, outlier_masks = [], []
+    for report_column in report_columns:
+        for method, outlier_mask in detect_column_outliers(report_column).items():
+            outlier_masks.append(OutlierMask(column=report_column.id, method=method, rows=outlier_mask.size,
+                                             mask=np.packbits(outlier_mask).tobytes()).to_mongo())
+        column_updates.append(UpdateOne({'_id': report_column.id},
+                                        {'$set': {'outlier_counts': report_column.outlier_counts}}))
+    if column_updates:
+        OutlierMask._get_collection().delete_many(
+            {'column': {'$in': [report_column.id for report_column in report_columns]}})
+        OutlierMask._get_collection().insert_many(outlier_masks)
+        ReportColumn._get_collection().bulk_write(column_updates, ordered=False)
+
+
+def get_column_outlier_rows(report_column: ReportColumn, method: str) -> Dict[str, object]:
+    """Outlier row positions of one method, columns stored before masks existed are analysed on first request.
+
+    `report_column` may be loaded without its values, they are only read when the masks have to be computed.
+    """
+    get_outlier_method(method)
+    method = method.lower()
+    if not (outlier_mask := OutlierMask.objects(column=report_column.id, method=method).first()):
+        detect_report_outliers([ReportColumn.objects(id=report_column.id).first()])
+        outlier_mask = OutlierMask.objects(column=report_column.id, method=method).first()
+    rows = np.flatnonzero(np.unpackbits(np.frombuffer(outlier_mask.mask, dtype=np.uint8), count=outlier_mask.rows))
+    return {'column': report_column.id, 'method': method, 'count': int(rows.size), 'rows': rows.tolist()}
+
+
+def merge_quantile_sketches(report_columns: List[ReportColumn]) -> TDigest:
+    """Combine the stored sketches of several columns, possibly from different reports, without their values."""
+    quantile_sketch = TDigest()
+    for report_column in report_columns:
+        quantile_sketch = quantile_sketch.merge(report_column.get_quantile_sketch())
+    return quantile_sketch
+
+
+def get_columns_quantile(report_columns: List[ReportColumn], quantile: float) -> Optional[float]:
+    return merge_quantile_sketches(report_columns).quantile(quantile)
+
+
 def delete_report_column(report_column_id):
     if not (report_column := ReportColumn.objects(id=report_column_id, is_active=True).first()):
         raise NotFoundError(f"Could not delete report column. There is no such entity with id = {report_column_id}")
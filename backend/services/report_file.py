@@ -0,0 +1,221 @@
+import csv
+import hashlib
+import os
+import tempfile
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from fastapi import UploadFile
+from openpyxl import load_workbook
+from starlette.concurrency import run_in_threadpool
+
+from errors.bad_request import BadRequestError
+from errors.payload_too_large import PayloadTooLargeError
+
+NON_NUMERIC_DATA_ERROR = "Could not save file. Dataset contains non numeric data"
+NAN_LITERALS = ["nan", "+nan", "-nan"]
+# Inferred types of object columns that cannot hold booleans, which to_numeric would turn into 0 and 1.
+NUMERIC_CELL_TYPES = ["empty", "string", "floating", "integer", "mixed-integer-float"]
+MAX_UPLOAD_BYTES = int(os.getenv("REPORT_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+REPORT_CHUNK_ROWS = 100_000
+
+# Receives {column name: float64 values} for consecutive blocks of data rows while a report is read.
+ChunkCallback = Callable[[Dict[str, np.ndarray]], None]
+
+
+def check_upload_size(size: int):
+    if size > MAX_UPLOAD_BYTES:
+        raise PayloadTooLargeError(f"Could not save file. File exceeds the limit of {MAX_UPLOAD_BYTES} bytes")
+
+
+def move_upload_into_place(temp_path: str, file_path: str):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    os.replace(temp_path, file_path)
+
+
+async def save_upload_file(upload_file: UploadFile, destination: str) -> Tuple[str, str]:
+    """Stream the upload to a temporary file off the event loop, hashing it on the way.
+
+    The file is then renamed to <destination>/<sha256>/<filename>. Uploads that share a name but not their
+    content never overwrite each other.
+    """
+    if upload_file.size is not None:
+        check_upload_size(upload_file.size)
+    file_hash = hashlib.sha256()
+    received_bytes = 0
+    temp_file = await run_in_threadpool(tempfile.NamedTemporaryFile, dir=destination, suffix=".part", delete=False)
+    try:
+        while chunk := await upload_file.read(UPLOAD_CHUNK_BYTES):
+            received_bytes += len(chunk)
+            check_upload_size(received_bytes)
+            file_hash.update(chunk)
+            await run_in_threadpool(temp_file.write, chunk)
+        await run_in_threadpool(temp_file.close)
+        content_hash = file_hash.hexdigest()
+        file_path = os.path.join(destination, content_hash, os.path.basename(upload_file.filename))
+        await run_in_threadpool(move_upload_into_place, temp_file.name, file_path)
+    except Exception:
+        temp_file.close()
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+        raise
+    finally:
+        await upload_file.close()
+    return file_path, content_hash
+
+
+def check_column_name_list(column_names: List[Any]) -> bool:
+    if any(name is None or str(name).strip() == "" for name in column_names) or \
+            len(set(column_names)) != len(column_names):
+        raise BadRequestError("All columns must have unique, non-empty names")
+    return True
+
+
+def coerce_column(column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert a column to float64 in one vectorized pass, returning the values and their null mask."""
+    if pd.api.types.is_bool_dtype(column) or pd.api.types.is_datetime64_any_dtype(column) or \
+            pd.api.types.is_timedelta64_dtype(column) or isinstance(column.dtype, pd.PeriodDtype):
+        raise BadRequestError(NON_NUMERIC_DATA_ERROR)
+    if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) not in NUMERIC_CELL_TYPES and \
+            column.map(lambda value: isinstance(value, (bool, np.bool_))).any():
+        raise BadRequestError(NON_NUMERIC_DATA_ERROR)
+    null_mask = (column.isnull() | column.eq('')).to_numpy()
+    column_values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    unparsed = np.isnan(column_values) & ~null_mask
+    if unparsed.any():
+        if not column[unparsed].astype(str).str.strip().str.lower().isin(NAN_LITERALS).all():
+            raise BadRequestError(NON_NUMERIC_DATA_ERROR)
+        null_mask |= unparsed
+    return column_values, null_mask
+
+
+def coerce_rows(rows: List[tuple], column_count: int) -> List[np.ndarray]:
+    """Coerce a block of raw sheet rows column by column, short rows are padded with NaN."""
+    df = pd.DataFrame.from_records(rows).reindex(columns=range(column_count))
+    return [coerce_column(df[index])[0] for index in range(column_count)]
+
+
+def read_header(rows) -> List[str]:
+    header = list(next(rows, ()))
+    while header and header[-1] in (None, ''):
+        header.pop()
+    check_column_name_list(header)
+    return [str(name) for name in header]
+
+
+def read_xlsx_header(file_path: str) -> List[str]:
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return read_header(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def feed_column_chunks(columns: Dict[str, np.ndarray], on_chunk: Optional[ChunkCallback], start: int = 0):
+    """Pass row blocks of already parsed columns, from `start` on, to `on_chunk` as views."""
+    if on_chunk is None:
+        return
+    rows = max((column_values.size for column_values in columns.values()), default=0)
+    for chunk_start in range(start, rows, REPORT_CHUNK_ROWS):
+        on_chunk({name: column_values[chunk_start:chunk_start + REPORT_CHUNK_ROWS]
+                  for name, column_values in columns.items()})
+
+
+def read_xlsx_columns(file_path: str, on_chunk: Optional[ChunkCallback] = None) -> Dict[str, np.ndarray]:
+    """Read the first sheet in blocks of REPORT_CHUNK_ROWS rows, coercing each block with `coerce_column`.
+
+    Empty cells become NaN and trailing empty rows are dropped. Every coerced block is passed to `on_chunk`
+    while the rest of the sheet is read.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        column_names = read_header(rows)
+        chunks: List[List[np.ndarray]] = []
+        rows_read, filled_rows = 0, 0
+        while True:
+            raw_rows = list(islice(rows, REPORT_CHUNK_ROWS))
+            if not raw_rows:
+                break
+            chunk = coerce_rows(raw_rows, len(column_names))
+            filled = np.zeros(len(raw_rows), dtype=bool)
+            for column_values in chunk:
+                filled |= ~np.isnan(column_values)
+            if filled.any():
+                filled_rows = rows_read + int(np.flatnonzero(filled)[-1]) + 1
+            rows_read += len(raw_rows)
+            chunks.append(chunk)
+            if on_chunk is not None and len(raw_rows) == REPORT_CHUNK_ROWS:
+                on_chunk(dict(zip(column_names, chunk)))
+    finally:
+        workbook.close()
+    columns = {name: np.concatenate([chunk[index] for chunk in chunks])[:filled_rows] if chunks
+               else np.empty(0, dtype=np.float64) for index, name in enumerate(column_names)}
+    feed_column_chunks(columns, on_chunk, start=rows_read - rows_read % REPORT_CHUNK_ROWS)
+    return columns
+
+
+def read_csv_header(file_path: str) -> List[str]:
+    with open(file_path, newline='') as csv_file:
+        return read_header(csv.reader(csv_file))
+
+
+def read_csv_frame(file_path: str, column_names: List[str], dtype) -> pd.DataFrame:
+    try:
+        return pd.read_csv(file_path, engine='c', header=0, names=column_names, usecols=range(len(column_names)),
+                           dtype=dtype, keep_default_na=False, na_values=[''])
+    except pd.errors.ParserError:
+        raise BadRequestError("Could not save file. Dataset rows do not match the header")
+
+
+def read_csv_columns(file_path: str, on_chunk: Optional[ChunkCallback] = None) -> Dict[str, np.ndarray]:
+    column_names = read_csv_header(file_path)
+    try:
+        df = read_csv_frame(file_path, column_names, np.float64)
+    except ValueError:
+        df = read_csv_frame(file_path, column_names, str)
+    columns = {column_name: coerce_column(df[column_name])[0] for column_name in column_names}
+    feed_column_chunks(columns, on_chunk)
+    return columns
+
+
+def read_parquet_header(file_path: str) -> List[str]:
+    column_names = pq.read_schema(file_path).names
+    check_column_name_list(column_names)
+    return column_names
+
+
+def read_parquet_columns(file_path: str, on_chunk: Optional[ChunkCallback] = None) -> Dict[str, np.ndarray]:
+    column_names = read_parquet_header(file_path)
+    df = pd.read_parquet(file_path, columns=column_names)
+    columns = {column_name: coerce_column(df[column_name])[0] for column_name in column_names}
+    feed_column_chunks(columns, on_chunk)
+    return columns
+
+
+report_readers = {
+    'xls': (read_xlsx_header, read_xlsx_columns),
+    'xlsx': (read_xlsx_header, read_xlsx_columns),
+    'csv': (read_csv_header, read_csv_columns),
+    'parquet': (read_parquet_header, read_parquet_columns),
+}
+
+
+def get_report_reader(file_path: str):
+    if not (reader := report_readers.get(file_path.split(".")[-1].lower())):
+        raise BadRequestError("File extension not allowed")
+    return reader
+
+
+def read_report_header(file_path: str) -> List[str]:
+    header_reader, _ = get_report_reader(file_path)
+    return header_reader(file_path)
+
+
+def read_report_columns(file_path: str, on_chunk: Optional[ChunkCallback] = None) -> Dict[str, np.ndarray]:
+    _, columns_reader = get_report_reader(file_path)
+    return columns_reader(file_path, on_chunk)
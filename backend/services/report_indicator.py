@@ -1,9 +1,11 @@
 from typing import Optional
 
 from errors.not_found import NotFoundError
+from models.indicator_value import IndicatorValue
+from models.report_column import ReportColumn
 from models.report_indicator import ReportIndicator
 from schemas.report_indicator import ReportIndicatorUpdate
-from services.utils import check_admin_access
+from services.utils import check_admin_access, touch_reports
 
 
 def get_report_indicators_by_admin(user_id: int):
@@ -31,12 +33,21 @@ def get_report_indicator_by_name(user_id: int, report_indicator_name: str) -> Op
         f"Could not get report_indicator with name = {report_indicator_name}. There is no such entity")
 
 
+def touch_indicator_reports(report_indicator: ReportIndicator):
+    """Reports serve indicator names next to their values, so only the reports holding a value of it change."""
+    indicator_value_ids = IndicatorValue.objects(report_indicator=report_indicator, is_active=True).scalar('id')
+    touch_reports(columns__in=ReportColumn.objects(indicator_values__in=indicator_value_ids).scalar('id'))
+
+
 def update_report_indicator(user_id: int, report_indicator_id: int, report_indicator_body: ReportIndicatorUpdate) -> \
         Optional[ReportIndicator]:
     check_admin_access(user_id)
     if report_indicator := ReportIndicator.objects(id=report_indicator_id).first():
+        previous_name = report_indicator.name
         for field, value in report_indicator_body.dict(exclude_unset=True).items():
             setattr(report_indicator, field, value)
         report_indicator.save()
+        if report_indicator.name != previous_name:
+            touch_indicator_reports(report_indicator)
         return report_indicator
     raise NotFoundError(f"Could not get report_indicator with id = {report_indicator_id}. There is no such entity")
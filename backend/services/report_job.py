@@ -0,0 +1,119 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Optional
+
+from fastapi import Depends, UploadFile
+from mongoengine import connect
+from starlette.concurrency import run_in_threadpool
+
+from errors.bad_request import BadRequestError
+from errors.not_found import NotFoundError
+from models.customer import Customer
+from models.report_job import ReportJob
+from models.user import User
+from services.report import build_report, delete_file, upload_report
+from services.report_file import read_report_header
+from services.user import get_current_user
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+
+JOB_STAGE_QUEUED = "queued"
+JOB_STAGE_DONE = "done"
+JOB_STAGE_FAILED = "failed"
+
+logging.basicConfig(level=logging.INFO,
+                    format="%(levelname)s:  %(asctime)s  %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+report_executor: Optional[Executor] = None
+
+
+def connect_worker():
+    connect(host=os.getenv("MONGODB_URL"))
+
+
+def get_report_executor() -> Executor:
+    global report_executor
+    if report_executor is None:
+        report_executor = ProcessPoolExecutor(max_workers=REPORT_JOB_WORKERS,
+                                              mp_context=multiprocessing.get_context("spawn"),
+                                              initializer=connect_worker)
+    return report_executor
+
+
+def update_report_job(job_id: int, stage: str, progress: int, **fields):
+    ReportJob.objects(id=job_id).update_one(set__stage=stage, set__progress=progress,
+                                            **{f"set__{name}": value for name, value in fields.items()})
+
+
+def run_report_job(job_id: int) -> None:
+    if not (job := ReportJob.objects(id=job_id).first()):
+        raise NotFoundError(f"Could not run report job with id = {job_id}. Job does not exist.")
+    try:
+        if not (customer := Customer.objects(id=job.user.id, is_active=True).first()):
+            raise NotFoundError(f"Could not upload report. There is no customer {job.user.id}")
+        report_id = build_report(customer, job.file_path, job.content_hash,
+                                 lambda stage, progress: update_report_job(job_id, stage, progress))
+    except (BadRequestError, NotFoundError) as e:
+        update_report_job(job_id, JOB_STAGE_FAILED, 100, error=str(e))
+    except Exception:
+        logging.exception(f"Report job with id = {job_id} failed")
+        update_report_job(job_id, JOB_STAGE_FAILED, 100, error="Could not process the report")
+    else:
+        update_report_job(job_id, JOB_STAGE_DONE, 100, report=report_id)
+
+
+def reset_report_executor(broken_executor: Executor) -> None:
+    """Drop a pool whose worker died, the next job starts a fresh one."""
+    global report_executor
+    if report_executor is broken_executor:
+        report_executor = None
+        broken_executor.shutdown(wait=False)
+
+
+def handle_report_job_crash(job_id: int, executor: Executor, future: Future) -> None:
+    """Jobs whose worker died, for example killed when out of memory, never reach a final stage on their own."""
+    if future.cancelled() or not (exception := future.exception()):
+        return
+    logging.error(f"Report job with id = {job_id} crashed: {exception}")
+    update_report_job(job_id, JOB_STAGE_FAILED, 100, error="Could not process the report")
+    if isinstance(exception, BrokenExecutor):
+        reset_report_executor(executor)
+
+
+def submit_report_job(job_id: int) -> None:
+    executor = get_report_executor()
+    try:
+        future = executor.submit(run_report_job, job_id)
+    except BrokenExecutor:
+        reset_report_executor(executor)
+        executor = get_report_executor()
+        future = executor.submit(run_report_job, job_id)
+    future.add_done_callback(partial(handle_report_job_crash, job_id, executor))
+
+
+async def create_report_job(report_file: UploadFile, current_user: User = Depends(get_current_user)) -> int:
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not upload report. There is no customer {current_user}")
+    file_path, content_hash = await upload_report(customer, report_file)
+    try:
+        await run_in_threadpool(read_report_header, file_path)
+    except BadRequestError:
+        delete_file(file_path)
+        raise
+    job = ReportJob(user=customer, file_path=file_path, content_hash=content_hash, stage=JOB_STAGE_QUEUED,
+                    date_created=datetime.now()).save()
+    submit_report_job(job.id)
+    return job.id
+
+
+def get_report_job(job_id: int, current_user: User = Depends(get_current_user)) -> ReportJob:
+    if not current_user or not (customer := Customer.objects(id=current_user.id, is_active=True).first()):
+        raise NotFoundError(f"Could not get report job with id = {job_id}. Customer does not exist.")
+    if not (job := ReportJob.objects(id=job_id, user=customer).first()):
+        raise NotFoundError(f"Could not get report job with id = {job_id}. Job does not exist.")
+    return job
@@ -27,6 +27,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
 ACCESS_TOKEN_EXPIRE_SECONDS = int(os.getenv('ACCESS_TOKEN_EXPIRE_SECONDS'))
+# Fields user listings may return, the password hash is never one of them.
+USER_LIST_FIELDS = ('id', 'name', 'email', 'role', 'is_active')
 
 
 def verify_password(plain_password, hashed_password):
@@ -1,23 +1,77 @@
+import base64
+import binascii
+import os
 import random
+from datetime import datetime, timezone
 import re
 from re import Match
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+
+import numpy as np
+from bson import json_util
+from mongoengine import Document, Q
+from mongoengine.connection import get_db
+from mongoengine.queryset import QuerySet
+from pymongo import ReturnDocument
 
 from models.role import Role
 from models.user import User
 
+from errors.bad_request import BadRequestError
 from errors.forbidden import ForbiddenError
 from errors.not_found import NotFoundError
 
+from models.report import Report
 from models.report_column import ReportColumn
 
 from models.admin import Admin
 
 
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple):
+    items: List[dict]
+    next_cursor: Optional[str]
+
+    def to_json(self) -> str:
+        # Same encoding as QuerySet.to_json, so paged listings keep their previous JSON shape.
+        return json_util.dumps(self.items, json_options=json_util.LEGACY_JSON_OPTIONS)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {NEXT_CURSOR_HEADER: self.next_cursor} if self.next_cursor else {}
+
+
 def models_to_dict(objs: list):
     return [obj.to_dict() for obj in objs]
 
 
+def prefetch_references(documents: List[Document], field_name: str, document_class: Type[Document]) -> List[Document]:
+    """Resolve a reference or list of references field of `documents` with one query instead of one per document.
+
+    References to missing documents are left out, the loaded documents are returned for prefetching further down.
+    """
+    references = [document.to_mongo(fields=[field_name]).get(field_name) for document in documents]
+    reference_ids = {reference_id for reference in references if reference is not None
+                     for reference_id in (reference if isinstance(reference, list) else [reference])}
+    loaded_documents = document_class.objects.in_bulk(list(reference_ids)) if reference_ids else {}
+    for document, reference in zip(documents, references):
+        if isinstance(reference, list):
+            setattr(document, field_name, [loaded_documents[reference_id] for reference_id in reference
+                                           if reference_id in loaded_documents])
+        elif reference in loaded_documents:
+            setattr(document, field_name, loaded_documents[reference])
+    return list(loaded_documents.values())
+
+
+def touch_reports(**filters) -> None:
+    """Mark reports whose served content changed after upload, moving their ETag and Last-Modified validators."""
+    Report.objects(**filters).update(inc__revision=1, set__date_modified=datetime.now(timezone.utc))
+
+
 def check_admin_access(admin_id: int) -> Optional[bool]:
     if admin := Admin.objects(id=admin_id, is_active=True).first():
         if (role := Role.objects(id=admin.role.id).first()) and role.name.lower() == 'admin':
@@ -35,10 +89,73 @@ def check_customer_access(user_id: int) -> Optional[bool]:
 
 
 def filter_column_data(column: ReportColumn) -> Optional[List[float]]:
-    filtered_data = [value for value in column.column_data if value is not None]
+    column_values = column.get_column_values()
+    filtered_data = column_values[~np.isnan(column_values)].tolist()
     return filtered_data if len(filtered_data) > 0 else None
 
 
+def select_fields(fields: Optional[str], allowed_fields: Tuple[str, ...], default_fields: Tuple[str, ...]) -> List[str]:
+    """Parse a comma separated `fields` query parameter into the fields a listing projects, `id` is always kept."""
+    if not fields:
+        return list(default_fields)
+    selected_fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if unknown_fields := [field for field in selected_fields if field not in allowed_fields]:
+        raise BadRequestError(f"Could not select fields {', '.join(unknown_fields)}. Allowed fields are "
+                              f"{', '.join(allowed_fields)}")
+    return selected_fields
+
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: List[str]) -> dict:
+    try:
+        position = json_util.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequestError(f"Could not read page cursor {cursor}")
+    if not isinstance(position, dict) or sorted(position) != sorted(keys):
+        raise BadRequestError(f"Could not read page cursor {cursor}")
+    return position
+
+
+def paginate(queryset: QuerySet, cursor: Optional[str] = None, limit: int = PAGE_SIZE, order_field: str = 'id',
+             descending: bool = False) -> Page:
+    """Keyset pagination over (`order_field`, id): each page seeks past the last key instead of skipping rows.
+
+    The opaque cursor encodes the key of the last returned document, so projections must keep `order_field`.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequestError(f"Could not get page of {limit} items. Page size must be between 1 and {MAX_PAGE_SIZE}")
+    direction, comparison = ('-', 'lt') if descending else ('+', 'gt')
+    keys = list(dict.fromkeys([order_field, 'id']))
+    if cursor:
+        position = decode_cursor(cursor, keys)
+        after_cursor = Q(**{f"id__{comparison}": position['id']})
+        if order_field != 'id':
+            after_cursor = Q(**{f"{order_field}__{comparison}": position[order_field]}) | \
+                (Q(**{order_field: position[order_field]}) & after_cursor)
+        queryset = queryset.filter(after_cursor)
+    items = list(queryset.order_by(*[f"{direction}{key}" for key in keys]).limit(limit + 1).as_pymongo())
+    if len(items) <= limit:
+        return Page(items, None)
+    last_item = items[limit - 1]
+    return Page(items[:limit], encode_cursor({key: last_item['_id' if key == 'id' else key] for key in keys}))
+
+
+def allocate_sequence_ids(document_class: Type[Document], count: int) -> List[int]:
+    """Reserve `count` consecutive SequenceField ids with a single counter update."""
+    if count == 0:
+        return []
+    field = document_class._fields['id']
+    collection = get_db(alias=field.db_alias)[field.collection_name]
+    counter = collection.find_one_and_update(filter={"_id": f"{field.get_sequence_name()}.{field.name}"},
+                                             update={"$inc": {"next": count}},
+                                             return_document=ReturnDocument.AFTER,
+                                             upsert=True)
+    return list(range(counter["next"] - count + 1, counter["next"] + 1))
+
+
 def password_match_patterns(password: str) -> Optional[Match[str]]:
     pattern = (
         r'^'
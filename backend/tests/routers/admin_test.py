@@ -123,6 +123,21 @@ def test_get_admins_success(client_setup):
     assert content[0]['_id'] == parent.id
 
 
+def test_get_admins_excludes_password(client_setup):
+    client, parent = client_setup
+    app.dependency_overrides[get_current_user] = lambda: parent
+    content = json.loads(client.get("/admin/").content.decode("utf-8"))
+    assert 'password' not in content[0]
+    assert content[0]['email'] == parent.email
+
+
+def test_get_admins_password_field(client_setup):
+    client, parent = client_setup
+    app.dependency_overrides[get_current_user] = lambda: parent
+    response = client.get("/admin/?fields=password")
+    assert response.status_code == 400
+
+
 def test_get_admins_not_found(client_setup):
     client, parent = client_setup
     parent.is_active = False
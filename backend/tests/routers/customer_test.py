@@ -1,7 +1,7 @@
 import json
 import os
 import shutil
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import pandas as pd
 import pytest
@@ -12,7 +12,7 @@ from main import app
 from models.customer import Customer
 from models.role import Role
 from services.user import get_current_user
-from tests.conftest import clean_up_test, connect_test, create_customer_user, create_admin_user
+from tests.conftest import another_customer, clean_up_test, connect_test, create_customer_user, create_admin_user
 
 
 def not_found_customer():
@@ -152,6 +152,53 @@ def test_get_customers_by_admin_success(client_setup):
     assert content[0]["_id"] == user.id
 
 
+def test_get_customers_by_admin_excludes_password(client_setup):
+    client, user = client_setup
+    admin = create_admin_user()
+    app.dependency_overrides[get_current_user] = lambda: admin
+    content = json.loads(client.get("/customer/").content.decode("utf-8"))
+    assert 'password' not in content[0]
+    assert content[0]["email"] == user.email
+
+
+def test_get_customers_by_admin_selected_fields(client_setup):
+    client, user = client_setup
+    admin = create_admin_user()
+    app.dependency_overrides[get_current_user] = lambda: admin
+    content = json.loads(client.get("/customer/?fields=name").content.decode("utf-8"))
+    assert {key for key in content[0] if key != '_cls'} == {'_id', 'name'}
+    assert content[0]["name"] == user.name
+
+
+def test_get_customers_by_admin_password_field(client_setup):
+    client, _ = client_setup
+    admin = create_admin_user()
+    app.dependency_overrides[get_current_user] = lambda: admin
+    response = client.get("/customer/?fields=name,password")
+    assert response.status_code == 400
+
+
+def test_get_customers_by_admin_pages(client_setup):
+    client, user = client_setup
+    second_customer = another_customer().save()
+    admin = create_admin_user()
+    app.dependency_overrides[get_current_user] = lambda: admin
+    first_response = client.get("/customer/?limit=1")
+    assert [customer["_id"] for customer in json.loads(first_response.content)] == [user.id]
+    cursor = first_response.headers["X-Next-Cursor"]
+    second_response = client.get(f"/customer/?limit=1&cursor={cursor}")
+    assert [customer["_id"] for customer in json.loads(second_response.content)] == [second_customer.id]
+    assert "X-Next-Cursor" not in second_response.headers
+
+
+def test_get_customers_by_admin_invalid_cursor(client_setup):
+    client, _ = client_setup
+    admin = create_admin_user()
+    app.dependency_overrides[get_current_user] = lambda: admin
+    response = client.get("/customer/?cursor=invalid")
+    assert response.status_code == 400
+
+
 def test_get_customers_by_admin_not_found(client_setup):
     client, _ = client_setup
     admin = create_admin_user()
@@ -195,9 +242,11 @@ async def test_upload_report_success(client_setup):
     app.dependency_overrides[get_current_user] = lambda: user
     data = pd.DataFrame({'A': [1, 2, 3, 4, 7, 7], 'B': [4, 5, 6, 7, 7, 7]})
     file = create_upload_file("valid.xlsx", data)
-    response = client.post(UPLOAD_ENDPOINT,
-                           files={"report": (file.filename, file.file, file.content_type)})
+    with patch('services.report_job.submit_report_job') as submit_report_job:
+        response = client.post(UPLOAD_ENDPOINT,
+                               files={"report": (file.filename, file.file, file.content_type)})
     assert response.status_code == 200
+    submit_report_job.assert_called_once_with(response.json())
     cleanup_files()
 
 
@@ -212,6 +261,18 @@ async def test_upload_report_customer_not_found(client_setup):
     assert response.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_upload_report_too_large(client_setup):
+    client, user = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 2, 3, 4, 7, 7]}))
+    with patch('main.MAX_UPLOAD_BYTES', 10):
+        response = client.post(UPLOAD_ENDPOINT,
+                               files={"report": (file.filename, file.file, file.content_type)})
+    assert response.status_code == 413
+    cleanup_files()
+
+
 @pytest.mark.asyncio
 async def test_upload_report_invalid_data(client_setup):
     client, user = client_setup
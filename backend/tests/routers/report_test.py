@@ -7,8 +7,10 @@ from main import app
 from models.customer import Customer
 from models.report import Report
 from models.report_column import ReportColumn
+from models.report_job import ReportJob
 from models.role import Role
 from services.user import get_current_user
+from services.utils import touch_reports
 from tests.conftest import clean_up_test, connect_test, create_customer_user
 
 
@@ -48,6 +50,32 @@ def test_get_reports_success(client_setup):
     assert report_response[0]['_id'] == report.id
 
 
+def test_get_reports_default_fields(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    report_response = json.loads(client.get("/report/").content.decode("utf-8"))
+    assert 'columns' not in report_response[0]
+    assert 'pearson_correlations' not in report_response[0]
+    assert report_response[0]['report_link'] == report.report_link
+
+
+def test_get_reports_selected_fields(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get("/report/?fields=columns,date_uploaded")
+    assert response.status_code == 200
+    report_response = json.loads(response.content.decode("utf-8"))
+    assert set(report_response[0]) == {'_id', 'columns', 'date_uploaded'}
+    assert report_response[0]['columns'] == [column.id for column in report.columns]
+
+
+def test_get_reports_unknown_field(client_setup):
+    client, user, _ = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get("/report/?fields=id,pearson_correlations")
+    assert response.status_code == 400
+
+
 def test_get_reports_user_not_found(client_setup):
     client, _, _ = client_setup
     app.dependency_overrides[get_current_user] = not_found_customer
@@ -55,6 +83,79 @@ def test_get_reports_user_not_found(client_setup):
     assert response.status_code == 404
 
 
+def test_get_report_aggregates_success(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get("/report/aggregates")
+    assert response.status_code == 200
+    aggregates = json.loads(response.content.decode("utf-8"))
+    assert aggregates["Column 1"]["count"] == 5
+    assert aggregates["Column 1"]["median"] == 2.0
+
+
+def test_get_report_aggregates_user_not_found(client_setup):
+    client, _, _ = client_setup
+    app.dependency_overrides[get_current_user] = not_found_customer
+    response = client.get("/report/aggregates")
+    assert response.status_code == 404
+
+
+def test_get_report_correlations_success(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id}/correlations")
+    assert response.status_code == 200
+    correlations = json.loads(response.content.decode("utf-8"))
+    assert correlations['columns'] == ["Column 1"]
+    assert correlations['pearson'] == [[1.0]]
+
+
+def test_get_report_correlations_not_found(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id + 1000}/correlations")
+    assert response.status_code == 404
+
+
+def test_get_report_column_outliers_success(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id}/columns/{report.columns[0].id}/outliers?method=zscore")
+    assert response.status_code == 200
+    outliers = json.loads(response.content.decode("utf-8"))
+    assert outliers['method'] == 'zscore'
+    assert outliers['rows'] == []
+
+
+def test_get_report_column_outliers_invalid_method(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id}/columns/{report.columns[0].id}/outliers?method=unknown")
+    assert response.status_code == 400
+
+
+def test_get_report_column_outliers_column_not_found(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id}/columns/{report.columns[0].id + 1000}/outliers")
+    assert response.status_code == 404
+
+
+def test_get_report_indicator_values_success(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id}/indicator_values")
+    assert response.status_code == 200
+    assert json.loads(response.content.decode("utf-8")) == {"Column 1": []}
+
+
+def test_get_report_indicator_values_not_found(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id + 1000}/indicator_values")
+    assert response.status_code == 404
+
+
 def test_get_report_success(client_setup):
     client, user, report = client_setup
     app.dependency_overrides[get_current_user] = lambda: user
@@ -64,6 +165,60 @@ def test_get_report_success(client_setup):
     assert report_response['_id'] == report.id
 
 
+def test_get_report_not_modified(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get(f"/report/{report.id}")
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    cached_response = client.get(f"/report/{report.id}", headers={"If-None-Match": etag})
+    assert cached_response.status_code == 304
+    assert cached_response.content == b""
+    assert cached_response.headers["ETag"] == etag
+    since_response = client.get(f"/report/{report.id}",
+                                headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert since_response.status_code == 304
+
+
+def test_get_report_modified_after_touch(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    etag = client.get(f"/report/{report.id}").headers["ETag"]
+    touch_reports(id=report.id)
+    response = client.get(f"/report/{report.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert json.loads(response.content.decode("utf-8"))['revision'] == 1
+
+
+def test_get_report_indicator_values_not_modified(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    etag = client.get(f"/report/{report.id}/indicator_values").headers["ETag"]
+    assert etag != client.get(f"/report/{report.id}").headers["ETag"]
+    response = client.get(f"/report/{report.id}/indicator_values", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert response.status_code == 304
+
+
+def test_get_report_file_not_modified(client_setup, tmp_path):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    file_path = tmp_path / "report.csv"
+    file_path.write_text("A\n1\n")
+    report.update(set__report_link=str(file_path), set__content_hash="abc")
+    response = client.get(f"/report/{report.id}/file")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"abc"'
+    assert client.get(f"/report/{report.id}/file", headers={"If-None-Match": '"abc"'}).status_code == 304
+
+
+def test_get_report_file_not_found(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    assert client.get(f"/report/{report.id + 1000}/file").status_code == 404
+    assert client.get(f"/report/{report.id}/file").status_code == 404
+
+
 def test_get_report_not_found(client_setup):
     client, user, report = client_setup
     app.dependency_overrides[get_current_user] = lambda: user
@@ -83,3 +238,20 @@ def test_delete_report_not_found(client_setup):
     app.dependency_overrides[get_current_user] = lambda: user
     response = client.delete(f"/report/{report.id + 1000}")
     assert response.status_code == 404
+
+
+def test_get_report_job_success(client_setup):
+    client, user, report = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    job = ReportJob(user=user, file_path="link", stage="done", progress=100, report=report.id,
+                    date_created=datetime.now()).save()
+    response = client.get(f"/report/jobs/{job.id}")
+    assert response.status_code == 200
+    assert response.json() == {'id': job.id, 'stage': 'done', 'progress': 100, 'report': report.id, 'error': None}
+
+
+def test_get_report_job_not_found(client_setup):
+    client, user, _ = client_setup
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.get("/report/jobs/1000")
+    assert response.status_code == 404
@@ -137,8 +137,8 @@ def test_get_admin_children_by_current_user_success(db_setup):
 
     with patch(GET_CURRENT_USER_PATH, return_value=parent_admin):
         result = get_admin_children_by_current_user(parent_admin)
-        assert len(result) == 1
-        assert result[0].id == test_admin.id
+        assert len(result.items) == 1
+        assert result.items[0]['_id'] == test_admin.id
 
 
 def test_get_admin_children_by_current_user_inactive(db_setup):
@@ -149,7 +149,7 @@ def test_get_admin_children_by_current_user_inactive(db_setup):
 
     with patch(GET_CURRENT_USER_PATH, return_value=parent_admin):
         result = get_admin_children_by_current_user(parent_admin)
-        assert len(result) == 0
+        assert len(result.items) == 0
 
 
 def test_get_admin_children_success(db_setup):
@@ -177,11 +177,23 @@ def test_get_admins_success(db_setup):
     another_admin_entity = another_admin().save()
 
     result = get_admins(parent_admin)
-    assert len(result) == 3
-    result_ids = list(map(lambda admin: admin.id, result))
+    assert len(result.items) == 3
+    result_ids = list(map(lambda admin: admin['_id'], result.items))
     assert [parent_admin.id, child_admin_entity.id, another_admin_entity.id] == result_ids
 
 
+def test_get_admins_pages(db_setup):
+    parent_admin = db_setup
+    child_admin_entity = another_admin(parent_admin).save()
+    another_admin_entity = another_admin().save()
+
+    first_page = get_admins(parent_admin, limit=2)
+    assert [admin['_id'] for admin in first_page.items] == [parent_admin.id, child_admin_entity.id]
+    second_page = get_admins(parent_admin, cursor=first_page.next_cursor, limit=2)
+    assert [admin['_id'] for admin in second_page.items] == [another_admin_entity.id]
+    assert second_page.next_cursor is None
+
+
 def test_get_admins_inactive(db_setup):
     parent_admin = db_setup
     test_admin = another_admin(parent_admin)
@@ -189,8 +201,8 @@ def test_get_admins_inactive(db_setup):
     test_admin.save()
 
     result = get_admins(parent_admin)
-    assert len(result) == 1
-    assert result[0].id == parent_admin.id
+    assert len(result.items) == 1
+    assert result.items[0]['_id'] == parent_admin.id
 
 
 def test_update_admin_success(db_setup):
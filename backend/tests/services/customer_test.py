@@ -139,8 +139,8 @@ def test_get_customers_success(db_setup):
     admin = another_admin().save()
 
     result = get_customers(admin)
-    assert len(result) == 2
-    result_ids = list(map(lambda customer_entity: customer_entity.id, result))
+    assert len(result.items) == 2
+    result_ids = list(map(lambda customer_entity: customer_entity['_id'], result.items))
     assert [customer.id, another_customer_entity.id] == result_ids
 
 
@@ -150,8 +150,8 @@ def test_get_customers_inactive(db_setup):
     admin = another_admin().save()
 
     result = get_customers(admin)
-    assert len(result) == 1
-    assert result[0].id == customer.id
+    assert len(result.items) == 1
+    assert result.items[0]['_id'] == customer.id
 
 
 def test_get_customers_by_customer(db_setup):
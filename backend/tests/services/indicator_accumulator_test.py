@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from errors.bad_request import BadRequestError
+from services.indicator_accumulator import IndicatorAccumulator, ModeAccumulator, MomentAccumulator, \
+    SampleAccumulator, accumulate_indicator_values, create_accumulator, is_streamed_indicator
+from services.indicator_value import calculation_methods, prepare_column_data
+
+INDICATOR_NAMES = ["Median", "Mean", "Mode", "Quartile q1", "Quartile q2", "Quartile q3", "Outliers number",
+                   "Variation range"]
+
+
+def make_column(size: int = 5_000) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    column_values = np.round(rng.normal(size=size), 1)
+    column_values[rng.random(size=size) < 0.1] = np.nan
+    return column_values
+
+
+def chunked(column_values: np.ndarray, chunk_rows: int):
+    for start in range(0, column_values.size, chunk_rows):
+        yield {"Column": column_values[start:start + chunk_rows]}
+
+
+def test_accumulate_indicator_values_exact():
+    column_values = make_column()
+    column_data = prepare_column_data(column_values)
+    results = accumulate_indicator_values(chunked(column_values, 333), INDICATOR_NAMES)["Column"]
+    for indicator_name in INDICATOR_NAMES:
+        assert results[indicator_name] == pytest.approx(calculation_methods[indicator_name.lower()](column_data))
+
+
+def test_accumulate_indicator_values_approximate():
+    column_values = make_column(50_000)
+    column_data = prepare_column_data(column_values)
+    results = accumulate_indicator_values(chunked(column_values, 4_096), INDICATOR_NAMES, approximate=True)["Column"]
+    assert results["Mean"] == pytest.approx(np.mean(column_data))
+    assert results["Variation range"] == column_data[-1] - column_data[0]
+    assert results["Mode"] == calculation_methods['mode'](column_data)
+    for indicator_name in ["Median", "Quartile q1", "Quartile q3"]:
+        assert results[indicator_name] == pytest.approx(calculation_methods[indicator_name.lower()](column_data),
+                                                        abs=0.05)
+    assert results["Outliers number"] == pytest.approx(calculation_methods['outliers number'](column_data),
+                                                       rel=0.1)
+
+
+def test_accumulate_indicator_values_all_null():
+    results = accumulate_indicator_values(chunked(np.full(10, np.nan), 3), INDICATOR_NAMES)["Column"]
+    assert all(value is None for value in results.values())
+
+
+def test_moment_accumulator_merge():
+    column_values = make_column()
+    left, right = MomentAccumulator(), MomentAccumulator()
+    left.update(column_values[:1_000])
+    right.update(column_values[1_000:])
+    merged = left.merge(right)
+    assert merged.result() == pytest.approx(np.nanmean(column_values))
+    assert merged.variance == pytest.approx(np.nanvar(column_values))
+
+
+def test_sample_accumulator_merge_is_bounded():
+    left = SampleAccumulator(calculation_methods['median'], sample_size=100, seed=1)
+    right = SampleAccumulator(calculation_methods['median'], sample_size=100, seed=2)
+    left.update(np.arange(1_000, dtype=np.float64))
+    right.update(np.arange(1_000, 2_000, dtype=np.float64))
+    merged = left.merge(right)
+    assert merged.count == 2_000
+    assert merged.values.size == 100
+    assert 500 < merged.result() < 1_500
+
+
+def test_mode_accumulator_bounded_keeps_heavy_hitter():
+    accumulator = ModeAccumulator(capacity=5)
+    for start in range(0, 1_000, 100):
+        accumulator.update(np.concatenate((np.arange(start, start + 100, dtype=np.float64), np.full(30, 7.5))))
+    assert len(accumulator.counts) <= 5
+    assert accumulator.result() == 7.5
+
+
+def test_create_accumulator_unregistered():
+    with pytest.raises(BadRequestError):
+        create_accumulator("Unknown indicator")
+
+
+
+def test_indicator_accumulator_is_abstract():
+    with pytest.raises(TypeError):
+        IndicatorAccumulator()
+
+
+def test_is_streamed_indicator():
+    assert [name for name in INDICATOR_NAMES if is_streamed_indicator(name)] == ["Mean", "Mode", "Variation range"]
+    assert [name for name in INDICATOR_NAMES if not is_streamed_indicator(name, approximate=True)] == []
+    assert not is_streamed_indicator("Sum", approximate=True)
@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mock import patch
+
+from models.indicator_backfill import IndicatorBackfill
+from models.report_column import ReportColumn
+from models.report_indicator import ReportIndicator
+from services.indicator_backfill import BACKFILL_STAGE_DONE, BACKFILL_STAGE_RUNNING, calculate_backfill_batch, \
+    run_indicator_backfill
+from services.indicator_value import create_indicator_values
+from tests.conftest import clean_up_test, connect_test
+
+DB_NAME = "test_db"
+
+
+@pytest.fixture(scope="function")
+def db_setup():
+    connect_test(DB_NAME)
+    columns = [ReportColumn(name=f"Column {index}", column_data=[2.0, 1.0, 3.0, None, float(index)]).save()
+               for index in range(5)]
+    ReportColumn(name="Inactive Column", column_data=[1.0, 2.0, 3.0], is_active=False).save()
+    median = ReportIndicator(name="Median").save()
+    create_indicator_values(columns[:2], [median])
+    ReportIndicator(name="Mean").save()
+    ReportIndicator(name="Variation range").save()
+    yield columns
+    clean_up_test(DB_NAME)
+
+
+def column_indicator_names(column_id: int):
+    return sorted(indicator_value.report_indicator.name for indicator_value in
+                  ReportColumn.objects(id=column_id).first().indicator_values)
+
+
+def test_run_indicator_backfill(db_setup):
+    columns = db_setup
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        backfill = run_indicator_backfill(executor, batch_size=2)
+    assert backfill.stage == BACKFILL_STAGE_DONE
+    assert backfill.columns_processed == 5
+    assert backfill.values_created == 2 * 2 + 3 * 3
+    assert backfill.last_column_id == columns[-1].id
+    for column in columns:
+        assert column_indicator_names(column.id) == ["Mean", "Median", "Variation range"]
+    assert {indicator_value.report_indicator.name: indicator_value.value for indicator_value in
+            ReportColumn.objects(id=columns[0].id).first().indicator_values}["Mean"] == pytest.approx(1.5)
+    assert ReportColumn.objects(name="Inactive Column").first().indicator_values == []
+
+
+def test_run_indicator_backfill_is_idempotent(db_setup):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        run_indicator_backfill(executor)
+        IndicatorBackfill.objects.update(set__indicator_ids=[])
+        assert run_indicator_backfill(executor).values_created == 0
+
+
+def test_run_indicator_backfill_skips_covered_indicators(db_setup):
+    columns = db_setup
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        backfill = run_indicator_backfill(executor)
+        with patch('services.indicator_backfill.iterate_column_batches') as iterate_column_batches:
+            assert run_indicator_backfill(executor).id == backfill.id
+        iterate_column_batches.assert_not_called()
+        ReportIndicator(name="Mode").save()
+        rerun = run_indicator_backfill(executor)
+    assert rerun.id != backfill.id
+    assert rerun.values_created == len(columns)
+    assert column_indicator_names(columns[0].id) == ["Mean", "Median", "Mode", "Variation range"]
+
+
+def test_run_indicator_backfill_resumes_after_interruption(db_setup):
+    columns = db_setup
+    calls = []
+
+    def fail_second_batch(missing_pairs):
+        calls.append(missing_pairs)
+        if len(calls) == 2:
+            raise RuntimeError("worker died")
+        return calculate_backfill_batch(missing_pairs)
+
+    with ThreadPoolExecutor(max_workers=1) as executor, \
+            patch('services.indicator_backfill.calculate_backfill_batch', side_effect=fail_second_batch), \
+            pytest.raises(RuntimeError):
+        run_indicator_backfill(executor, batch_size=2)
+    interrupted = IndicatorBackfill.objects(stage=BACKFILL_STAGE_RUNNING).first()
+    assert interrupted.last_column_id == columns[1].id
+    ReportIndicator(name="Mode").save()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        resumed = run_indicator_backfill(executor, batch_size=2)
+    assert resumed.id == interrupted.id
+    assert resumed.stage == BACKFILL_STAGE_DONE
+    assert resumed.columns_processed == 5
+    assert resumed.indicator_ids == interrupted.indicator_ids
+    for column in columns:
+        assert column_indicator_names(column.id) == ["Mean", "Median", "Variation range"]
+
+
+def test_run_indicator_backfill_limits_batches_in_flight_by_executor_size(db_setup):
+    checkpoints = []
+
+    class CheckpointExecutor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            checkpoints.append(IndicatorBackfill.objects(stage=BACKFILL_STAGE_RUNNING).first().columns_processed)
+            return super().submit(*args, **kwargs)
+
+    with CheckpointExecutor(max_workers=1) as executor, \
+            patch('services.indicator_backfill.INDICATOR_BACKFILL_WORKERS', 100):
+        run_indicator_backfill(executor, batch_size=1)
+    assert checkpoints[:3] == [0, 0, 0]
+    assert checkpoints[3] > 0
@@ -1,6 +1,9 @@
 from datetime import datetime
 from typing import List
+
+import numpy as np
 import pytest
+from mock import MagicMock, patch
 
 from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
@@ -15,7 +18,9 @@ from models.user import User
 
 from schemas.indicator_value import IndicatorValueCreate, IndicatorValuesGet, IndicatorValueGetByName, IndicatorValueGet
 from services.indicator_value import create_indicator_value, delete_indicator_value, get_indicator_values, \
-    get_indicator_value, get_indicator_value_by_name
+    get_indicator_value, get_indicator_value_by_name, create_indicator_values, sorted_quantile, \
+    calculate_indicator_table, calculation_methods, prepare_column_data, batched_calculation_methods, \
+    calculate_moments, fused_calculation_methods, group_batched_columns
 
 from services.indicator_value import get_indicator_values
 from services.utils import filter_column_data
@@ -81,6 +86,16 @@ def test_create_indicator_value_valid(db_setup):
     assert created_indicator_value is not None
 
 
+def test_create_and_delete_indicator_value_touch_report(db_setup):
+    indicator_value_create, _, report = db_setup
+    indicator_value_id = create_indicator_value(indicator_value_create)
+    assert Report.objects(id=report.id).first().revision == 1
+    delete_indicator_value(indicator_value_id)
+    touched_report = Report.objects(id=report.id).first()
+    assert touched_report.revision == 2
+    assert touched_report.date_modified is not None
+
+
 def test_create_indicator_value_nonexistent_column(db_setup):
     indicator_value_create, _, _ = db_setup
     indicator_value_create.column = indicator_value_create.column + 100
@@ -283,3 +298,136 @@ def test_get_indicator_values_non_exist_report(db_setup):
                                               column=indicator_value_create.column)
     with pytest.raises(NotFoundError):
         get_indicator_values(indicator_values_get)
+
+
+def test_sorted_quantile_matches_numpy():
+    rng = np.random.default_rng(1)
+    for size in [1, 2, 5, 8, 101]:
+        column_data = np.sort(rng.normal(size=size))
+        for quantile in [.25, .5, .75]:
+            assert sorted_quantile(column_data, quantile) == np.quantile(column_data, quantile)
+
+
+def test_create_indicator_values_bulk(db_setup):
+    _, _, report = db_setup
+    columns = list(ReportColumn.objects(id__in=[column.id for column in report.columns]))
+    create_indicator_values(columns, list(ReportIndicator.objects()))
+    assert IndicatorValue.objects().count() == len(columns) * len(REPORT_INDICATORS)
+    for column in columns:
+        stored_column = ReportColumn.objects(id=column.id).first()
+        assert [indicator_value.id for indicator_value in stored_column.indicator_values] == \
+               [indicator_value.id for indicator_value in column.indicator_values]
+        for indicator_value in stored_column.indicator_values:
+            single_value_id = create_indicator_value(
+                IndicatorValueCreate(column=column.id, report_indicator=indicator_value.report_indicator.id))
+            assert IndicatorValue.objects(id=single_value_id).first().value == indicator_value.value
+
+
+def test_create_indicator_values_unregistered_calculation_method(db_setup):
+    _, _, report = db_setup
+    ReportIndicator(name="unregistered").save()
+    with pytest.raises(BadRequestError):
+        create_indicator_values(list(report.columns), list(ReportIndicator.objects()))
+    assert IndicatorValue.objects().count() == 0
+
+
+def test_calculate_indicator_table_batched_matches_per_column():
+    rng = np.random.default_rng(2)
+    columns = []
+    for size in [1, 4, 57, 300]:
+        column_values = np.round(rng.normal(size=size), 1)
+        column_values[rng.random(size=size) < 0.2] = np.nan
+        columns.append(ReportColumn(name=f"Column {size}", column_data=column_values.tolist()))
+    columns.append(ReportColumn(name="Empty Column", column_data=[None, None]))
+    report_indicators = [ReportIndicator(name=name) for name in REPORT_INDICATORS]
+    indicator_table = calculate_indicator_table(columns, report_indicators)
+    for column, column_indicator_table in zip(columns, indicator_table):
+        column_data = prepare_column_data(column.get_column_values())
+        for report_indicator, value in zip(report_indicators, column_indicator_table):
+            if column_data is None:
+                assert value is None
+            else:
+                assert value == pytest.approx(calculation_methods[report_indicator.name.lower()](column_data))
+
+
+def test_calculate_indicator_table_prefers_batched():
+    columns = [ReportColumn(name="Column", column_data=[3.0, 1.0, 2.0])]
+    with patch.dict(batched_calculation_methods, {'median': lambda sorted_columns: sorted_columns[0]}):
+        assert calculate_indicator_table(columns, [ReportIndicator(name="Median"), ReportIndicator(name="Mode")]) == \
+               [[1.0, 1.0]]
+
+
+def test_calculate_indicator_table_streamed_values():
+    columns = [ReportColumn(name="Column", column_data=[3.0, 1.0, 2.0])]
+    report_indicators = [ReportIndicator(name="Median"), ReportIndicator(name="Mean")]
+    with patch.dict(batched_calculation_methods, {'mean': MagicMock(side_effect=AssertionError)}):
+        assert calculate_indicator_table(columns, report_indicators, [{"Mean": 5.0}]) == [[2.0, 5.0]]
+
+
+def test_group_batched_columns():
+    columns_values = [np.ones(3), np.ones(2), np.ones(300), np.array([]), np.ones(257), np.ones(10)]
+    columns = [ReportColumn(name=f"Column {index}") for index in range(len(columns_values))]
+    columns[5].spill_path = "columns/spilled.npy"
+    assert group_batched_columns(columns, columns_values) == [[0, 1], [2, 4]]
+    with patch('services.indicator_value.BATCHED_COLUMN_MAX_ROWS', 100):
+        assert group_batched_columns(columns, columns_values) == [[0, 1]]
+
+
+def test_calculate_indicator_table_unbatched_column_matches_batched():
+    columns = [ReportColumn(name="Short Column", column_data=[3.0, 1.0, 2.0]),
+               ReportColumn(name="Tall Column", column_data=[float(value) for value in range(200)])]
+    report_indicators = [ReportIndicator(name=name) for name in REPORT_INDICATORS]
+    indicator_table = calculate_indicator_table(columns, report_indicators)
+    with patch('services.indicator_value.BATCHED_COLUMN_MAX_ROWS', 100):
+        for column_indicator_table, expected in zip(calculate_indicator_table(columns, report_indicators),
+                                                    indicator_table):
+            assert column_indicator_table == pytest.approx(expected)
+
+
+MOMENT_INDICATORS = ["Sum", "Count", "Null count", "Variance", "Standard deviation", "Coefficient of variation",
+                     "Skewness", "Kurtosis"]
+
+
+def test_calculate_moments():
+    from scipy.stats import kurtosis, skew
+    column_values = np.array([2.0, 1.0, np.nan, 3.0, 6.0, np.nan, 1.0])
+    present_values = column_values[~np.isnan(column_values)]
+    moments = calculate_moments(column_values)
+    assert moments['sum'] == 13.0
+    assert moments['count'] == 5
+    assert moments['null count'] == 2
+    assert moments['variance'] == pytest.approx(np.var(present_values, ddof=1))
+    assert moments['standard deviation'] == pytest.approx(np.std(present_values, ddof=1))
+    assert moments['coefficient of variation'] == pytest.approx(np.std(present_values, ddof=1) / 2.6)
+    assert moments['skewness'] == pytest.approx(skew(present_values))
+    assert moments['kurtosis'] == pytest.approx(kurtosis(present_values))
+
+
+def test_calculate_moments_undefined():
+    assert calculate_moments(np.array([np.nan, np.nan])) == {
+        'sum': 0.0, 'count': 0.0, 'null count': 2.0, 'variance': None, 'standard deviation': None,
+        'coefficient of variation': None, 'skewness': None, 'kurtosis': None}
+    moments = calculate_moments(np.array([4.0, 4.0]))
+    assert moments['variance'] == 0.0
+    assert moments['skewness'] is None
+
+
+def test_calculate_indicator_table_runs_fused_calculation_once(db_setup):
+    _, _, report = db_setup
+    columns = list(report.columns)
+    report_indicators = [ReportIndicator(name=name) for name in MOMENT_INDICATORS + ["Median"]]
+    shared_method = MagicMock(wraps=calculate_moments)
+    with patch.dict(fused_calculation_methods, {name.lower(): shared_method for name in MOMENT_INDICATORS}):
+        indicator_table = calculate_indicator_table(columns, report_indicators)
+    assert shared_method.call_count == len(columns)
+    assert indicator_table[0][:3] == [13.0, 5.0, 2.0]
+    assert indicator_table[0][-1] == 2.0
+
+
+def test_create_indicator_value_null_count(db_setup):
+    _, _, report = db_setup
+    columns = list(report.columns)
+    report_indicator = ReportIndicator(name="Null count").save()
+    indicator_value_id = create_indicator_value(
+        IndicatorValueCreate(column=columns[0].id, report_indicator=report_indicator.id))
+    assert IndicatorValue.objects(id=indicator_value_id).first().value == 2.0
@@ -1,16 +1,23 @@
+import os
 from typing import List
 
+import numpy as np
 import pytest
+from mock import patch
 
+from models.outlier_mask import OutlierMask
 from models.report_column import ReportColumn
 from models.report_indicator import ReportIndicator
 from schemas.indicator_value import IndicatorValueCreate
 from schemas.report_column import ReportColumnCreate
-from services.indicator_value import create_indicator_value
+from services.indicator_value import calculate_outliers_number, create_indicator_value, prepare_column_data
 from services.report_column import create_report_column, get_report_column, get_report_column_by_name, \
-    get_report_columns, delete_report_column
+    get_report_columns, delete_report_column, create_report_columns, discard_report_columns, screen_column_normality, \
+    screen_report_columns, get_columns_quantile, merge_quantile_sketches, detect_column_outliers, \
+    get_column_outlier_rows, copy_report_columns
 from tests.conftest import clean_up_test, connect_test
 
+from errors.bad_request import BadRequestError
 from errors.not_found import NotFoundError
 
 from models.indicator_value import IndicatorValue
@@ -48,7 +55,40 @@ def db_setup():
 def test_create_report_column(db_setup):
     report_column_create = ReportColumnCreate(name="New Column", column_data=[5.0, 6.0], indicator_values=[])
     report_column_id = create_report_column(report_column_create)
-    assert ReportColumn.objects(id=report_column_id).first() is not None
+    report_column = ReportColumn.objects(id=report_column_id).first()
+    assert report_column is not None
+    assert report_column.column_data == []
+    np.testing.assert_array_equal(report_column.get_column_values(), [5.0, 6.0])
+
+
+@pytest.mark.parametrize("data_type", ["float64", "float32"])
+def test_packed_column_values(db_setup, data_type):
+    report_column = ReportColumn(name="Packed Column")
+    report_column.set_column_values(np.array([1.5, np.nan, -2.25, np.nan, 0.0, 3.0, 4.0, 5.0, np.nan]), data_type)
+    report_column.save()
+    column_values = ReportColumn.objects(id=report_column.id).first().get_column_values()
+    assert column_values.dtype == np.float64
+    np.testing.assert_array_equal(column_values, [1.5, np.nan, -2.25, np.nan, 0.0, 3.0, 4.0, 5.0, np.nan])
+
+
+@pytest.mark.parametrize("spilled", [False, True])
+def test_float32_column_summary_matches_stored_values(db_setup, tmp_path, spilled):
+    report_column = ReportColumn(name="Float32 Column")
+    column_values = np.array([0.1, np.nan, 1e-8, 123456.789, 2.2])
+    if spilled:
+        report_column.spill_column_values(column_values, str(tmp_path / "column.npy"), "float32")
+    else:
+        report_column.set_column_values(column_values, "float32")
+    stored_values = report_column.get_column_values()
+    present_values = stored_values[~np.isnan(stored_values)]
+    assert report_column.summary['sum'] == float(present_values.sum())
+    assert report_column.summary['max'] == float(present_values.max())
+    assert report_column.get_quantile_sketch().quantile(0) == pytest.approx(present_values.min(), rel=1e-12)
+
+
+def test_legacy_column_values(db_setup):
+    columns, _ = db_setup
+    np.testing.assert_array_equal(columns[0].get_column_values(), [2.0, 1.0, 3.0, 6.0, np.nan, np.nan, 1.0])
 
 
 def test_get_report_columns(db_setup):
@@ -139,3 +179,150 @@ def test_delete_report_column_not_found(db_setup):
     columns, _ = db_setup
     with pytest.raises(NotFoundError):
         delete_report_column(columns[0].id + 1000)
+
+
+def test_create_report_columns(db_setup):
+    columns, _ = db_setup
+    new_columns = create_report_columns([ReportColumn(name="Column 3", column_data=[1.0, None, 2.0]),
+                                         ReportColumn(name="Column 4", column_data=[4.0, 5.0, 6.0])])
+    assert [column.id for column in new_columns] == [columns[-1].id + 1, columns[-1].id + 2]
+    assert ReportColumn.objects(id=new_columns[0].id).first().column_data == [1.0, None, 2.0]
+    assert ReportColumn(name="Column 5", column_data=[1.0]).save().id == new_columns[-1].id + 1
+
+
+def test_discard_report_columns_removes_spilled_files(db_setup, tmp_path):
+    report_column = ReportColumn(name="Spilled Column")
+    report_column.spill_column_values(np.array([1.0, np.nan, 3.0]), str(tmp_path / "column.npy"), "float32")
+    spilled_column = create_report_columns([report_column])[0]
+    np.testing.assert_array_equal(ReportColumn.objects(id=spilled_column.id).first().get_column_values(),
+                                  [1.0, np.nan, 3.0])
+    discard_report_columns([spilled_column])
+    assert not os.path.exists(tmp_path / "column.npy")
+
+
+def test_copy_report_columns_copies_spilled_files(db_setup, tmp_path):
+    report_column = ReportColumn(name="Spilled Column")
+    report_column.spill_column_values(np.array([1.0, np.nan, 3.0]), str(tmp_path / "column.npy"), "float32")
+    spilled_column = create_report_columns([report_column])[0]
+    copied_column = copy_report_columns([spilled_column.id], str(tmp_path / "copies"))[0]
+    assert os.path.dirname(copied_column.spill_path) == str(tmp_path / "copies")
+    discard_report_columns([spilled_column])
+    np.testing.assert_array_equal(ReportColumn.objects(id=copied_column.id).first().get_column_values(),
+                                  [1.0, np.nan, 3.0])
+
+
+def test_copy_report_columns_with_inactive_values(db_setup, tmp_path):
+    columns, indicator_values = db_setup
+    IndicatorValue.objects(id=indicator_values[0]).update(set__is_active=False)
+    column_count = ReportColumn.objects().count()
+    assert copy_report_columns([column.id for column in columns], str(tmp_path)) is None
+    assert ReportColumn.objects().count() == column_count
+
+
+def test_discard_report_columns(db_setup):
+    columns, indicator_values = db_setup
+    discard_report_columns([ReportColumn.objects(id=columns[0].id).first()])
+    assert ReportColumn.objects(id=columns[0].id).first() is None
+    assert IndicatorValue.objects(id=indicator_values[0]).first() is None
+    assert ReportColumn.objects(id=columns[1].id).first() is not None
+
+
+def test_screen_report_columns(db_setup):
+    columns, _ = db_setup
+    screen_report_columns(columns)
+    stored_column = ReportColumn.objects(id=columns[0].id).first()
+    assert stored_column.normality_sample_size == 5
+    assert stored_column.normality_error_bound == 0.0
+    assert stored_column.normality_statistic == columns[0].normality_statistic
+    assert 0 <= stored_column.normality_p_value <= 1
+
+
+def test_screen_column_normality_subsample():
+    report_column = ReportColumn(name="Tall Column")
+    report_column.set_column_values(np.random.default_rng(1).normal(size=10_000))
+    with patch('services.report_column.NORMALITY_SAMPLE_SIZE', 1_000):
+        first_statistic = screen_column_normality(report_column).normality_statistic
+        assert screen_column_normality(report_column).normality_statistic == first_statistic
+    assert report_column.normality_sample_size == 1_000
+    assert report_column.normality_error_bound == pytest.approx(np.sqrt(np.log(40) / 2_000))
+    full_statistic = screen_column_normality(report_column).normality_statistic
+    assert abs(first_statistic - full_statistic) <= np.sqrt(np.log(40) / 2_000)
+
+
+def test_screen_column_normality_standardises_values():
+    rng = np.random.default_rng(2)
+    normal_column, skewed_column = ReportColumn(name="Normal Column"), ReportColumn(name="Skewed Column")
+    normal_column.set_column_values(rng.normal(loc=50, scale=10, size=2_000))
+    skewed_column.set_column_values(rng.exponential(scale=10, size=2_000))
+    assert screen_column_normality(normal_column).normality_p_value > 0.05
+    assert screen_column_normality(skewed_column).normality_p_value < 0.05
+
+
+@pytest.mark.parametrize("quantile", [0, .1, .25, .5, .75, .9, 1])
+def test_quantile_sketch_exact_for_small_columns(db_setup, quantile):
+    columns, _ = db_setup
+    for column in columns:
+        column = ReportColumn.objects(id=create_report_column(ReportColumnCreate(
+            name=column.name, column_data=column.column_data, indicator_values=[]))).first()
+        column_values = column.get_column_values()
+        assert column.get_quantile_sketch().quantile(quantile) == \
+               pytest.approx(np.quantile(column_values[~np.isnan(column_values)], quantile))
+    merged_values = np.concatenate([column.get_column_values() for column in columns])
+    assert get_columns_quantile(columns, quantile) == \
+           pytest.approx(np.quantile(merged_values[~np.isnan(merged_values)], quantile))
+
+
+def test_quantile_sketch_accuracy_for_tall_columns():
+    column_values = np.random.default_rng(0).normal(size=100_000)
+    report_columns = []
+    for part in np.split(column_values, 4):
+        report_column = ReportColumn(name="Tall Column")
+        report_column.set_column_values(part)
+        report_columns.append(report_column)
+    assert len(report_columns[0].quantile_sketch) < 4096
+    sorted_values = np.sort(column_values)
+    quantile_sketch = merge_quantile_sketches(report_columns)
+    assert quantile_sketch.count == column_values.size
+    for quantile in [.001, .01, .25, .5, .75, .99, .999]:
+        rank = np.searchsorted(sorted_values, quantile_sketch.quantile(quantile)) / sorted_values.size
+        assert abs(rank - quantile) < 0.005
+
+
+OUTLIER_COLUMN_DATA = [1.0, 2.0, None, 2.5, 3.0, 2.0, 1.5, 40.0, 2.2, None, 1.8, -30.0, 2.1, 1.9, 2.4, 2.0, 2.3, 1.7]
+
+
+def test_detect_column_outliers():
+    report_column = ReportColumn(name="Outliers", column_data=OUTLIER_COLUMN_DATA)
+    outlier_masks = detect_column_outliers(report_column)
+    assert set(outlier_masks) == {'iqr', 'zscore', 'mad'}
+    assert report_column.outlier_counts['iqr'] == calculate_outliers_number(
+        prepare_column_data(report_column.get_column_values()))
+    assert report_column.outlier_counts['mad'] == 2
+    assert outlier_masks['zscore'].size == len(OUTLIER_COLUMN_DATA)
+
+
+def test_get_column_outlier_rows(db_setup):
+    report_column = ReportColumn(name="Outliers", column_data=OUTLIER_COLUMN_DATA).save()
+    outliers = get_column_outlier_rows(report_column, "MAD")
+    assert outliers == {'column': report_column.id, 'method': 'mad', 'count': 2, 'rows': [7, 11]}
+    stored_column = ReportColumn._get_collection().find_one({'_id': report_column.id})
+    assert stored_column['outlier_counts'] == {'iqr': 4, 'zscore': 1, 'mad': 2}
+    assert 'outlier_masks' not in stored_column
+    assert len(OutlierMask.objects(column=report_column.id, method='zscore').first().mask) == 3
+    with patch.object(ReportColumn, 'get_column_values', side_effect=AssertionError):
+        assert get_column_outlier_rows(report_column, "mad") == outliers
+
+
+def test_copy_report_columns_copies_outlier_masks(db_setup):
+    report_column = ReportColumn(name="Outliers", column_data=OUTLIER_COLUMN_DATA).save()
+    outliers = get_column_outlier_rows(report_column, "iqr")
+    copied_column = copy_report_columns([report_column.id], "tests/spill")[0]
+    assert OutlierMask.objects(column=copied_column.id).count() == 3
+    with patch.object(ReportColumn, 'get_column_values', side_effect=AssertionError):
+        assert get_column_outlier_rows(copied_column, "iqr") == dict(outliers, column=copied_column.id)
+
+
+def test_get_column_outlier_rows_invalid_method(db_setup):
+    columns, _ = db_setup
+    with pytest.raises(BadRequestError):
+        get_column_outlier_rows(columns[0], "unknown")
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import shutil
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from errors.bad_request import BadRequestError
+from errors.payload_too_large import PayloadTooLargeError
+from fastapi import UploadFile
+from mock import patch
+from openpyxl import Workbook
+from services.report_file import check_column_name_list, coerce_column, coerce_rows, read_report_columns, \
+    read_report_header, read_xlsx_columns, save_upload_file
+
+FILE_PATH = "tests/report_file.xlsx"
+CSV_FILE_PATH = "tests/report_file.csv"
+PARQUET_FILE_PATH = "tests/report_file.parquet"
+UPLOAD_DESTINATION = "tests/uploads"
+
+
+@pytest.fixture(scope="function")
+def file_cleanup():
+    yield FILE_PATH
+    for file_path in [FILE_PATH, CSV_FILE_PATH, PARQUET_FILE_PATH]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def write_rows(rows):
+    workbook = Workbook()
+    worksheet = workbook.active
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(FILE_PATH)
+
+
+def test_coerce_rows():
+    columns = coerce_rows([(3, "4.25", None), (2.5,), ("", 1, "nan", "ignored")], 3)
+    assert all(column_values.dtype == np.float64 for column_values in columns)
+    np.testing.assert_array_equal(columns[0], [3.0, 2.5, np.nan])
+    np.testing.assert_array_equal(columns[1], [4.25, np.nan, 1.0])
+    np.testing.assert_array_equal(columns[2], [np.nan, np.nan, np.nan])
+
+
+@pytest.mark.parametrize("value", ["two", True, " "])
+def test_coerce_rows_non_numeric(value):
+    with pytest.raises(BadRequestError):
+        coerce_rows([(1,), (value,), (2,)], 1)
+
+
+def test_check_column_name_list_invalid():
+    with pytest.raises(BadRequestError):
+        check_column_name_list(["A", "A"])
+    with pytest.raises(BadRequestError):
+        check_column_name_list(["A", None])
+
+
+def test_coerce_column():
+    values, null_mask = coerce_column(pd.Series(['1', None, '', '2.5', np.nan, 'nan']))
+    assert values.dtype == np.float64
+    np.testing.assert_array_equal(values[~null_mask], [1.0, 2.5])
+    assert null_mask.tolist() == [False, True, True, False, True, True]
+
+
+@pytest.mark.parametrize("column", [pd.Series(['1', 'two', '3']), pd.Series([True, False, True])])
+def test_coerce_column_non_numeric(column):
+    with pytest.raises(BadRequestError):
+        coerce_column(column)
+
+
+def test_read_xlsx_columns(file_cleanup):
+    pd.DataFrame({'A': [1, None, 3.5, 4], 'B': [4, 5, None, None]}).to_excel(FILE_PATH, index=False)
+    columns = read_xlsx_columns(FILE_PATH)
+    assert list(columns.keys()) == ['A', 'B']
+    assert columns['A'].dtype == np.float64
+    np.testing.assert_array_equal(columns['A'], [1.0, np.nan, 3.5, 4.0])
+    np.testing.assert_array_equal(columns['B'], [4.0, 5.0, np.nan, np.nan])
+
+
+def test_read_xlsx_columns_short_rows_and_trailing_empty_rows(file_cleanup):
+    write_rows([["A", "B"], [1, 2], [3], [None, None], [5, "6"], [None, None]])
+    columns = read_xlsx_columns(FILE_PATH)
+    np.testing.assert_array_equal(columns['A'], [1.0, 3.0, np.nan, 5.0])
+    np.testing.assert_array_equal(columns['B'], [2.0, np.nan, np.nan, 6.0])
+
+
+def test_read_xlsx_columns_trailing_empty_chunks(file_cleanup):
+    write_rows([["A", "B"], [1, 2], [None, 3], [4, None], [None, None], [None, None], [None, None]])
+    with patch('services.report_file.REPORT_CHUNK_ROWS', 2):
+        columns = read_xlsx_columns(FILE_PATH)
+    np.testing.assert_array_equal(columns['A'], [1.0, np.nan, 4.0])
+    np.testing.assert_array_equal(columns['B'], [2.0, 3.0, np.nan])
+
+
+def test_read_xlsx_columns_non_numeric(file_cleanup):
+    write_rows([["A"], [1], ["two"], [3]])
+    with pytest.raises(BadRequestError):
+        read_xlsx_columns(FILE_PATH)
+
+
+def test_read_xlsx_columns_empty_header(file_cleanup):
+    write_rows([["A", None, "C"], [1, 2, 3]])
+    with pytest.raises(BadRequestError):
+        read_xlsx_columns(FILE_PATH)
+
+
+@pytest.mark.parametrize("file_path", [FILE_PATH, CSV_FILE_PATH, PARQUET_FILE_PATH])
+def test_read_report_columns_formats(file_cleanup, file_path):
+    df = pd.DataFrame({'A': [1, None, 3.5, 4], 'B': [4, 5, None, 0.25]})
+    if file_path.endswith(".csv"):
+        df.to_csv(file_path, index=False)
+    elif file_path.endswith(".parquet"):
+        df.to_parquet(file_path, index=False)
+    else:
+        df.to_excel(file_path, index=False)
+    assert read_report_header(file_path) == ['A', 'B']
+    columns = read_report_columns(file_path)
+    np.testing.assert_array_equal(columns['A'], [1.0, np.nan, 3.5, 4.0])
+    np.testing.assert_array_equal(columns['B'], [4.0, 5.0, np.nan, 0.25])
+
+
+@pytest.mark.parametrize("file_path", [FILE_PATH, CSV_FILE_PATH, PARQUET_FILE_PATH])
+def test_read_report_columns_feeds_chunks(file_cleanup, file_path):
+    df = pd.DataFrame({'A': np.arange(10, dtype=np.float64), 'B': [1.5, None] * 5})
+    if file_path.endswith(".csv"):
+        df.to_csv(file_path, index=False)
+    elif file_path.endswith(".parquet"):
+        df.to_parquet(file_path, index=False)
+    else:
+        df.to_excel(file_path, index=False)
+    chunks = []
+    with patch('services.report_file.REPORT_CHUNK_ROWS', 4):
+        columns = read_report_columns(file_path, chunks.append)
+    assert [chunk['A'].size for chunk in chunks] == [4, 4, 2]
+    np.testing.assert_array_equal(np.concatenate([chunk['A'] for chunk in chunks]), columns['A'])
+    np.testing.assert_array_equal(np.concatenate([chunk['B'] for chunk in chunks]), columns['B'])
+
+
+def test_read_csv_columns_non_numeric(file_cleanup):
+    with open(CSV_FILE_PATH, "w") as csv_file:
+        csv_file.write("A,B\n1,2\n3,two\n")
+    with pytest.raises(BadRequestError):
+        read_report_columns(CSV_FILE_PATH)
+
+
+@pytest.mark.parametrize("null_literal", ["NA", "N/A", "null", "None"])
+def test_read_csv_columns_rejects_null_literals(file_cleanup, null_literal):
+    with open(CSV_FILE_PATH, "w") as csv_file:
+        csv_file.write(f"A,B\n1,2\n3,{null_literal}\n")
+    with pytest.raises(BadRequestError):
+        read_report_columns(CSV_FILE_PATH)
+
+
+def test_read_csv_columns_empty_and_nan_cells(file_cleanup):
+    with open(CSV_FILE_PATH, "w") as csv_file:
+        csv_file.write("A,B\n1,\nnan,2\n")
+    columns = read_report_columns(CSV_FILE_PATH)
+    np.testing.assert_array_equal(columns['A'], [1.0, np.nan])
+    np.testing.assert_array_equal(columns['B'], [np.nan, 2.0])
+
+
+def test_read_csv_header_duplicate_names(file_cleanup):
+    with open(CSV_FILE_PATH, "w") as csv_file:
+        csv_file.write("A,A\n1,2\n")
+    with pytest.raises(BadRequestError):
+        read_report_header(CSV_FILE_PATH)
+
+
+def test_read_parquet_columns_non_numeric(file_cleanup):
+    pd.DataFrame({'A': ['1', 'two']}).to_parquet(PARQUET_FILE_PATH, index=False)
+    with pytest.raises(BadRequestError):
+        read_report_columns(PARQUET_FILE_PATH)
+
+
+@pytest.mark.parametrize("column", [
+    pd.to_datetime(['2024-01-01', '2024-01-02']),
+    pd.to_datetime(['2024-01-01', '2024-01-02']).tz_localize('UTC'),
+    pd.to_timedelta(['1 day', '2 days']),
+])
+def test_read_parquet_columns_temporal(file_cleanup, column):
+    pd.DataFrame({'A': [1.0, 2.0], 'B': column}).to_parquet(PARQUET_FILE_PATH, index=False)
+    with pytest.raises(BadRequestError):
+        read_report_columns(PARQUET_FILE_PATH)
+
+
+def test_coerce_column_period():
+    with pytest.raises(BadRequestError):
+        coerce_column(pd.Series(pd.period_range('2024-01', periods=3, freq='M')))
+
+
+@pytest.fixture(scope="function")
+def upload_destination():
+    os.makedirs(UPLOAD_DESTINATION, exist_ok=True)
+    yield UPLOAD_DESTINATION
+    shutil.rmtree(UPLOAD_DESTINATION, ignore_errors=True)
+
+
+@pytest.mark.asyncio
+async def test_save_upload_file(upload_destination):
+    content = b"report content" * 1000
+    file_path, content_hash = await save_upload_file(UploadFile(filename="report.xlsx", file=BytesIO(content)),
+                                                     upload_destination)
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert file_path == os.path.join(upload_destination, content_hash, "report.xlsx")
+    with open(file_path, "rb") as saved_file:
+        assert saved_file.read() == content
+    assert os.listdir(upload_destination) == [content_hash]
+
+
+@pytest.mark.asyncio
+async def test_save_upload_file_same_name_does_not_overwrite(upload_destination):
+    first_path, _ = await save_upload_file(UploadFile(filename="report.xlsx", file=BytesIO(b"first")),
+                                           upload_destination)
+    second_path, _ = await save_upload_file(UploadFile(filename="report.xlsx", file=BytesIO(b"second")),
+                                            upload_destination)
+    assert first_path != second_path
+    with open(first_path, "rb") as first_file:
+        assert first_file.read() == b"first"
+
+
+@pytest.mark.asyncio
+async def test_save_upload_file_too_large(upload_destination):
+    with patch('services.report_file.MAX_UPLOAD_BYTES', 10), pytest.raises(PayloadTooLargeError):
+        await save_upload_file(UploadFile(filename="report.xlsx", file=BytesIO(b"x" * 11)), upload_destination)
+    assert os.listdir(upload_destination) == []
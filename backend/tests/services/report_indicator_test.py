@@ -7,6 +7,11 @@ from services.report_indicator import (get_report_indicator, get_report_indicato
                                        update_report_indicator)
 from tests.conftest import clean_up_test, connect_test, create_admin_user
 
+from datetime import datetime
+
+from models.indicator_value import IndicatorValue
+from models.report import Report
+from models.report_column import ReportColumn
 from models.report_indicator import ReportIndicator
 
 INDICATOR_1_NAME = "Indicator_1"
@@ -77,6 +82,19 @@ def test_update_report_indicator(db_setup):
     assert updated_indicator.name == new_name
 
 
+@pytest.mark.parametrize("new_name, touched", [(INDICATOR_1_NAME, False), ("New Report Indicator", True)])
+def test_update_report_indicator_touches_reports_with_its_values(db_setup, new_name, touched):
+    report_indicator_1, report_indicator_2, admin_user = db_setup
+    columns = [ReportColumn(name=f"Column {index}", column_data=[1.0, 2.0], indicator_values=[
+        IndicatorValue(report_indicator=report_indicator, value=1.5).save()]).save()
+               for index, report_indicator in enumerate([report_indicator_1, report_indicator_2])]
+    reports = [Report(user=admin_user, report_link="link", date_uploaded=datetime.now(), columns=[column],
+                      fits_discriminant_analysis=False, fits_correlation_analysis=False).save() for column in columns]
+    update_report_indicator(user_id=admin_user.id, report_indicator_id=report_indicator_1.id,
+                            report_indicator_body=ReportIndicatorUpdate(name=new_name))
+    assert [report.reload().revision for report in reports] == [int(touched), 0]
+
+
 def test_update_report_indicator_non_existent_id(db_setup):
     non_existent_id = 999
     update_data = ReportIndicatorUpdate(name="New Report Indicator")
@@ -0,0 +1,134 @@
+import os
+import shutil
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+from errors.bad_request import BadRequestError
+from errors.not_found import NotFoundError
+from fastapi import UploadFile
+from mock import MagicMock, patch
+from models.report import Report
+from models.report_job import ReportJob
+from services import report_job
+from services.report_job import JOB_STAGE_DONE, JOB_STAGE_FAILED, JOB_STAGE_QUEUED, create_report_job, \
+    get_report_job, handle_report_job_crash, run_report_job, submit_report_job
+
+from tests.conftest import another_customer, clean_up_test, connect_test, create_customer_user
+
+DB_NAME = "test_db"
+SUBMIT_REPORT_JOB_PATH = 'services.report_job.submit_report_job'
+
+
+def create_upload_file(filename: str, data: pd.DataFrame) -> UploadFile:
+    file_path = f'tests/{filename}'
+    data.to_excel(file_path, index=False)
+    return UploadFile(filename=filename, file=open(file_path, 'rb'))
+
+
+@pytest.fixture(scope="function")
+def db_setup():
+    connect_test(DB_NAME)
+    user = create_customer_user()
+    yield user
+    clean_up_test(DB_NAME)
+    shutil.rmtree('user_data', ignore_errors=True)
+    for file in os.listdir('tests'):
+        if file.endswith(".xlsx"):
+            os.remove(os.path.join('tests', file))
+
+
+@pytest.mark.asyncio
+async def test_create_report_job(db_setup):
+    user = db_setup
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 2, 3, 4], 'B': [4, 5, 6, 8]}))
+    with patch(SUBMIT_REPORT_JOB_PATH) as submit_report_job:
+        job_id = await create_report_job(file, user)
+    submit_report_job.assert_called_once_with(job_id)
+    job = ReportJob.objects(id=job_id).first()
+    assert job.stage == JOB_STAGE_QUEUED
+    assert os.path.exists(job.file_path)
+
+
+@pytest.mark.asyncio
+async def test_create_report_job_invalid_header(db_setup):
+    user = db_setup
+    file = create_upload_file("invalid.xlsx", pd.DataFrame({' ': [1, 2, 3, 4], 'B': [4, 5, 6, 8]}))
+    with patch(SUBMIT_REPORT_JOB_PATH) as submit_report_job, pytest.raises(BadRequestError):
+        await create_report_job(file, user)
+    submit_report_job.assert_not_called()
+    assert ReportJob.objects().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_create_report_job_customer_not_found(db_setup):
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 2, 3, 4]}))
+    with pytest.raises(NotFoundError):
+        await create_report_job(file, None)
+
+
+@pytest.mark.asyncio
+async def test_run_report_job(db_setup):
+    user = db_setup
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 2, 3, 4], 'B': [4, 5, 6, 8]}))
+    with patch(SUBMIT_REPORT_JOB_PATH):
+        job_id = await create_report_job(file, user)
+    run_report_job(job_id)
+    job = ReportJob.objects(id=job_id).first()
+    assert job.stage == JOB_STAGE_DONE
+    assert job.progress == 100
+    assert Report.objects(id=job.report, user=user).first() is not None
+
+
+@pytest.mark.asyncio
+async def test_run_report_job_invalid_data(db_setup):
+    user = db_setup
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 'two', 3, 4]}))
+    with patch(SUBMIT_REPORT_JOB_PATH):
+        job_id = await create_report_job(file, user)
+    run_report_job(job_id)
+    job = ReportJob.objects(id=job_id).first()
+    assert job.stage == JOB_STAGE_FAILED
+    assert job.report is None
+    assert "non numeric" in job.error
+    assert Report.objects().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_get_report_job_other_customer(db_setup):
+    user = db_setup
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 2, 3, 4]}))
+    with patch(SUBMIT_REPORT_JOB_PATH):
+        job_id = await create_report_job(file, user)
+    assert get_report_job(job_id, user).id == job_id
+    other_customer = another_customer().save()
+    with pytest.raises(NotFoundError):
+        get_report_job(job_id, other_customer)
+
+
+@pytest.mark.asyncio
+async def test_handle_report_job_crash_fails_job_and_resets_pool(db_setup):
+    user = db_setup
+    file = create_upload_file("valid.xlsx", pd.DataFrame({'A': [1, 2, 3, 4]}))
+    with patch(SUBMIT_REPORT_JOB_PATH):
+        job_id = await create_report_job(file, user)
+    broken_executor = MagicMock()
+    future = Future()
+    future.set_exception(BrokenProcessPool("A worker process terminated abruptly"))
+    with patch.object(report_job, 'report_executor', broken_executor):
+        handle_report_job_crash(job_id, broken_executor, future)
+        assert report_job.report_executor is None
+    broken_executor.shutdown.assert_called_once_with(wait=False)
+    job = ReportJob.objects(id=job_id).first()
+    assert job.stage == JOB_STAGE_FAILED
+    assert job.progress == 100
+
+
+def test_submit_report_job_replaces_broken_pool():
+    broken_executor, fresh_executor = MagicMock(), MagicMock()
+    broken_executor.submit.side_effect = BrokenProcessPool("A worker process terminated abruptly")
+    with patch('services.report_job.report_executor', broken_executor), \
+            patch('services.report_job.ProcessPoolExecutor', return_value=fresh_executor):
+        submit_report_job(1)
+    fresh_executor.submit.assert_called_once_with(run_report_job, 1)
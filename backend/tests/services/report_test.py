@@ -1,6 +1,6 @@
 import os
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
 from typing import List
 
@@ -12,12 +12,18 @@ from errors.not_found import NotFoundError
 from fastapi import UploadFile
 from mock import patch
 from models.report_column import ReportColumn
+from models.report_indicator import ReportIndicator
 from services.report import calculate_strengthened_weakened_relationships, check_fits_correlation_analysis, \
     columns_to_df, check_column_names, check_report_extension, upload_report, validate_column_content, \
     validate_report_file, check_fits_discriminant_analysis, create_report, get_current_customer_reports, \
-    get_customer_reports, get_current_customer_report, get_customer_report, delete_report
+    get_customer_reports, get_current_customer_report, get_customer_report, delete_report, \
+    get_current_customer_aggregates, get_report_correlations, get_report_indicator_values, prefetch_report_trees, \
+    reports_to_dict, get_report_validators, REPORT_RESOURCE, ReportValidators, get_report_column_outliers
 
-from tests.conftest import clean_up_test, connect_test, create_customer_user
+from schemas.indicator_value import IndicatorValuesGet
+from services.indicator_accumulator import MomentAccumulator
+from services.indicator_value import get_indicator_values
+from tests.conftest import another_customer, clean_up_test, connect_test, create_customer_user
 
 from models.customer import Customer
 from models.report import Report
@@ -134,7 +140,7 @@ async def test_upload_report_valid_file(db_setup):
     user = db_setup
     data = pd.DataFrame({'A': [1, 2, 3, 4, 7, 7], 'B': [4, 5, 6, 7, 7, 7]})
     file = create_upload_file(VALID_NAME, data)
-    file_path = await upload_report(user, file)
+    file_path, _ = await upload_report(user, file)
     try:
         validate_report_file(file_path)
         assert os.path.exists(file_path)
@@ -148,7 +154,7 @@ async def test_upload_report_with_empty_column(db_setup):
     data = pd.DataFrame(
         {'A': [1, 2, 3, 4, 5, 5], 'B': [4, 5, 6, 7, 7, 7], 'C': [np.nan, np.nan, np.nan, 3, 4, 5]})
     file = create_upload_file(VALID_NAME, data)
-    file_path = await upload_report(user, file)
+    file_path, _ = await upload_report(user, file)
     try:
         validate_report_file(file_path)
         assert os.path.exists(file_path)
@@ -156,12 +162,29 @@ async def test_upload_report_with_empty_column(db_setup):
         file.file.close()
 
 
+@pytest.mark.asyncio
+async def test_validate_report_file_spills_large_columns(db_setup):
+    user = db_setup
+    data = pd.DataFrame({'A': [1, 2, 3, 4, 7, np.nan], 'B': [4, 5, 6, 7, 7, 7]})
+    file = create_upload_file(VALID_NAME, data)
+    file_path, _ = await upload_report(user, file)
+    with patch('services.report.COLUMN_SPILL_THRESHOLD', 40):
+        saved_columns = validate_report_file(file_path)
+    file.file.close()
+    spilled_column = ReportColumn.objects(id=saved_columns[0].id).first()
+    assert spilled_column.packed_data is None
+    assert os.path.dirname(spilled_column.spill_path) == os.path.join(os.path.dirname(file_path), "columns")
+    assert isinstance(spilled_column.get_column_values(), np.memmap)
+    np.testing.assert_array_equal(spilled_column.get_column_values(), [1, 2, 3, 4, 7, np.nan])
+    assert spilled_column.summary == {'count': 6, 'null_count': 1, 'sum': 17.0, 'min': 1.0, 'max': 7.0}
+
+
 @pytest.mark.asyncio
 async def test_upload_report_invalid_names(db_setup):
     user = db_setup
     data = pd.DataFrame({' ': [1, 2, 3, 4], 'B': [4, 5, 6, 7]})
     file = create_upload_file(INVALID_NAME, data)
-    file_path = await upload_report(user, file)
+    file_path, _ = await upload_report(user, file)
     with pytest.raises(BadRequestError):
         validate_report_file(file_path)
         assert os.path.exists(file_path) is False
@@ -198,6 +221,23 @@ def test_calculate_strengthened_weakened_relationships(db_setup):
     assert weakened == 5
 
 
+def test_calculate_strengthened_weakened_relationships_matches_pairwise_loop(db_setup):
+    rng = np.random.default_rng(0)
+    data = np.round(rng.normal(size=(40, 8)), 1)
+    data[rng.random(size=data.shape) < 0.2] = np.nan
+    data[:, 0] = 1.0
+    df = pd.DataFrame(data, columns=[f"Column{index}" for index in range(8)])
+    strengthened, weakened = 0, 0
+    for i in range(len(df.columns)):
+        for j in range(i + 1, len(df.columns)):
+            pair = df[[df.columns[i], df.columns[j]]]
+            if np.abs(pair.corr().iloc[0, 1]) > np.abs(pair.corr(method='spearman').iloc[0, 1]):
+                strengthened += 1
+            else:
+                weakened += 1
+    assert calculate_strengthened_weakened_relationships(df) == (strengthened, weakened)
+
+
 def test_check_fits_correlation_analysis_false(db_setup):
     report_columns = mock_report_columns()
     result = check_fits_correlation_analysis(report_columns)
@@ -213,7 +253,9 @@ def test_check_fits_correlation_analysis_true(db_setup):
 
 
 def test_check_fits_discriminant_analysis_false(db_setup):
-    report_columns = mock_report_columns()[:-2]
+    skewed_column = ReportColumn(is_active=True, name='Skewed Column')
+    skewed_column.set_column_values(np.random.default_rng(0).exponential(size=200))
+    report_columns = mock_report_columns()[:-2] + [skewed_column]
     assert check_fits_discriminant_analysis(report_columns) is False
 
 
@@ -222,6 +264,19 @@ def test_check_fits_discriminant_analysis_true(db_setup):
     assert check_fits_discriminant_analysis(report_columns) is True
 
 
+def test_check_fits_discriminant_analysis_ignores_nulls(db_setup):
+    report_column = ReportColumn(is_active=True, name='Column', column_data=[0.1, None, -0.4, 0.3, None, 1.2])
+    assert check_fits_discriminant_analysis([report_column]) is True
+    assert report_column.normality_sample_size == 4
+
+
+def test_check_fits_discriminant_analysis_uses_stored_results(db_setup):
+    report_columns = mock_report_columns()[-2:]
+    report_columns[0].normality_p_value = 0.01
+    with patch.object(ReportColumn, 'get_column_values', side_effect=AssertionError):
+        assert check_fits_discriminant_analysis(report_columns[:1]) is False
+
+
 @pytest.mark.asyncio
 async def test_create_report_success(db_setup):
     user = db_setup
@@ -231,6 +286,29 @@ async def test_create_report_success(db_setup):
     report_id = await create_report(file, user)
     assert isinstance(report_id, int)
     assert report_id is not None
+    date_uploaded = Report.objects(id=report_id).first().date_uploaded
+    assert abs(date_uploaded - datetime.now(timezone.utc).replace(tzinfo=None)) < timedelta(minutes=1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("upload_indicator_mode", ["exact", "approximate"])
+async def test_create_report_streams_indicators(db_setup, upload_indicator_mode):
+    user = db_setup
+    indicator_names = ["Median", "Mean", "Mode", "Variation range"]
+    for indicator_name in indicator_names:
+        ReportIndicator(name=indicator_name).save()
+    file = create_upload_file(VALID_NAME, columns_to_df(mock_report_columns()))
+    with patch('services.report.UPLOAD_INDICATOR_MODE', upload_indicator_mode), \
+            patch('services.indicator_accumulator.MomentAccumulator.update', autospec=True,
+                  side_effect=MomentAccumulator.update) as update_mock:
+        report_id = await create_report(file, user)
+    assert update_mock.called
+    for column in Report.objects(id=report_id).first().columns:
+        column_data = np.sort(column.get_column_values()[~np.isnan(column.get_column_values())])
+        values = {value.report_indicator.name: value.value for value in column.indicator_values}
+        assert values["Mean"] == pytest.approx(np.mean(column_data))
+        assert values["Variation range"] == pytest.approx(column_data[-1] - column_data[0])
+        assert values["Median"] == pytest.approx(np.median(column_data))
 
 
 @pytest.mark.asyncio
@@ -242,13 +320,70 @@ async def test_create_report_failure(db_setup):
         await create_report(file, None)
 
 
+@pytest.mark.asyncio
+async def test_create_report_reuses_identical_upload(db_setup):
+    user = db_setup
+    ReportIndicator(name="Median").save()
+    create_upload_file(VALID_NAME, columns_to_df(mock_report_columns())).file.close()
+    first_report = Report.objects(id=await create_report(
+        UploadFile(filename=VALID_NAME, file=open(f'tests/{VALID_NAME}', 'rb')), user)).first()
+    with patch('services.report.validate_report_file') as validate_report_file_mock:
+        second_report_id = await create_report(
+            UploadFile(filename=VALID_NAME, file=open(f'tests/{VALID_NAME}', 'rb')), user)
+    validate_report_file_mock.assert_not_called()
+    second_report = Report.objects(id=second_report_id).first()
+    assert second_report.id != first_report.id
+    assert second_report.content_hash == first_report.content_hash
+    assert second_report.fits_correlation_analysis == first_report.fits_correlation_analysis
+    for first_column, second_column in zip(first_report.columns, second_report.columns):
+        assert first_column.id != second_column.id
+        assert first_column.name == second_column.name
+        np.testing.assert_array_equal(first_column.get_column_values(), second_column.get_column_values())
+        assert len(second_column.indicator_values) == 1
+        assert first_column.indicator_values[0].id != second_column.indicator_values[0].id
+        assert first_column.indicator_values[0].value == second_column.indicator_values[0].value
+    delete_report(first_report.id, user)
+    assert all(column.is_active for column in Report.objects(id=second_report_id).first().columns)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("delete_first", [True, False])
+async def test_create_report_does_not_reuse_deleted_or_foreign_report(db_setup, delete_first):
+    user = db_setup
+    ReportIndicator(name="Median").save()
+    create_upload_file(VALID_NAME, columns_to_df(mock_report_columns())).file.close()
+    first_report_id = await create_report(UploadFile(filename=VALID_NAME, file=open(f'tests/{VALID_NAME}', 'rb')),
+                                          user)
+    if delete_first:
+        delete_report(first_report_id, user)
+    else:
+        user = another_customer().save()
+    with patch('services.report.validate_report_file', wraps=validate_report_file) as validate_report_file_mock:
+        second_report_id = await create_report(
+            UploadFile(filename=VALID_NAME, file=open(f'tests/{VALID_NAME}', 'rb')), user)
+    validate_report_file_mock.assert_called_once()
+    assert all(len(column.indicator_values) == 1 for column in Report.objects(id=second_report_id).first().columns)
+
+
+@pytest.mark.asyncio
+async def test_create_report_failure_discards_columns(db_setup):
+    user = db_setup
+    file = create_upload_file(VALID_NAME, columns_to_df(mock_report_columns()))
+    with patch('services.report.calculate_report_correlations', side_effect=RuntimeError), \
+            pytest.raises(RuntimeError):
+        await create_report(file, user)
+    assert ReportColumn.objects().count() == 0
+    assert Report.objects().count() == 0
+
+
 def test_get_current_customer_reports(db_setup):
     customer = db_setup
     report = create_test_report(customer, True)
     with patch(GET_CURRENT_USER_PATH, return_value=customer):
         result = get_current_customer_reports(customer)
-        assert len(result) == 1
-        assert result[0].id == report.id
+        assert len(result.items) == 1
+        assert result.items[0]['_id'] == report.id
+        assert result.next_cursor is None
 
 
 def test_get_current_customer_reports_inactive(db_setup):
@@ -256,7 +391,29 @@ def test_get_current_customer_reports_inactive(db_setup):
     create_test_report(customer, False)
     with patch(GET_CURRENT_USER_PATH, return_value=customer):
         result = get_current_customer_reports(customer)
-        assert len(result) == 0
+        assert len(result.items) == 0
+
+
+def test_get_current_customer_reports_pages(db_setup):
+    customer = db_setup
+    reports = [create_test_report(customer) for _ in range(3)] + [create_test_report(customer)]
+    reports[-1].date_uploaded = datetime(2025, 1, 1)
+    reports[-1].save()
+    expected_ids = [reports[-1].id] + [report.id for report in reversed(reports[:-1])]
+    page_ids, cursor = [], None
+    while True:
+        page = get_current_customer_reports(customer, cursor=cursor, limit=2)
+        page_ids.extend(item['_id'] for item in page.items)
+        if not (cursor := page.next_cursor):
+            break
+    assert page_ids == expected_ids
+
+
+@pytest.mark.parametrize("cursor, limit", [("not a cursor", 10), (None, 0)])
+def test_get_current_customer_reports_invalid_page(db_setup, cursor, limit):
+    customer = db_setup
+    with pytest.raises(BadRequestError):
+        get_current_customer_reports(customer, cursor=cursor, limit=limit)
 
 
 def test_get_current_customer_reports_customer_not_found(db_setup):
@@ -387,3 +544,170 @@ def test_delete_report_customer_not_found(db_setup):
     report = create_test_report(customer)
     with pytest.raises(NotFoundError):
         delete_report(report.id, None)
+
+
+def create_aggregate_report(user: Customer, columns: List[ReportColumn], is_active: bool = True) -> Report:
+    return Report(user=user, report_link="link", date_uploaded=datetime.now(), columns=columns,
+                  fits_discriminant_analysis=False, fits_correlation_analysis=False, is_active=is_active).save()
+
+
+def create_packed_column(name: str, column_values: List[float]) -> ReportColumn:
+    report_column = ReportColumn(name=name)
+    report_column.set_column_values(np.array(column_values, dtype=np.float64))
+    return report_column.save()
+
+
+def test_get_current_customer_aggregates(db_setup):
+    user = db_setup
+    create_aggregate_report(user, [create_packed_column("Revenue", [1, 2, np.nan, 4]),
+                                   create_packed_column("Cost", [5, 5, 6])])
+    create_aggregate_report(user, [create_packed_column("Revenue", [10, 3]),
+                                   ReportColumn(name="Cost", column_data=[7.0, None]).save()])
+    create_aggregate_report(user, [create_packed_column("Revenue", [1000, 2000])], is_active=False)
+    aggregates = get_current_customer_aggregates(user)
+    revenue = np.array([1, 2, 4, 10, 3], dtype=np.float64)
+    assert aggregates["Revenue"]["columns"] == 2
+    assert aggregates["Revenue"]["count"] == 5
+    assert aggregates["Revenue"]["null_count"] == 1
+    assert aggregates["Revenue"]["mean"] == pytest.approx(revenue.mean())
+    assert aggregates["Revenue"]["variation range"] == 9
+    for indicator_name, quantile in [("median", .5), ("quartile q1", .25), ("quartile q3", .75)]:
+        assert aggregates["Revenue"][indicator_name] == pytest.approx(np.quantile(revenue, quantile))
+    assert aggregates["Cost"]["count"] == 4
+    assert aggregates["Cost"]["median"] == pytest.approx(5.5)
+
+
+def test_get_current_customer_aggregates_does_not_read_column_data(db_setup):
+    user = db_setup
+    create_aggregate_report(user, [create_packed_column("Revenue", [1, 2, 3])])
+    with patch.object(ReportColumn, 'get_column_values', side_effect=AssertionError):
+        assert get_current_customer_aggregates(user)["Revenue"]["median"] == 2
+
+
+def test_get_current_customer_aggregates_customer_not_found(db_setup):
+    with pytest.raises(NotFoundError):
+        get_current_customer_aggregates(None)
+
+
+@pytest.mark.asyncio
+async def test_create_report_stores_correlations(db_setup):
+    user = db_setup
+    report_columns = mock_report_columns()
+    df = columns_to_df(report_columns)
+    report_id = await create_report(create_upload_file(VALID_NAME, df), user)
+    with patch('services.report.calculate_report_correlations', side_effect=AssertionError):
+        correlations = get_report_correlations(report_id, user)
+    assert correlations['columns'] == list(df.columns)
+    np.testing.assert_allclose(np.array(correlations['pearson'], dtype=np.float64), df.corr().to_numpy(), atol=1e-6)
+    np.testing.assert_allclose(np.array(correlations['spearman'], dtype=np.float64),
+                               df.corr(method='spearman').to_numpy(), atol=1e-6)
+    assert 'pearson_correlations' not in get_current_customer_report(report_id, user).to_json()
+
+
+def test_get_report_correlations_legacy_report(db_setup):
+    user = db_setup
+    report = create_test_report(user, True)
+    correlations = get_report_correlations(report.id, user)
+    assert len(correlations['pearson']) == len(correlations['columns'])
+    assert Report.objects(id=report.id).first().pearson_correlations is not None
+
+
+def test_get_report_correlations_not_found(db_setup):
+    user = db_setup
+    with pytest.raises(NotFoundError):
+        get_report_correlations(1000, user)
+
+
+@pytest.mark.asyncio
+async def test_get_report_indicator_values(db_setup):
+    user = db_setup
+    ReportIndicator(name="Median").save()
+    ReportIndicator(name="Mean").save()
+    report_id = await create_report(create_upload_file(VALID_NAME, columns_to_df(mock_report_columns())), user)
+    report = Report.objects(id=report_id).first()
+    inactive_value = report.columns[0].indicator_values[0]
+    inactive_value.is_active = False
+    inactive_value.save()
+    expected_values = {column.name: get_indicator_values(IndicatorValuesGet(user=user.id, report=report_id,
+                                                                            column=column.id))
+                       for column in report.columns}
+    indicator_values = get_report_indicator_values(report_id, user)
+    assert indicator_values == expected_values
+    assert list(indicator_values) == [column.name for column in report.columns]
+    assert len(indicator_values[report.columns[0].name]) == 1
+
+
+def test_get_report_indicator_values_without_values(db_setup):
+    user = db_setup
+    report = create_test_report(user, True)
+    assert get_report_indicator_values(report.id, user) == {"Column 1": []}
+
+
+def test_get_report_indicator_values_not_found(db_setup):
+    user = db_setup
+    report = create_test_report(user, False)
+    with pytest.raises(NotFoundError):
+        get_report_indicator_values(report.id, user)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_report_trees(db_setup):
+    user = db_setup
+    ReportIndicator(name="Median").save()
+    ReportIndicator(name="Mean").save()
+    report_id = await create_report(create_upload_file(VALID_NAME, columns_to_df(mock_report_columns())), user)
+    expected_dict = Report.objects(id=report_id).first().to_dict()
+    report = prefetch_report_trees([Report.objects(id=report_id).first()])[0]
+    with patch('mongomock.collection.Collection.find', side_effect=AssertionError):
+        assert report.to_dict() == expected_dict
+
+
+def test_reports_to_dict_missing_column(db_setup):
+    user = db_setup
+    report = create_test_report(user, True)
+    ReportColumn._get_collection().delete_one({'_id': report.columns[0].id})
+    assert reports_to_dict([Report.objects(id=report.id).first()])[0]['columns'] == []
+
+
+def test_get_report_validators_after_lazy_correlations(db_setup):
+    user = db_setup
+    report = create_test_report(user, True)
+    validators = get_report_validators(report.id, REPORT_RESOURCE, user)
+    assert validators.last_modified == report.date_uploaded
+    assert validators.not_modified(validators.etag, None)
+    get_report_correlations(report.id, user)
+    changed_validators = get_report_validators(report.id, REPORT_RESOURCE, user)
+    assert changed_validators.etag != validators.etag
+    assert changed_validators.last_modified > report.date_uploaded
+    assert not changed_validators.not_modified(validators.etag, None)
+
+
+def test_get_report_column_outliers(db_setup):
+    user = db_setup
+    report = create_test_report(user, True)
+    column_id = report.columns[0].id
+    outliers = get_report_column_outliers(report.id, column_id, "iqr", user)
+    assert outliers['column'] == column_id
+    with patch.object(ReportColumn, 'get_column_values', side_effect=AssertionError):
+        assert get_report_column_outliers(report.id, column_id, "iqr", user) == outliers
+    other_report = create_test_report(user, True)
+    with pytest.raises(NotFoundError):
+        get_report_column_outliers(report.id, other_report.columns[0].id, "iqr", user)
+
+
+@pytest.mark.parametrize("if_modified_since, not_modified", [
+    ("Mon, 01 Jan 2024 00:00:00 GMT", True),
+    ("Mon, 01 Jan 2024 00:00:00 -0000", True),
+    ("Sun, 31 Dec 2023 23:59:59 -0000", False),
+    ("not a date", False),
+])
+def test_report_validators_if_modified_since(if_modified_since, not_modified):
+    validators = ReportValidators('"report-1-0"', datetime(2024, 1, 1))
+    assert validators.not_modified(None, if_modified_since) == not_modified
+
+
+def test_get_report_validators_not_found(db_setup):
+    user = db_setup
+    report = create_test_report(user, False)
+    with pytest.raises(NotFoundError):
+        get_report_validators(report.id, REPORT_RESOURCE, user)
@@ -7,8 +7,7 @@ function addCell(tr, content) {
 
 
 function fetchAndStoreAdmins() {
-    return fetch('http://localhost:8001/admin/', {credentials: 'include'})
-        .then(response => response.json())
+    return fetchAllPages('http://localhost:8001/admin/')
         .then(admins => {
             allAdmins = admins;
         })
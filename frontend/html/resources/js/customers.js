@@ -7,8 +7,7 @@ function addCell(tr, content) {
 
 
 function fetchAndStoreCustomers() {
-    return fetch('http://localhost:8001/customer/', {credentials: 'include'})
-        .then(response => response.json())
+    return fetchAllPages('http://localhost:8001/customer/')
         .then(customers => {
             allCustomers = customers;
         })
@@ -34,11 +34,8 @@ function appendViewHyperlink(row, data) {
     row.appendChild(hyperlinkCell);
 }
 
-async function init() {
-    await fetch("http://localhost:8001/report/", {
-        method: 'GET',
-        credentials: "include"
-    }).then(response => {
+function fetchReports() {
+    return fetchAllPages("http://localhost:8001/report/", response => {
         if (response.status === 500) {
             Swal.fire({
                 title: 'Server Error!',
@@ -47,8 +44,11 @@ async function init() {
                 confirmButtonText: 'OK'
             });
         }
-        return response.json()
-    }).then(async content => {
+    });
+}
+
+async function init() {
+    await fetchReports().then(async content => {
         const tableBody = document.getElementById('reports-body');
         while (tableBody.firstChild) {
             tableBody.removeChild(tableBody.firstChild);
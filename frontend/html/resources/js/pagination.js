@@ -0,0 +1,12 @@
+async function fetchAllPages(url, onResponse = () => {}) {
+    const items = [];
+    let cursor = null;
+    do {
+        const response = await fetch(url + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''),
+            {credentials: 'include'});
+        onResponse(response);
+        items.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return items;
+}
@@ -6,16 +6,19 @@ function previewFile() {
 
     if (file) {
         preview.textContent = `Selected file: ${file.name}`;
-        const reader = new FileReader();
-        reader.onload = function (e) {
-            const data = new Uint8Array(e.target.result);
-            const workbook = XLSX.read(data, {type: 'array'});
+        contentPreview.innerHTML = '';
+        if (!file.name.toLowerCase().endsWith('.parquet')) {
+            const reader = new FileReader();
+            reader.onload = function (e) {
+                const data = new Uint8Array(e.target.result);
+                const workbook = XLSX.read(data, {type: 'array'});
 
-            const firstSheetName = workbook.SheetNames[0];
-            const worksheet = workbook.Sheets[firstSheetName];
-            contentPreview.innerHTML = XLSX.utils.sheet_to_html(worksheet, {editable: false});
-        };
-        reader.readAsArrayBuffer(file);
+                const firstSheetName = workbook.SheetNames[0];
+                const worksheet = workbook.Sheets[firstSheetName];
+                contentPreview.innerHTML = XLSX.utils.sheet_to_html(worksheet, {editable: false});
+            };
+            reader.readAsArrayBuffer(file);
+        }
 
         confirmBtn.classList.remove('hidden');
     } else {
@@ -26,6 +29,68 @@ function previewFile() {
 }
 
 
+function showUploadError() {
+    Swal.fire({
+        title: 'Error!',
+        text: 'File has incorrect data. Make sure first raw is column names and other raws contain only numeric data',
+        icon: 'error',
+        confirmButtonText: 'OK'
+    })
+}
+
+
+function showServerError() {
+    Swal.fire({
+        title: 'Server Error!',
+        text: 'An error occurred on the server. Please try again later.',
+        icon: 'error',
+        confirmButtonText: 'OK'
+    }).then(() => window.location.replace(`http://localhost:3001/home`))
+}
+
+
+// Give up on a job that has not finished after ten minutes of polling once a second.
+const MAX_REPORT_POLLS = 600;
+
+function showTimeoutError() {
+    Swal.fire({
+        title: 'Error!',
+        text: 'The dataset is taking too long to process. Please try again later.',
+        icon: 'error',
+        confirmButtonText: 'OK'
+    })
+}
+
+
+async function waitForReport(jobId, polls = 1) {
+    const response = await fetch(`http://localhost:8001/report/jobs/${jobId}`, {
+        method: 'GET',
+        credentials: "include"
+    });
+    if (response.status !== 200) {
+        showServerError();
+        return;
+    }
+    const job = await response.json();
+    if (job.stage === 'done') {
+        Swal.fire({
+            title: 'Success!',
+            text: 'Dataset has been successfully uploaded!',
+            icon: 'success',
+            confirmButtonText: 'OK'
+        })
+        setTimeout(() => window.location.replace(`http://localhost:3001/report/${job.report}`),
+            1000)
+    } else if (job.stage === 'failed') {
+        showUploadError();
+    } else if (polls >= MAX_REPORT_POLLS) {
+        showTimeoutError();
+    } else {
+        setTimeout(() => waitForReport(jobId, polls + 1), 1000);
+    }
+}
+
+
 async function confirmUpload() {
     const file = document.getElementById('fileInput').files[0];
     const url = `http://localhost:8001/customer/upload_report`;
@@ -36,32 +101,14 @@ async function confirmUpload() {
     xhr.withCredentials = true;
     xhr.addEventListener('readystatechange', function (e) {
         if (xhr.readyState === 4 && xhr.status === 200) {
-            const reportId = xhr.response
-            Swal.fire({
-                title: 'Success!',
-                text: 'Dataset has been successfully uploaded!',
-                icon: 'success',
-                confirmButtonText: 'OK'
-            })
-            setTimeout(() => window.location.replace(`http://localhost:3001/report/${reportId}`),
-                1000)
+            waitForReport(xhr.response)
         } else if (xhr.readyState === 4 && xhr.status === 500) {
-            Swal.fire({
-                title: 'Server Error!',
-                text: 'An error occurred on the server. Please try again later.',
-                icon: 'error',
-                confirmButtonText: 'OK'
-            }).then(() => window.location.replace(`http://localhost:3001/home`))
+            showServerError();
         } else if (xhr.readyState === 4 && xhr.status === 400) {
-            Swal.fire({
-                title: 'Error!',
-                text: 'File has incorrect data. Make sure first raw is column names and other raws contain only numeric data',
-                icon: 'error',
-                confirmButtonText: 'OK'
-            })
+            showUploadError();
         }
     });
     xhr.send(formData)
 }
 
-document.getElementById('confirmBtn').addEventListener('click', confirmUpload);
\ No newline at end of file
+document.getElementById('confirmBtn').addEventListener('click', confirmUpload);